@@ -1,6 +1,7 @@
 
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
+from apps.companies.numbering import NumberedDocumentSerializerMixin
 from .models import (
     ChartOfAccounts, JournalEntry, JournalEntryItem, 
     FinancialPeriod, TrialBalance, FinancialStatement
@@ -37,9 +38,12 @@ class JournalEntryItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class JournalEntrySerializer(serializers.ModelSerializer):
+class JournalEntrySerializer(NumberedDocumentSerializerMixin, serializers.ModelSerializer):
     """Serializer for JournalEntry model."""
 
+    document_type = 'journal_entry'
+    number_field = 'entry_number'
+
     items = JournalEntryItemSerializer(many=True, read_only=True)
     is_balanced = serializers.BooleanField(read_only=True)
     created_by_name = serializers.CharField(source='created_by.full_name', read_only=True)
@@ -52,6 +56,7 @@ class JournalEntrySerializer(serializers.ModelSerializer):
             'created_by', 'created_by_name'
         ]
         read_only_fields = ['id', 'is_balanced', 'created_at', 'created_by']
+        extra_kwargs = {'entry_number': {'required': False}}
 
     def create(self, validated_data):
         """Create journal entry with items."""
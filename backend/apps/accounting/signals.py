@@ -0,0 +1,8 @@
+from django.db.models.signals import post_save, post_delete
+from apps.companies.cache import invalidate_tenant_namespaces
+from .models import ChartOfAccounts
+
+invalidate_accounts = invalidate_tenant_namespaces('accounts')
+
+for signal in (post_save, post_delete):
+    signal.connect(invalidate_accounts, sender=ChartOfAccounts, dispatch_uid=f'account_cache_{signal}')
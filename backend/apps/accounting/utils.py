@@ -6,12 +6,26 @@ from .models import (
 )
 from apps.sales.models import Invoice
 from apps.purchases.models import SupplierInvoice
+from apps.companies.cache import tenant_cache
+
+
+def get_company_accounts(company, account_type=None):
+    """Return the company's chart of accounts from the tenant cache."""
+    accounts = tenant_cache.get_or_set(
+        company.id,
+        'accounts',
+        'chart',
+        lambda: list(ChartOfAccounts.objects.filter(company=company))
+    )
+    if account_type:
+        return [account for account in accounts if account.account_type == account_type]
+    return accounts
 
 
 def generate_trial_balance(financial_period):
     """Generate trial balance for financial period."""
     # Get all accounts
-    accounts = ChartOfAccounts.objects.filter(company=financial_period.company)
+    accounts = get_company_accounts(financial_period.company)
 
     trial_balances = []
 
@@ -73,16 +87,10 @@ def generate_trial_balance(financial_period):
 def generate_income_statement(financial_period):
     """Generate income statement for financial period."""
     # Get revenue accounts
-    revenue_accounts = ChartOfAccounts.objects.filter(
-        company=financial_period.company,
-        account_type='revenue'
-    )
+    revenue_accounts = get_company_accounts(financial_period.company, 'revenue')
 
     # Get expense accounts
-    expense_accounts = ChartOfAccounts.objects.filter(
-        company=financial_period.company,
-        account_type='expense'
-    )
+    expense_accounts = get_company_accounts(financial_period.company, 'expense')
 
     # Calculate totals
     total_revenue = 0
@@ -161,22 +169,13 @@ def generate_income_statement(financial_period):
 def generate_balance_sheet(financial_period):
     """Generate balance sheet for financial period."""
     # Get asset accounts
-    asset_accounts = ChartOfAccounts.objects.filter(
-        company=financial_period.company,
-        account_type='asset'
-    )
+    asset_accounts = get_company_accounts(financial_period.company, 'asset')
 
     # Get liability accounts
-    liability_accounts = ChartOfAccounts.objects.filter(
-        company=financial_period.company,
-        account_type='liability'
-    )
+    liability_accounts = get_company_accounts(financial_period.company, 'liability')
 
     # Get equity accounts
-    equity_accounts = ChartOfAccounts.objects.filter(
-        company=financial_period.company,
-        account_type='equity'
-    )
+    equity_accounts = get_company_accounts(financial_period.company, 'equity')
 
     # Calculate totals for assets
     total_assets = 0
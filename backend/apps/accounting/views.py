@@ -22,10 +22,11 @@ from .utils import (
     generate_trial_balance, generate_income_statement, 
     generate_balance_sheet, generate_cash_flow
 )
+from apps.companies.mixins import ConditionalListMixin, TenantCachedListMixin
 import io
 
 
-class ChartOfAccountsViewSet(viewsets.ModelViewSet):
+class ChartOfAccountsViewSet(ConditionalListMixin, TenantCachedListMixin, viewsets.ModelViewSet):
     """ViewSet for ChartOfAccounts model."""
 
     queryset = ChartOfAccounts.objects.all()
@@ -36,6 +37,8 @@ class ChartOfAccountsViewSet(viewsets.ModelViewSet):
     search_fields = ['code', 'name', 'description']
     ordering_fields = ['code', 'name']
     ordering = ['code']
+    conditional_timestamp_fields = ('updated_at', 'parent__updated_at')
+    cache_namespace = 'accounts'
 
     def get_queryset(self):
         """Filter accounts by company."""
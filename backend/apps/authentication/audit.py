@@ -0,0 +1,129 @@
+"""
+Batched authentication audit writes.
+
+Login requests record ``LoginAttempt`` rows, refresh the user's
+``UserSession`` and bump ``last_login``. None of that is needed to answer
+the request, so the rows are buffered per process and written in bulk
+shortly after, keeping the login path at a fixed number of queries.
+"""
+
+import atexit
+import logging
+import threading
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class AuthAuditWriter:
+    """Per-process buffer for login attempts and session refreshes."""
+
+    def __init__(self, window=None, max_batch=None):
+        self.window = window if window is not None else getattr(settings, 'AUTH_AUDIT_FLUSH_WINDOW', 1.0)
+        self.max_batch = max_batch or getattr(settings, 'AUTH_AUDIT_MAX_BATCH', 500)
+        self._attempts = []
+        self._sessions = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def record_attempt(self, email, ip_address, user_agent, status):
+        """Queue a ``LoginAttempt`` row."""
+        self._enqueue(lambda: self._attempts.append({
+            'email': email or '',
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'status': status,
+        }))
+
+    def record_login(self, user_id, session_key, ip_address, user_agent):
+        """Queue the user's session refresh and ``last_login`` update."""
+        self._enqueue(lambda: self._sessions.__setitem__(user_id, {
+            'session_key': session_key,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'logged_in_at': timezone.now(),
+        }))
+
+    def _enqueue(self, add):
+        flush_now = False
+        with self._lock:
+            add()
+            if len(self._attempts) + len(self._sessions) >= self.max_batch or self.window <= 0:
+                flush_now = True
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush_in_thread)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if flush_now:
+            self.flush()
+
+    def _flush_in_thread(self):
+        try:
+            self.flush()
+        finally:
+            # Each flush runs on a new timer thread with its own connection;
+            # close it, CONN_MAX_AGE would otherwise keep it open until the
+            # thread is garbage-collected
+            connections.close_all()
+
+    def flush(self):
+        """Write everything buffered so far."""
+        from .models import LoginAttempt, UserSession
+        from apps.users.models import User
+
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            attempts, self._attempts = self._attempts, []
+            sessions, self._sessions = self._sessions, {}
+
+        if not attempts and not sessions:
+            return
+
+        try:
+            with transaction.atomic():
+                if attempts:
+                    LoginAttempt.objects.bulk_create([LoginAttempt(**row) for row in attempts])
+
+                if sessions:
+                    self._write_sessions(UserSession, User, sessions)
+        except Exception as e:
+            logger.error(f'Failed to write authentication audit batch: {str(e)}')
+
+    def _write_sessions(self, UserSession, User, sessions):
+        existing = {
+            session.user_id: session
+            for session in UserSession.objects.filter(user_id__in=sessions.keys())
+        }
+
+        to_update, to_create = [], []
+        for user_id, values in sessions.items():
+            session = existing.get(user_id) or UserSession(user_id=user_id)
+            session.session_key = values['session_key']
+            session.ip_address = values['ip_address']
+            session.user_agent = values['user_agent']
+            session.is_active = True
+            session.last_activity = values['logged_in_at']
+            (to_update if session.pk else to_create).append(session)
+
+        if to_update:
+            UserSession.objects.bulk_update(
+                to_update,
+                ['session_key', 'ip_address', 'user_agent', 'is_active', 'last_activity']
+            )
+        if to_create:
+            UserSession.objects.bulk_create(to_create)
+
+        users = [
+            User(pk=user_id, last_login=values['logged_in_at'])
+            for user_id, values in sessions.items()
+        ]
+        User.objects.bulk_update(users, ['last_login'])
+
+
+auth_audit = AuthAuditWriter()
+atexit.register(auth_audit.flush)
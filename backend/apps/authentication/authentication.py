@@ -0,0 +1,112 @@
+import logging
+import time
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+
+# The per-request tenant context kept in the shared cache. Everything else
+# (password hash, company keys and certificates...) is loaded lazily from
+# the database by the few views that need it.
+USER_CONTEXT_FIELDS = (
+    'id', 'email', 'first_name', 'last_name', 'role', 'is_active',
+    'is_staff', 'is_superuser', 'is_company_admin', 'company_id',
+)
+COMPANY_CONTEXT_FIELDS = (
+    'id', 'name', 'country', 'zatca_enabled', 'eta_enabled',
+    'subscription_plan', 'subscription_expires', 'is_active',
+)
+
+
+def user_cache_key(user_id):
+    """Cache key holding the tenant context of a user for a token."""
+    return f'auth:context:{user_id}'
+
+
+def invalidate_cached_users(user_ids):
+    """Drop cached users so the next request reloads them from the database."""
+    try:
+        cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.warning(f'Auth cache invalidation failed: {str(e)}')
+
+
+def _from_context(model, data):
+    """
+    Build a model instance from some of its field values. The other fields
+    are deferred, so reading them queries the database and ``save()`` only
+    writes the loaded fields.
+    """
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in data]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [data[name] for name in names])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that loads the user and its company in a single
+    query and keeps a minimal tenant context (ids, flags, role and the
+    company's plan and compliance flags) in the shared cache until the
+    access token expires.
+
+    The user is rebuilt from that context with its company attached, so
+    views keep dereferencing ``request.user.company`` without any
+    per-request query. Cached entries are dropped whenever the user or the
+    company is saved or deleted, see ``apps.authentication.signals``.
+    """
+
+    def _load_context(self, user_id):
+        row = self.user_model.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).values(
+            *USER_CONTEXT_FIELDS,
+            *[f'company__{name}' for name in COMPANY_CONTEXT_FIELDS]
+        ).first()
+        if row is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        return {
+            'user': {name: row[name] for name in USER_CONTEXT_FIELDS},
+            'company': {
+                name: row[f'company__{name}'] for name in COMPANY_CONTEXT_FIELDS
+            } if row['company_id'] else None,
+        }
+
+    def get_user(self, validated_token):
+        from apps.companies.models import Company
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        key = user_cache_key(user_id)
+        try:
+            context = cache.get(key)
+        except Exception as e:
+            logger.warning(f'Auth cache unavailable: {str(e)}')
+            context = None
+
+        if context is None:
+            context = self._load_context(user_id)
+
+            # Never outlive the token that caused the lookup
+            expires_at = validated_token.payload.get('exp')
+            timeout = max(int(expires_at - time.time()), 1) if expires_at else 60
+            try:
+                cache.set(key, context, timeout)
+            except Exception as e:
+                logger.warning(f'Auth cache unavailable: {str(e)}')
+
+        user = _from_context(self.user_model, context['user'])
+        if context['company'] is not None:
+            user.company = _from_context(Company, context['company'])
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        return user
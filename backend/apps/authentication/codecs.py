@@ -0,0 +1,145 @@
+"""
+Frame encodings for the sync WebSocket.
+
+Clients negotiate an encoding through the ``Sec-WebSocket-Protocol`` header
+(e.g. ``zimam.msgpack.zstd``); clients that ask for nothing keep receiving
+plain JSON text frames.
+
+Binary frames start with one header byte telling how the body is compressed
+(``0`` none, ``1`` zlib/deflate, ``2`` zstd), followed by the JSON or
+MessagePack body. Only frames of at least ``SYNC_COMPRESSION_MIN_BYTES``
+are compressed; small deltas are cheaper to send as they are. Client frames
+are never inflated beyond ``SYNC_MAX_FRAME_BYTES``.
+"""
+
+import json
+import zlib
+from functools import lru_cache
+from django.conf import settings
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+PLAIN, DEFLATE, ZSTD = 0, 1, 2
+
+
+class FrameTooLarge(ValueError):
+    """A client frame decodes to more than ``SYNC_MAX_FRAME_BYTES``."""
+
+
+def render_sync_frame(texts):
+    """Join pre-serialized messages into one WebSocket text frame."""
+    if len(texts) == 1:
+        return texts[0]
+    return '{"type":"SYNC_BATCH","messages":[' + ','.join(texts) + ']}'
+
+
+class FrameCodec:
+    """Encode outgoing sync frames and decode incoming ones for one encoding."""
+
+    def __init__(self, serializer='json', compression=None, min_size=None):
+        self.serializer = serializer
+        self.compression = compression
+        self.min_size = min_size if min_size is not None else getattr(
+            settings, 'SYNC_COMPRESSION_MIN_BYTES', 512
+        )
+        self.max_size = getattr(settings, 'SYNC_MAX_FRAME_BYTES', 1024 * 1024)
+        self.binary = serializer != 'json' or compression is not None
+
+        if compression == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=3)
+
+    @property
+    def name(self):
+        return '.'.join(['zimam', self.serializer] + ([self.compression] if self.compression else []))
+
+    def _compress(self, body):
+        if self.compression is None or len(body) < self.min_size:
+            return bytes([PLAIN]) + body
+        if self.compression == 'zstd':
+            return bytes([ZSTD]) + self._compressor.compress(body)
+        return bytes([DEFLATE]) + zlib.compress(body, 6)
+
+    def encode(self, texts):
+        """
+        Encode pre-serialized JSON messages into one frame.
+
+        Returns ``str`` for text frames and ``bytes`` for binary frames.
+        """
+        if self.serializer == 'json':
+            frame = render_sync_frame(texts)
+            if not self.binary:
+                return frame
+            return self._compress(frame.encode())
+
+        messages = [json.loads(text) for text in texts]
+        payload = messages[0] if len(messages) == 1 else {'type': 'SYNC_BATCH', 'messages': messages}
+        return self._compress(msgpack.packb(payload, use_bin_type=True))
+
+    def _inflate_deflate(self, body):
+        decompressor = zlib.decompressobj()
+        body = decompressor.decompress(body, self.max_size)
+        if decompressor.unconsumed_tail:
+            raise FrameTooLarge(f'Frame inflates beyond {self.max_size} bytes')
+        return body
+
+    def _inflate_zstd(self, body):
+        if zstandard is None:
+            raise ValueError('zstd frames are not supported')
+        # A declared content size is allocated up front, so check it first;
+        # without one max_output_size bounds the output
+        if zstandard.frame_content_size(body) > self.max_size:
+            raise FrameTooLarge(f'Frame inflates beyond {self.max_size} bytes')
+        try:
+            return zstandard.ZstdDecompressor().decompress(body, max_output_size=self.max_size)
+        except zstandard.ZstdError as e:
+            raise ValueError(f'Invalid zstd frame: {str(e)}')
+
+    def decode(self, data):
+        """Decode a binary frame sent by the client into a message dict."""
+        header, body = data[0], data[1:]
+        if header == DEFLATE:
+            body = self._inflate_deflate(body)
+        elif header == ZSTD:
+            body = self._inflate_zstd(body)
+        elif header != PLAIN:
+            raise ValueError(f'Unknown frame header: {header}')
+        if len(body) > self.max_size:
+            raise FrameTooLarge(f'Frame is larger than {self.max_size} bytes')
+
+        if self.serializer == 'msgpack':
+            return msgpack.unpackb(body, raw=False)
+        return json.loads(body)
+
+
+@lru_cache(maxsize=None)
+def available_codecs():
+    """
+    Return the codecs usable with the installed libraries, by subprotocol
+    name. Codecs are stateless per frame and shared by all connections.
+    """
+    serializers = ['json'] + (['msgpack'] if msgpack else [])
+    compressions = [None, 'deflate'] + (['zstd'] if zstandard else [])
+    codecs = [FrameCodec(serializer, compression) for serializer in serializers for compression in compressions]
+    return {codec.name: codec for codec in codecs}
+
+
+def negotiate_codec(requested):
+    """
+    Pick the first subprotocol the client offered that the server supports.
+
+    Returns ``(codec, subprotocol)``; ``subprotocol`` is None for the default
+    JSON text encoding.
+    """
+    codecs = available_codecs()
+    for name in requested or []:
+        if name in codecs:
+            return codecs[name], name
+    return codecs['zimam.json'], None
@@ -3,17 +3,251 @@ WebSocket Server for Real-time Synchronization
 معالج الاتصالات الفورية عبر WebSocket
 """
 
+import os
 import json
+import time
+import uuid
+import socket
 import logging
 import asyncio
+from collections import Counter, OrderedDict, deque
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.layers import get_channel_layer
-from django.contrib.auth.models import User
-from rest_framework.authtoken.models import Token
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
 from datetime import datetime
+from apps.companies.cache import LocalLRUCache
+from .codecs import FrameTooLarge, negotiate_codec
 
 logger = logging.getLogger(__name__)
 
+# إطار يُرسل للعميل عند امتلاء طابور الإرسال، ليعيد المزامنة الكاملة
+RESYNC_FRAME = json.dumps({'type': 'SYNC_RESYNC_REQUIRED'})
+
+# نبضة الخادم؛ يرد العميل بـ PONG (أو أي رسالة) ليبقى الاتصال حياً
+PING_FRAME = json.dumps({'type': 'PING'})
+
+
+def build_sync_event(parts):
+    """
+    Build a ``sync_batch`` channel-layer event from (user_id, json_text) parts.
+
+    Messages are serialized once by the producer; recipients only join the
+    pre-serialized texts into a frame.
+    """
+    return {
+        'type': 'sync_batch',
+        'batch_id': uuid.uuid4().hex,
+        'parts': [[user_id, text] for user_id, text in parts],
+    }
+
+
+class SyncBatcher:
+    """
+    Coalesce sync messages per group over a short window.
+
+    Updates to the same entity within the window replace each other (last
+    write wins), and the whole window is published with a single
+    ``group_send`` instead of one per incoming message. Logged messages are
+    appended to the company's sync log in one write per window and stamped
+    with their sequence number before fan-out.
+    """
+
+    def __init__(self, window=None):
+        self.window = window if window is not None else getattr(settings, 'SYNC_BATCH_WINDOW', 0.05)
+        self._pending = {}
+        self._sequence = 0
+
+    def add(self, channel_layer, group, user_id, message, company_id=None):
+        """
+        Queue a message for the group's next batch. Messages with a
+        ``company_id`` are persisted to that company's sync log.
+        """
+        pending = self._pending.get(group)
+        if pending is None:
+            pending = self._pending[group] = OrderedDict()
+            asyncio.get_running_loop().call_later(
+                self.window,
+                lambda: asyncio.ensure_future(self.flush(channel_layer, group))
+            )
+
+        entity_id = message.get('entityId')
+        if entity_id is not None:
+            key = (message.get('entity'), str(entity_id))
+            # Keep the latest position so ordering follows the last write
+            pending.pop(key, None)
+        else:
+            self._sequence += 1
+            key = self._sequence
+        pending[key] = (user_id, message, company_id)
+
+    async def flush(self, channel_layer, group):
+        """Persist and publish everything queued for a group."""
+        pending = self._pending.pop(group, None)
+        if not pending:
+            return
+
+        entries = list(pending.values())
+        await self.append_to_log(entries)
+
+        parts = [(user_id, json.dumps(message)) for user_id, message, _ in entries]
+        try:
+            await channel_layer.group_send(group, build_sync_event(parts))
+        except Exception as e:
+            logger.error(f'خطأ في بث دفعة المزامنة: {str(e)}')
+
+    async def append_to_log(self, entries):
+        """Write the logged entries of a batch and stamp their sequence numbers."""
+        from apps.inventory.services import SyncLogService
+
+        by_company = {}
+        for index, (user_id, message, company_id) in enumerate(entries):
+            if company_id is not None:
+                by_company.setdefault(company_id, []).append(index)
+
+        for company_id, indexes in by_company.items():
+            try:
+                sequences = await database_sync_to_async(SyncLogService.append)(
+                    company_id,
+                    [(entries[i][0], entries[i][1]) for i in indexes]
+                )
+            except Exception as e:
+                # البث يستمر حتى لو تعذر الحفظ؛ العميل سيطلب لقطة كاملة عند إعادة الاتصال
+                logger.error(f'خطأ في حفظ سجل المزامنة: {str(e)}')
+                continue
+
+            for i, sequence in zip(indexes, sequences):
+                user_id, message, _ = entries[i]
+                entries[i] = (user_id, dict(message, seq=sequence), company_id)
+
+
+sync_batcher = SyncBatcher()
+
+
+class ConnectionRegistry:
+    """
+    Live sync connections of this worker process.
+
+    A single sweeper task per process sends server heartbeats, reaps
+    connections that stayed silent longer than ``SYNC_IDLE_TIMEOUT`` and
+    refreshes group memberships of live ones, so memberships of dead
+    connections expire from the channel layer (``SYNC_GROUP_EXPIRY``).
+    Other consumers that join groups (notifications) register as members:
+    the sweeper only refreshes their groups.
+    Per-company connection counts are published to the shared cache under
+    a per-worker key and summed by :meth:`collect`.
+    """
+
+    WORKERS_KEY = 'ws:workers'
+
+    def __init__(self):
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.consumers = set()
+        self.members = set()
+        self._sweeper = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'SYNC_HEARTBEAT_INTERVAL', 30)
+
+    @property
+    def idle_timeout(self):
+        return getattr(settings, 'SYNC_IDLE_TIMEOUT', 75)
+
+    def _worker_key(self, worker_id):
+        return f'ws:connections:{worker_id}'
+
+    def register(self, consumer):
+        """Track a newly accepted connection."""
+        self.consumers.add(consumer)
+        self._start_sweeper()
+
+    def unregister(self, consumer):
+        """Stop tracking a closed connection."""
+        self.consumers.discard(consumer)
+
+    def register_member(self, consumer):
+        """Keep the group memberships of a non-sync connection alive."""
+        self.members.add(consumer)
+        self._start_sweeper()
+
+    def unregister_member(self, consumer):
+        """Stop refreshing the groups of a closed non-sync connection."""
+        self.members.discard(consumer)
+
+    def _start_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.ensure_future(self._sweep_loop())
+
+    def counts(self):
+        """Return this worker's live connections per company."""
+        return dict(Counter(consumer.company_id for consumer in self.consumers))
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f'خطأ في فحص الاتصالات: {str(e)}')
+            if not self.consumers and not self.members:
+                # لا اتصالات متبقية؛ ننشر عداداً فارغاً ونتوقف حتى الاتصال التالي
+                await sync_to_async(self.publish, thread_sensitive=False)()
+                return
+
+    async def sweep(self):
+        """Heartbeat live connections and reap idle ones."""
+        deadline = time.monotonic() - self.idle_timeout
+        idle = [consumer for consumer in self.consumers if consumer.last_seen < deadline]
+        live = [consumer for consumer in self.consumers if consumer.last_seen >= deadline]
+
+        await asyncio.gather(*[consumer.reap() for consumer in idle], return_exceptions=True)
+        for consumer in live:
+            consumer.enqueue_texts([PING_FRAME])
+        await asyncio.gather(
+            *[consumer.refresh_membership() for consumer in live + list(self.members)],
+            return_exceptions=True
+        )
+
+        if idle:
+            logger.info(f'🧹 تم إغلاق {len(idle)} اتصال خامل')
+
+        await sync_to_async(self.publish, thread_sensitive=False)()
+
+    def publish(self):
+        """Publish this worker's per-company counts to the shared cache."""
+        try:
+            cache.set(self._worker_key(self.worker_id), self.counts(), self.interval * 3)
+            workers = cache.get(self.WORKERS_KEY) or []
+            if self.worker_id not in workers:
+                cache.set(self.WORKERS_KEY, workers + [self.worker_id], None)
+        except Exception as e:
+            logger.warning(f'تعذر نشر عدادات الاتصالات: {str(e)}')
+
+    def collect(self):
+        """Sum live connections per company across all workers."""
+        workers = cache.get(self.WORKERS_KEY) or []
+        snapshots = cache.get_many([self._worker_key(worker_id) for worker_id in workers])
+
+        totals = Counter()
+        for counts in snapshots.values():
+            totals.update(counts)
+
+        alive = [worker_id for worker_id in workers if self._worker_key(worker_id) in snapshots]
+        if len(alive) != len(workers):
+            # العمليات المتوقفة لم تعد تحدّث مفاتيحها
+            cache.set(self.WORKERS_KEY, alive, None)
+
+        return {'workers': len(alive), 'companies': dict(totals)}
+
+
+connection_registry = ConnectionRegistry()
+
+# الإطارات المبنية مسبقاً لكل دفعة، تُشارك بين جميع المستلمين في نفس العملية
+_sync_frames = LocalLRUCache(max_entries=256)
+
 
 class SyncConsumer(AsyncWebsocketConsumer):
     """
@@ -27,25 +261,25 @@ class SyncConsumer(AsyncWebsocketConsumer):
         """
         self.user = None
         self.company_id = None
+        self.room_group_name = None
+        self.send_queue = deque()
+        self.send_queue_size = getattr(settings, 'SYNC_SEND_QUEUE_SIZE', 256)
+        self.send_ready = asyncio.Event()
+        self.sender_task = None
+        self.last_seen = time.monotonic()
+        # ترميز الإطارات المتفق عليه عبر Sec-WebSocket-Protocol
+        self.codec, subprotocol = negotiate_codec(self.scope.get('subprotocols'))
         
         try:
-            # استخراج التوكن من الاستعلام
-            query_string = self.scope.get('query_string', b'').decode()
-            params = dict(param.split('=') for param in query_string.split('&') if '=' in param)
-            token_str = params.get('token')
-            
-            if token_str:
-                try:
-                    token = Token.objects.get(key=token_str)
-                    self.user = token.user
-                    self.company_id = token.user.profile.company_id if hasattr(token.user, 'profile') else None
-                except Token.DoesNotExist:
-                    await self.close(code=4001)
-                    return
-            else:
+            # المستخدم تمت مصادقته مسبقاً عبر JWTAuthMiddleware
+            user = self.scope.get('user')
+            if not user or not user.is_authenticated:
                 await self.close(code=4001)
                 return
             
+            self.user = user
+            self.company_id = self.scope.get('company_id')
+            
             # الانضمام للمجموعة
             self.room_group_name = f'sync_company_{self.company_id}'
             await self.channel_layer.group_add(
@@ -53,15 +287,18 @@ class SyncConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
             
-            await self.accept()
-            logger.info(f'✅ متصل: {self.user.email} - {self.room_group_name}')
+            await self.accept(subprotocol=subprotocol)
+            self.sender_task = asyncio.ensure_future(self.drain_send_queue())
+            connection_registry.register(self)
+            logger.info(f'✅ متصل: {self.user.email} - {self.room_group_name} ({self.codec.name})')
             
             # إرسال رسالة ترحيب
-            await self.send(json.dumps({
+            self.enqueue_texts([json.dumps({
                 'type': 'SYNC_CONNECTED',
                 'message': f'أهلاً {self.user.first_name}',
+                'encoding': self.codec.name,
                 'timestamp': datetime.now().isoformat()
-            }))
+            })])
             
         except Exception as e:
             logger.error(f'خطأ في الاتصال: {str(e)}')
@@ -71,6 +308,10 @@ class SyncConsumer(AsyncWebsocketConsumer):
         """
         Handle WebSocket disconnections
         """
+        connection_registry.unregister(self)
+        if self.sender_task:
+            self.sender_task.cancel()
+        
         if self.room_group_name:
             await self.channel_layer.group_discard(
                 self.room_group_name,
@@ -78,69 +319,104 @@ class SyncConsumer(AsyncWebsocketConsumer):
             )
             logger.info(f'❌ قطع الاتصال: {self.user.email if self.user else "Unknown"}')
     
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """
         Receive messages from WebSocket client
         """
+        self.last_seen = time.monotonic()
+        
         try:
-            message = json.loads(text_data)
+            if text_data is not None:
+                message = json.loads(text_data)
+            else:
+                message = self.codec.decode(bytes_data)
             message_type = message.get('type')
             
-            if message_type == 'SYNC_REQUEST':
+            if message_type == 'PONG':
+                # رد على نبضة الخادم؛ تحديث last_seen يكفي
+                return
+            
+            elif message_type == 'SYNC_REQUEST':
                 await self.handle_sync_request(message)
             
             elif message_type == 'UPDATE':
                 await self.handle_update(message)
             
             elif message_type == 'PING':
-                await self.send(json.dumps({
+                self.enqueue_texts([json.dumps({
                     'type': 'PONG',
                     'timestamp': datetime.now().isoformat()
-                }))
+                })])
             
             else:
                 logger.warning(f'نوع رسالة غير معروف: {message_type}')
         
         except json.JSONDecodeError:
             logger.error('خطأ في فك تشفير JSON')
+        except FrameTooLarge as e:
+            # إطار مضغوط يتجاوز الحد المسموح بعد فك الضغط
+            logger.warning(f'إطار كبير جداً من {self.user.email}: {str(e)}')
+            await self.close(code=1009)
         except Exception as e:
             logger.error(f'خطأ في معالجة الرسالة: {str(e)}')
     
     async def handle_sync_request(self, message):
         """
         معالجة طلب المزامنة
+        
+        مع ``since``: إعادة إرسال التغييرات الفائتة فقط بعد آخر رقم تسلسلي استلمه العميل
         """
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'sync_message',
-                'data': {
-                    'type': 'SYNC_COMPLETE',
-                    'userId': str(self.user.id),
-                    'timestamp': datetime.now().isoformat(),
-                    'entity': message.get('entity'),
-                    'entityId': message.get('entityId')
-                }
-            }
-        )
+        if message.get('since') is not None:
+            await self.replay_since(message['since'])
+            return
+        
+        sync_batcher.add(self.channel_layer, self.room_group_name, None, {
+            'type': 'SYNC_COMPLETE',
+            'userId': str(self.user.id),
+            'timestamp': datetime.now().isoformat(),
+            'entity': message.get('entity'),
+            'entityId': message.get('entityId')
+        })
     
     async def handle_update(self, message):
         """
         معالجة التحديثات والبث إلى المستخدمين الآخرين
         """
-        # حفظ التحديث في السجل
-        await self.log_sync_action(message)
-        
-        # بث التحديث إلى جميع المتصلين في نفس الشركة
-        await self.channel_layer.group_send(
+        # بث التحديث إلى جميع المتصلين في نفس الشركة (مجمّعاً على دفعات)
+        # مع حفظه في سجل المزامنة دفعة واحدة عند تفريغ الدفعة
+        sync_batcher.add(
+            self.channel_layer,
             self.room_group_name,
-            {
-                'type': 'sync_message',
-                'data': message,
-                'user_id': str(self.user.id)
-            }
+            str(self.user.id),
+            message,
+            company_id=self.company_id
         )
     
+    async def replay_since(self, since):
+        """
+        إرسال التغييرات بعد الرقم التسلسلي ``since``، أو طلب لقطة كاملة إذا كانت الفجوة كبيرة
+        """
+        from apps.inventory.services import SyncLogService
+        
+        try:
+            since = int(since)
+        except (TypeError, ValueError):
+            logger.warning(f'رقم تسلسلي غير صالح: {since}')
+            return
+        
+        latest, messages = await database_sync_to_async(SyncLogService.read_since)(
+            self.company_id,
+            since,
+            getattr(settings, 'SYNC_REPLAY_LIMIT', 1000)
+        )
+        
+        if messages is None:
+            frame = {'type': 'SYNC_SNAPSHOT_REQUIRED', 'seq': latest}
+        else:
+            frame = {'type': 'SYNC_REPLAY', 'since': since, 'seq': latest, 'messages': messages}
+        
+        self.enqueue_texts([json.dumps(frame)])
+    
     async def sync_message(self, event):
         """
         معالج استقبال رسائل المزامنة من المجموعة
@@ -152,31 +428,85 @@ class SyncConsumer(AsyncWebsocketConsumer):
         if user_id and user_id == str(self.user.id):
             return
         
-        await self.send(json.dumps(data))
+        self.enqueue_texts([json.dumps(data)])
     
-    async def log_sync_action(self, message):
+    async def sync_batch(self, event):
         """
-        تسجيل إجراء المزامنة في قاعدة البيانات
+        معالج استقبال دفعات المزامنة المُسلسلة مسبقاً
         """
-        try:
-            from apps.inventory.models import SyncLog  # قد تحتاج لإنشاء هذا النموذج
-            
-            # حفظ السجل بشكل غير متزامن
-            asyncio.create_task(self._save_sync_log(message))
-        except Exception as e:
-            logger.error(f'خطأ في تسجيل المزامنة: {str(e)}')
+        own_id = str(self.user.id)
+        parts = event['parts']
+        
+        if any(user_id == own_id for user_id, _ in parts):
+            # عدم إرجاع رسائل المستخدم إليه
+            texts = [text for user_id, text in parts if user_id != own_id]
+            if not texts:
+                return
+            self.enqueue_texts(texts)
+        else:
+            # الإطار نفسه مشترك بين جميع المستلمين بنفس الترميز
+            self.enqueue_texts([text for _, text in parts], cache_key=event['batch_id'])
     
-    async def _save_sync_log(self, message):
+    def enqueue_texts(self, texts, cache_key=None):
         """
-        حفظ سجل المزامنة بشكل غير متزامن
+        ترميز رسائل JSON المُسلسلة مسبقاً بترميز هذا الاتصال وإضافتها للطابور
         """
-        from asgiref.sync import sync_to_async
+        if cache_key is None:
+            self.enqueue_frame(self.codec.encode(texts))
+            return
         
-        try:
-            # هذا يحتاج لنموذج SyncLog
-            pass
-        except Exception as e:
-            logger.error(f'خطأ في حفظ السجل: {str(e)}')
+        key = (cache_key, self.codec.name)
+        frame = _sync_frames.get(key)
+        if frame is None:
+            frame = self.codec.encode(texts)
+            _sync_frames.set(key, frame, 10)
+        self.enqueue_frame(frame)
+    
+    def enqueue_frame(self, frame):
+        """
+        إضافة إطار إلى طابور الإرسال المحدود لهذا الاتصال
+        """
+        if len(self.send_queue) >= self.send_queue_size:
+            # العميل بطيء: نستبدل الطابور بطلب إعادة مزامنة واحد
+            logger.warning(f'طابور الإرسال ممتلئ: {self.user.email}')
+            self.send_queue.clear()
+            self.send_queue.append(self.codec.encode([RESYNC_FRAME]))
+        else:
+            self.send_queue.append(frame)
+        self.send_ready.set()
+    
+    async def refresh_membership(self):
+        """
+        تجديد عضوية المجموعة قبل انتهاء صلاحيتها في طبقة القنوات
+        """
+        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+    
+    async def reap(self):
+        """
+        إغلاق اتصال خامل وإزالته من المجموعة فوراً دون انتظار إشعار الخادم
+        """
+        connection_registry.unregister(self)
+        if self.room_group_name:
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+            self.room_group_name = None
+        if self.sender_task:
+            self.sender_task.cancel()
+        logger.info(f'⏱ اتصال خامل: {self.user.email}')
+        await self.close(code=4008)
+    
+    async def drain_send_queue(self):
+        """
+        إرسال الإطارات من الطابور إلى العميل بالترتيب
+        """
+        while True:
+            await self.send_ready.wait()
+            self.send_ready.clear()
+            while self.send_queue:
+                frame = self.send_queue.popleft()
+                if isinstance(frame, bytes):
+                    await self.send(bytes_data=frame)
+                else:
+                    await self.send(text_data=frame)
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -190,32 +520,29 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         الاتصال والانضمام لمجموعة الإشعارات
         """
         self.user = None
+        self.room_group_name = None
+        self.group_names = []
         
         try:
-            # استخراج التوكن
-            query_string = self.scope.get('query_string', b'').decode()
-            params = dict(param.split('=') for param in query_string.split('&') if '=' in param)
-            token_str = params.get('token')
-            
-            if token_str:
-                try:
-                    token = Token.objects.get(key=token_str)
-                    self.user = token.user
-                except Token.DoesNotExist:
-                    await self.close(code=4001)
-                    return
-            else:
+            # المستخدم تمت مصادقته مسبقاً عبر JWTAuthMiddleware
+            user = self.scope.get('user')
+            if not user or not user.is_authenticated:
                 await self.close(code=4001)
                 return
             
-            # الانضمام لمجموعة الإشعارات الشخصية
+            self.user = user
+            
+            # الانضمام لمجموعة الإشعارات الشخصية ومجموعة إشعارات الشركة
             self.room_group_name = f'notifications_user_{self.user.id}'
-            await self.channel_layer.group_add(
-                self.room_group_name,
-                self.channel_name
-            )
+            self.group_names = [self.room_group_name]
+            if self.scope.get('company_id'):
+                self.group_names.append(f"notifications_company_{self.scope['company_id']}")
+            for group_name in self.group_names:
+                await self.channel_layer.group_add(group_name, self.channel_name)
             
             await self.accept()
+            # تنتهي العضويات من طبقة القنوات ما لم تُجدَّد (SYNC_GROUP_EXPIRY)
+            connection_registry.register_member(self)
             logger.info(f'🔔 متصل للإشعارات: {self.user.email}')
             
         except Exception as e:
@@ -226,11 +553,16 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         """
         قطع الاتصال
         """
-        if self.room_group_name:
-            await self.channel_layer.group_discard(
-                self.room_group_name,
-                self.channel_name
-            )
+        connection_registry.unregister_member(self)
+        for group_name in self.group_names:
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+    
+    async def refresh_membership(self):
+        """
+        تجديد عضويات المجموعات قبل انتهاء صلاحيتها في طبقة القنوات
+        """
+        for group_name in self.group_names:
+            await self.channel_layer.group_add(group_name, self.channel_name)
     
     async def receive(self, text_data):
         """
@@ -321,16 +653,16 @@ async def broadcast_sync_update(company_id, entity_type, entity_id, action, data
     """
     channel_layer = get_channel_layer()
     
+    # تسلسل الرسالة مرة واحدة لجميع المستلمين
+    text = json.dumps({
+        'type': action,
+        'entity': entity_type,
+        'entityId': entity_id,
+        'data': data,
+        'timestamp': datetime.now().isoformat()
+    })
+    
     await channel_layer.group_send(
         f'sync_company_{company_id}',
-        {
-            'type': 'sync_message',
-            'data': {
-                'type': action,
-                'entity': entity_type,
-                'entityId': entity_id,
-                'data': data,
-                'timestamp': datetime.now().isoformat()
-            }
-        }
+        build_sync_event([(None, text)])
     )
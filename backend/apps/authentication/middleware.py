@@ -0,0 +1,69 @@
+import logging
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.companies.cache import LocalLRUCache
+from .authentication import CachedJWTAuthentication
+
+logger = logging.getLogger(__name__)
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate WebSocket connections with the API's SimpleJWT access tokens.
+
+    The token is read from the ``token`` query-string parameter and verified
+    statelessly (signature and expiry, no database access). The user is then
+    resolved from a short-lived in-process cache, falling back to
+    ``CachedJWTAuthentication`` off the event loop, which itself is served
+    from the shared user cache. ``scope['user']`` and ``scope['company_id']``
+    are populated for the consumers.
+    """
+
+    def __init__(self, inner):
+        super().__init__(inner)
+        self.authentication = CachedJWTAuthentication()
+        self.timeout = getattr(settings, 'WEBSOCKET_AUTH_CACHE_TIMEOUT', 30)
+        self.users = LocalLRUCache(getattr(settings, 'WEBSOCKET_AUTH_CACHE_MAX_ENTRIES', 10000))
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        user = await self.get_user(self.get_token(scope))
+        scope['user'] = user
+        scope['company_id'] = getattr(user, 'company_id', None)
+        return await super().__call__(scope, receive, send)
+
+    def get_token(self, scope):
+        """Extract the raw access token from the query string."""
+        params = parse_qs(scope.get('query_string', b'').decode())
+        values = params.get('token')
+        return values[0] if values else None
+
+    async def get_user(self, raw_token):
+        """Resolve the user of a raw token, or AnonymousUser when invalid."""
+        if not raw_token:
+            return AnonymousUser()
+
+        try:
+            validated_token = AccessToken(raw_token)
+        except TokenError:
+            return AnonymousUser()
+
+        user_id = validated_token.payload.get(api_settings.USER_ID_CLAIM)
+        user = self.users.get(user_id)
+        if user is not None:
+            return user
+
+        try:
+            user = await database_sync_to_async(self.authentication.get_user)(validated_token)
+        except (AuthenticationFailed, InvalidToken) as e:
+            logger.warning(f'WebSocket authentication failed: {str(e)}')
+            return AnonymousUser()
+
+        self.users.set(user_id, user, self.timeout)
+        return user
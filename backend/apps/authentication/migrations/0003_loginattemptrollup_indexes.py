@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginAttemptRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('kind', models.CharField(choices=[('email', 'Email'), ('ip', 'IP Address')], max_length=10, verbose_name='kind')),
+                ('value', models.CharField(max_length=254, verbose_name='value')),
+                ('success_count', models.PositiveIntegerField(default=0, verbose_name='successful attempts')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='failed attempts')),
+                ('blocked_count', models.PositiveIntegerField(default=0, verbose_name='blocked attempts')),
+            ],
+            options={
+                'verbose_name': 'Login Attempt Rollup',
+                'verbose_name_plural': 'Login Attempt Rollups',
+                'ordering': ['-date'],
+                'unique_together': {('date', 'kind', 'value')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='loginattempt',
+            index=models.Index(fields=['created_at'], name='loginattempt_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginattempt',
+            index=models.Index(fields=['email', 'created_at'], name='loginattempt_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginattempt',
+            index=models.Index(fields=['ip_address', 'created_at'], name='loginattempt_ip_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersession',
+            index=models.Index(fields=['is_active', 'last_activity'], name='usersession_active_idx'),
+        ),
+    ]
@@ -24,6 +24,9 @@ class UserSession(models.Model):
         verbose_name_plural = _('User Sessions')
         unique_together = ['session_key']
         ordering = ['-last_activity']
+        indexes = [
+            models.Index(fields=['is_active', 'last_activity'], name='usersession_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.session_key[:10]}..."
@@ -75,10 +78,39 @@ class LoginAttempt(models.Model):
         verbose_name = _('Login Attempt')
         verbose_name_plural = _('Login Attempts')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='loginattempt_created_idx'),
+            models.Index(fields=['email', 'created_at'], name='loginattempt_email_idx'),
+            models.Index(fields=['ip_address', 'created_at'], name='loginattempt_ip_idx'),
+        ]
 
     def __str__(self):
         return f"{self.email} - {self.status} - {self.created_at}"
 
+class LoginAttemptRollup(models.Model):
+    """Daily login attempt counters per email or IP address, kept after raw attempts are pruned."""
+
+    KINDS = (
+        ('email', _('Email')),
+        ('ip', _('IP Address')),
+    )
+
+    date = models.DateField(_('date'))
+    kind = models.CharField(_('kind'), max_length=10, choices=KINDS)
+    value = models.CharField(_('value'), max_length=254)
+    success_count = models.PositiveIntegerField(_('successful attempts'), default=0)
+    failed_count = models.PositiveIntegerField(_('failed attempts'), default=0)
+    blocked_count = models.PositiveIntegerField(_('blocked attempts'), default=0)
+
+    class Meta:
+        verbose_name = _('Login Attempt Rollup')
+        verbose_name_plural = _('Login Attempt Rollups')
+        unique_together = ['date', 'kind', 'value']
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date} - {self.value}"
+
 class TwoFactorAuth(models.Model):
     """Two-factor authentication model for users."""
 
@@ -0,0 +1,104 @@
+"""
+Sliding-window rate limiting for unauthenticated endpoints.
+
+Counters live in the default cache (Redis in production, local memory in
+development and tests). Each limiter keeps one counter per fixed window and
+estimates the sliding count as ``current + previous * overlap``, which costs
+a few cache round trips per check and keeps no per-request state.
+"""
+
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindowLimiter:
+    """Allow at most ``limit`` hits per ``window`` seconds for each identifier."""
+
+    def __init__(self, name, limit, window):
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    @classmethod
+    def from_settings(cls, name):
+        limit, window = settings.AUTH_RATE_LIMITS[name]
+        return cls(name, limit, window)
+
+    def _keys(self, identifier, now):
+        index = int(now // self.window)
+        prefix = f'ratelimit:{self.name}:{str(identifier).lower()}'
+        return f'{prefix}:{index}', f'{prefix}:{index - 1}', index
+
+    def _estimate(self, current, previous, index, now):
+        elapsed = (now - index * self.window) / self.window
+        return current + previous * (1 - elapsed)
+
+    def _retry_after(self, now):
+        return max(1, int(self.window - now % self.window))
+
+    def peek(self, identifier):
+        """Return seconds until ``identifier`` may retry, or 0 if allowed."""
+        if not identifier:
+            return 0
+        now = time.time()
+        current_key, previous_key, index = self._keys(identifier, now)
+        try:
+            counts = cache.get_many([current_key, previous_key])
+        except Exception as e:
+            logger.warning(f'Rate limiter unavailable: {str(e)}')
+            return 0
+
+        count = self._estimate(counts.get(current_key, 0), counts.get(previous_key, 0), index, now)
+        return self._retry_after(now) if count >= self.limit else 0
+
+    def hit(self, identifier):
+        """
+        Count one hit for ``identifier`` and return seconds until it may
+        retry, or 0 if the hit is within the limit.
+        """
+        if not identifier:
+            return 0
+        now = time.time()
+        current_key, previous_key, index = self._keys(identifier, now)
+        try:
+            cache.add(current_key, 0, timeout=self.window * 2)
+            current = cache.incr(current_key)
+            previous = cache.get(previous_key, 0)
+        except Exception as e:
+            logger.warning(f'Rate limiter unavailable: {str(e)}')
+            return 0
+
+        count = self._estimate(current, previous, index, now)
+        return self._retry_after(now) if count > self.limit else 0
+
+    def reset(self, identifier):
+        """Forget the hits of ``identifier``."""
+        if not identifier:
+            return
+        current_key, previous_key, _index = self._keys(identifier, time.time())
+        try:
+            cache.delete_many([current_key, previous_key])
+        except Exception as e:
+            logger.warning(f'Rate limiter unavailable: {str(e)}')
+
+
+login_ip_limiter = SlidingWindowLimiter.from_settings('login_ip')
+login_email_limiter = SlidingWindowLimiter.from_settings('login_email')
+password_reset_ip_limiter = SlidingWindowLimiter.from_settings('password_reset_ip')
+password_reset_email_limiter = SlidingWindowLimiter.from_settings('password_reset_email')
+
+
+def rate_limited_response(retry_after):
+    """Build the 429 response for a blocked request."""
+    return Response(
+        {'error': _('Too many attempts. Please try again later.')},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(retry_after)}
+    )
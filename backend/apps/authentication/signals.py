@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from apps.companies.models import Company
+from .authentication import invalidate_cached_users
+
+
+def invalidate_user(sender, instance, **kwargs):
+    """Drop the cached authenticated user after it changes."""
+    transaction.on_commit(lambda: invalidate_cached_users([instance.pk]))
+
+
+def invalidate_company_users(sender, instance, **kwargs):
+    """Drop every cached user of a company after the company changes."""
+    user_ids = list(instance.users.values_list('id', flat=True)) if instance.pk else []
+    if user_ids:
+        transaction.on_commit(lambda: invalidate_cached_users(user_ids))
+
+
+for signal in (post_save, post_delete):
+    signal.connect(invalidate_user, sender=settings.AUTH_USER_MODEL, dispatch_uid=f'auth_user_cache_{signal}')
+    signal.connect(invalidate_company_users, sender=Company, dispatch_uid=f'auth_company_cache_{signal}')
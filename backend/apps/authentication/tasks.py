@@ -0,0 +1,12 @@
+from celery import shared_task
+from django.conf import settings
+from .utils import rollup_login_attempts, prune_user_sessions
+
+
+@shared_task
+def rollup_auth_history():
+    """Roll old login attempts into daily counters and prune stale sessions."""
+    return {
+        'login_attempts': rollup_login_attempts(settings.LOGIN_ATTEMPT_RETENTION_DAYS),
+        'user_sessions': prune_user_sessions(settings.USER_SESSION_RETENTION_DAYS),
+    }
@@ -0,0 +1,57 @@
+"""
+TOTP verification with a replay guard.
+
+Codes are checked against the ``TwoFactorAuth`` row the caller already
+loaded (``select_related('two_factor_auth')`` on login), so a disabled or
+re-keyed secret takes effect on every worker immediately. Accepted codes
+are recorded per user and time step in the shared cache and rejected if
+presented again.
+"""
+
+import hmac
+import time
+import pyotp
+from django.core.cache import cache
+
+# Time steps accepted on either side of the current one (clock drift)
+VALID_WINDOW = 1
+
+
+class TOTPVerifier:
+    """Verify TOTP codes for users and reject replayed codes."""
+
+    def verify(self, user, token, require_enabled=True, two_factor_auth=None):
+        """
+        Return True if ``token`` is a fresh, valid code for ``user``.
+
+        ``require_enabled=False`` verifies against a secret that is being
+        set up and not yet enabled. ``two_factor_auth`` defaults to the
+        user's row (loaded once per instance). The code is claimed only
+        when it is valid, so call this after every other check passed.
+        """
+        if two_factor_auth is None:
+            two_factor_auth = getattr(user, 'two_factor_auth', None)
+        if two_factor_auth is None or not two_factor_auth.secret:
+            return False
+        if require_enabled and not two_factor_auth.is_enabled:
+            return False
+
+        totp = pyotp.TOTP(two_factor_auth.secret)
+        token = str(token or '').strip()
+        if len(token) != totp.digits or not token.isdigit():
+            return False
+
+        step = int(time.time() // totp.interval)
+        matched = None
+        for candidate in range(step - VALID_WINDOW, step + VALID_WINDOW + 1):
+            if hmac.compare_digest(totp.generate_otp(candidate), token):
+                matched = candidate
+        if matched is None:
+            return False
+
+        # Each (user, time step) code is accepted once across all processes
+        replay_key = f'totp:used:{user.pk}:{matched}'
+        return cache.add(replay_key, 1, timeout=totp.interval * (2 * VALID_WINDOW + 1))
+
+
+totp_verifier = TOTPVerifier()
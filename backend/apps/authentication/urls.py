@@ -15,4 +15,5 @@ urlpatterns = [
     path('2fa/setup/', views.TwoFactorSetupView.as_view(), name='2fa-setup'),
     path('2fa/verify/', views.TwoFactorVerifyView.as_view(), name='2fa-verify'),
     path('2fa/disable/', views.TwoFactorDisableView.as_view(), name='2fa-disable'),
+    path('ws-metrics/', views.ConnectionMetricsView.as_view(), name='ws-metrics'),
 ]
@@ -1,17 +1,35 @@
 
-import qrcode
-import io
-import base64
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from .models import TwoFactorAuth
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from apps.companies.mail import queue_email
+from apps.companies.qr import render_qr, qr_data_uri
+from .totp import totp_verifier
+from .models import TwoFactorAuth, LoginAttempt, LoginAttemptRollup, UserSession
 import pyotp
 
 
+def get_client_ip(request):
+    """
+    Get client IP address.
+
+    Only the X-Forwarded-For entries appended by the ``TRUSTED_PROXY_COUNT``
+    trusted proxies are used; anything to their left is client supplied.
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and x_forwarded_for:
+        entries = [entry.strip() for entry in x_forwarded_for.split(',') if entry.strip()]
+        if len(entries) >= proxies:
+            return entries[-proxies]
+    return request.META.get('REMOTE_ADDR')
+
+
 def send_password_reset_email(user, token):
-    """Send password reset email to user."""
+    """Queue the password reset email for the user."""
     subject = _('Password Reset for Zimam ERP')
     message = (
         f"Hello {user.first_name} {user.last_name},\n\n"
@@ -24,13 +42,7 @@ def send_password_reset_email(user, token):
         f"The Zimam ERP Team"
     )
 
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        fail_silently=False,
-    )
+    queue_email(subject, message, [user.email])
 
 
 def generate_2fa_token(user):
@@ -49,37 +61,90 @@ def generate_2fa_token(user):
         issuer_name='Zimam ERP'
     )
 
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(provisioning_uri)
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color="black", back_color="white")
-
-    # Convert image to base64
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    img_str = base64.b64encode(buffer.getvalue()).decode()
+    # The URI embeds the secret, so it is never written to the shared cache
+    img_str = render_qr(provisioning_uri, 'png', use_cache=False)
 
     return {
         'secret': two_factor_auth.secret,
-        'qr_code': f"data:image/png;base64,{img_str}"
+        'qr_code': qr_data_uri(img_str, 'png')
     }
 
 
-def verify_2fa_token(user, token):
-    """Verify a 2FA token for user."""
-    try:
-        two_factor_auth = TwoFactorAuth.objects.get(user=user)
-
-        if not two_factor_auth.is_enabled:
-            return False
-
-        totp = pyotp.TOTP(two_factor_auth.secret)
-        return totp.verify(token, valid_window=1)  # Allow 1 step tolerance
-    except TwoFactorAuth.DoesNotExist:
-        return False
+def verify_2fa_token(user, token, require_enabled=True, two_factor_auth=None):
+    """Verify a 2FA token for user, rejecting codes that were already used."""
+    return totp_verifier.verify(user, token, require_enabled=require_enabled, two_factor_auth=two_factor_auth)
+
+
+def _rollup_attempt_chunk(ids):
+    """Fold one chunk of raw login attempts into the daily counters and delete it."""
+    attempts = LoginAttempt.objects.filter(pk__in=ids).annotate(date=TruncDate('created_at'))
+
+    counters = {}
+    for kind, field in (('email', 'email'), ('ip', 'ip_address')):
+        rows = attempts.values('date', field, 'status').annotate(total=Count('id')).order_by()
+        for row in rows:
+            key = (row['date'], kind, row[field] or '')
+            counters.setdefault(key, {'success': 0, 'failed': 0, 'blocked': 0})
+            counters[key][row['status']] = counters[key].get(row['status'], 0) + row['total']
+
+    existing = {}
+    for date in {key[0] for key in counters}:
+        for rollup in LoginAttemptRollup.objects.filter(
+            date=date,
+            value__in=[key[2] for key in counters if key[0] == date]
+        ):
+            existing[(rollup.date, rollup.kind, rollup.value)] = rollup
+
+    to_update, to_create = [], []
+    for key, counts in counters.items():
+        rollup = existing.get(key) or LoginAttemptRollup(date=key[0], kind=key[1], value=key[2])
+        rollup.success_count += counts['success']
+        rollup.failed_count += counts['failed']
+        rollup.blocked_count += counts['blocked']
+        (to_update if rollup.pk else to_create).append(rollup)
+
+    LoginAttemptRollup.objects.bulk_update(to_update, ['success_count', 'failed_count', 'blocked_count'])
+    LoginAttemptRollup.objects.bulk_create(to_create)
+    LoginAttempt.objects.filter(pk__in=ids).delete()
+
+
+def rollup_login_attempts(retention_days, chunk_size=5000):
+    """
+    Aggregate login attempts older than ``retention_days`` into daily
+    per-email and per-IP counters, deleting the raw rows in chunks.
+
+    Every chunk is counted and deleted in its own transaction, so an
+    interrupted run neither double counts nor holds long locks.
+    """
+    cutoff = timezone.now() - timezone.timedelta(days=retention_days)
+    processed = 0
+
+    while True:
+        ids = list(
+            LoginAttempt.objects.filter(created_at__lt=cutoff)
+            .order_by('created_at')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return processed
+
+        with transaction.atomic():
+            _rollup_attempt_chunk(ids)
+        processed += len(ids)
+
+
+def prune_user_sessions(retention_days, chunk_size=5000):
+    """Delete inactive user sessions idle for longer than ``retention_days``, in chunks."""
+    cutoff = timezone.now() - timezone.timedelta(days=retention_days)
+    deleted = 0
+
+    while True:
+        ids = list(
+            UserSession.objects.filter(is_active=False, last_activity__lt=cutoff)
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+
+        count, _deleted = UserSession.objects.filter(pk__in=ids).delete()
+        deleted += count
@@ -1,5 +1,5 @@
 
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import logout
 from django.contrib.auth.password_validation import validate_password
 from django.utils import timezone
 from rest_framework import status, permissions
@@ -8,9 +8,15 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils.translation import gettext_lazy as _
-from .models import UserSession, PasswordReset, LoginAttempt, TwoFactorAuth
+from .models import UserSession, PasswordReset, TwoFactorAuth
 from apps.users.models import User
-from .utils import send_password_reset_email, generate_2fa_token, verify_2fa_token
+from .utils import send_password_reset_email, generate_2fa_token, verify_2fa_token, get_client_ip
+from .audit import auth_audit
+from .ratelimit import (
+    login_ip_limiter, login_email_limiter,
+    password_reset_ip_limiter, password_reset_email_limiter,
+    rate_limited_response,
+)
 import random
 import string
 
@@ -29,22 +35,49 @@ class LoginView(APIView):
         ip_address = self.get_client_ip(request)
         user_agent = request.META.get('HTTP_USER_AGENT', '')
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            # Record failed login attempt
-            LoginAttempt.objects.create(
-                email=email,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                status='failed'
+        # Throttle before touching the database or hashing the password
+        retry_after = login_ip_limiter.hit(ip_address) or login_email_limiter.peek(email)
+        if retry_after:
+            auth_audit.record_attempt(email, ip_address, user_agent, 'blocked')
+            return rate_limited_response(retry_after)
+
+        # One query: the user with its company and 2FA settings
+        user = User.objects.select_related('company', 'two_factor_auth').filter(email=email).first()
+        if user is None:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            User().set_password(password)
+            login_email_limiter.hit(email)
+            auth_audit.record_attempt(email, ip_address, user_agent, 'failed')
+            return Response(
+                {'error': _('Invalid credentials')},
+                status=status.HTTP_401_UNAUTHORIZED
             )
+
+        # Authenticate user against the already loaded row
+        if not user.check_password(password):
+            login_email_limiter.hit(email)
+            auth_audit.record_attempt(email, ip_address, user_agent, 'failed')
             return Response(
                 {'error': _('Invalid credentials')},
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        # Check if 2FA is enabled
+        # Check if user is active
+        if not user.is_active:
+            return Response(
+                {'error': _('Account is disabled')},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        # Check if company subscription is active
+        if not user.company.is_subscription_active:
+            return Response(
+                {'error': _('Company subscription has expired')},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        # Check 2FA last: a valid code is used up when verified, so it must
+        # not be spent on a login that fails for another reason
         two_factor_auth = getattr(user, 'two_factor_auth', None)
         if two_factor_auth and two_factor_auth.is_enabled:
             if not two_factor_code:
@@ -53,96 +86,40 @@ class LoginView(APIView):
                     status=status.HTTP_401_UNAUTHORIZED
                 )
 
-            if not verify_2fa_token(user, two_factor_code):
-                LoginAttempt.objects.create(
-                    email=email,
-                    ip_address=ip_address,
-                    user_agent=user_agent,
-                    status='failed'
-                )
+            if not verify_2fa_token(user, two_factor_code, two_factor_auth=two_factor_auth):
+                login_email_limiter.hit(email)
+                auth_audit.record_attempt(email, ip_address, user_agent, 'failed')
                 return Response(
                     {'error': _('Invalid two-factor authentication code')},
                     status=status.HTTP_401_UNAUTHORIZED
                 )
 
-        # Authenticate user
-        authenticated_user = authenticate(request, username=email, password=password)
-
-        if authenticated_user:
-            # Check if user is active
-            if not authenticated_user.is_active:
-                return Response(
-                    {'error': _('Account is disabled')},
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
-
-            # Check if company subscription is active
-            if not authenticated_user.company.is_subscription_active:
-                return Response(
-                    {'error': _('Company subscription has expired')},
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
+        # Generate JWT tokens; the refresh token ID identifies the session
+        refresh = RefreshToken.for_user(user)
 
-            # Log in user
-            login(request, authenticated_user)
-
-            # Create user session
-            session_key = request.session.session_key
-            UserSession.objects.update_or_create(
-                user=authenticated_user,
-                defaults={
-                    'session_key': session_key,
-                    'ip_address': ip_address,
-                    'user_agent': user_agent,
-                    'is_active': True,
-                }
-            )
+        login_email_limiter.reset(email)
 
-            # Record successful login attempt
-            LoginAttempt.objects.create(
-                email=email,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                status='success'
-            )
-
-            # Generate JWT tokens
-            refresh = RefreshToken.for_user(authenticated_user)
+        # Session, last_login and attempt rows are written in batches
+        auth_audit.record_login(user.id, refresh['jti'], ip_address, user_agent)
+        auth_audit.record_attempt(email, ip_address, user_agent, 'success')
 
-            return Response({
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-                'user': {
-                    'id': authenticated_user.id,
-                    'email': authenticated_user.email,
-                    'first_name': authenticated_user.first_name,
-                    'last_name': authenticated_user.last_name,
-                    'role': authenticated_user.role,
-                    'company': authenticated_user.company.id,
-                    'is_company_admin': authenticated_user.is_company_admin,
-                }
-            })
-        else:
-            # Record failed login attempt
-            LoginAttempt.objects.create(
-                email=email,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                status='failed'
-            )
-            return Response(
-                {'error': _('Invalid credentials')},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
+        return Response({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+            'user': {
+                'id': user.id,
+                'email': user.email,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'role': user.role,
+                'company': user.company_id,
+                'is_company_admin': user.is_company_admin,
+            }
+        })
 
     def get_client_ip(self, request):
         """Get client IP address."""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return get_client_ip(request)
 
 
 class LogoutView(APIView):
@@ -152,18 +129,17 @@ class LogoutView(APIView):
 
     def post(self, request):
         try:
-            # Deactivate user session
-            session_key = request.session.session_key
-            if session_key:
+            refresh_token = request.data.get('refresh')
+            if refresh_token:
+                token = RefreshToken(refresh_token)
+
+                # Deactivate user session
                 UserSession.objects.filter(
                     user=request.user,
-                    session_key=session_key
+                    session_key=token['jti']
                 ).update(is_active=False)
 
-            # Blacklist JWT token
-            refresh_token = request.data.get('refresh')
-            if refresh_token:
-                token = RefreshToken(refresh_token)
+                # Blacklist JWT token
                 token.blacklist()
 
             return Response({'message': _('Successfully logged out')})
@@ -187,16 +163,10 @@ class RefreshTokenView(APIView):
             # Check if user session is active
             user_id = token.payload.get('user_id')
             if user_id:
-                try:
-                    user = User.objects.get(id=user_id)
-                    session_key = request.session.session_key
-                    if session_key:
-                        UserSession.objects.filter(
-                            user=user,
-                            session_key=session_key
-                        ).update(is_active=True)
-                except User.DoesNotExist:
-                    pass
+                UserSession.objects.filter(
+                    user_id=user_id,
+                    session_key=token['jti']
+                ).update(is_active=True)
 
             access_token = str(token.access_token)
             return Response({'access': access_token})
@@ -305,6 +275,14 @@ class PasswordResetView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Throttle before looking the user up or sending mail
+        retry_after = (
+            password_reset_ip_limiter.hit(get_client_ip(request))
+            or password_reset_email_limiter.hit(email)
+        )
+        if retry_after:
+            return rate_limited_response(retry_after)
+
         try:
             user = User.objects.get(email=email)
 
@@ -421,9 +399,7 @@ class TwoFactorSetupView(APIView):
         # Generate QR code for app
         if two_factor_auth.method == 'app':
             import pyotp
-            import qrcode
-            import io
-            import base64
+            from apps.companies.qr import render_qr
 
             totp = pyotp.TOTP(two_factor_auth.secret)
             provisioning_uri = totp.provisioning_uri(
@@ -431,19 +407,8 @@ class TwoFactorSetupView(APIView):
                 issuer_name='Zimam ERP'
             )
 
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(provisioning_uri)
-            qr.make(fit=True)
-
-            img = qr.make_image(fill_color="black", back_color="white")
-            buffer = io.BytesIO()
-            img.save(buffer, format='PNG')
-            qr_code = base64.b64encode(buffer.getvalue()).decode()
+            # The URI embeds the secret, so it is never written to the shared cache
+            qr_code = render_qr(provisioning_uri, 'png', use_cache=False)
 
             return Response({
                 'enabled': False,
@@ -472,8 +437,8 @@ class TwoFactorSetupView(APIView):
         # Get or create 2FA record
         two_factor_auth, created = TwoFactorAuth.objects.get_or_create(user=user)
 
-        # Verify code
-        if not verify_2fa_token(user, code):
+        # Verify code against the secret being enabled
+        if not verify_2fa_token(user, code, require_enabled=False, two_factor_auth=two_factor_auth):
             return Response(
                 {'error': _('Invalid verification code')},
                 status=status.HTTP_400_BAD_REQUEST
@@ -554,3 +519,28 @@ class TwoFactorDisableView(APIView):
             return Response({
                 'message': _('Two-factor authentication is not enabled')
             })
+
+
+class ConnectionMetricsView(APIView):
+    """View for live WebSocket sync connection counts."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        from .consumers import connection_registry
+
+        try:
+            metrics = connection_registry.collect()
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        if request.user.is_superuser:
+            return Response(metrics)
+
+        return Response({
+            'workers': metrics['workers'],
+            'connections': metrics['companies'].get(request.user.company_id, 0)
+        })
@@ -0,0 +1,205 @@
+"""
+Tenant-scoped read cache for hot reference data.
+
+Entries are namespaced per company and per data set (``products``,
+``customers``...). Every namespace has a version counter stored in the shared
+cache; bumping it orphans all entries of that namespace at once, so writers
+never have to enumerate keys. A small in-process LRU sits in front of the
+shared cache (Redis in production) to skip the network round trip and
+unpickling for the hottest keys.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LocalLRUCache:
+    """Thread-safe, size-bounded in-process cache with per-entry expiry."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TenantCache:
+    """Two-tier (local LRU + shared cache) cache with versioned tenant keys."""
+
+    def __init__(self, alias='default'):
+        options = getattr(settings, 'TENANT_CACHE', {})
+        self.alias = alias
+        self.timeout = options.get('TIMEOUT', 300)
+        # How long a process trusts its local copy of a namespace version
+        # before asking the shared cache again. Bounds cross-process staleness.
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.local = LocalLRUCache(options.get('LOCAL_MAX_ENTRIES', 1024))
+        self._stats = defaultdict(lambda: {'local_hits': 0, 'shared_hits': 0, 'misses': 0})
+        self._stats_lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _version_key(self, company_id, namespace):
+        return f'tenant:{company_id}:{namespace}:version'
+
+    def _entry_key(self, company_id, namespace, version, key):
+        digest = hashlib.md5(str(key).encode()).hexdigest()
+        return f'tenant:{company_id}:{namespace}:v{version}:{digest}'
+
+    def _record(self, namespace, outcome):
+        with self._stats_lock:
+            self._stats[namespace][outcome] += 1
+
+    def get_version(self, company_id, namespace):
+        """Return the current version of a tenant namespace."""
+        version_key = self._version_key(company_id, namespace)
+        version = self.local.get(version_key)
+        if version is not None:
+            return version
+
+        try:
+            version = self.shared.get(version_key)
+            if version is None:
+                self.shared.add(version_key, 1, timeout=None)
+                version = self.shared.get(version_key, 1)
+        except Exception as e:
+            logger.warning(f'Tenant cache unavailable: {str(e)}')
+            version = 0
+
+        self.local.set(version_key, version, self.local_timeout)
+        return version
+
+    def get(self, company_id, namespace, key, default=None):
+        """Look a value up in the local tier, then in the shared tier."""
+        version = self.get_version(company_id, namespace)
+        entry_key = self._entry_key(company_id, namespace, version, key)
+
+        value = self.local.get(entry_key, _MISSING)
+        if value is not _MISSING:
+            self._record(namespace, 'local_hits')
+            return value
+
+        try:
+            value = self.shared.get(entry_key, _MISSING)
+        except Exception as e:
+            logger.warning(f'Tenant cache unavailable: {str(e)}')
+            value = _MISSING
+
+        if value is _MISSING:
+            self._record(namespace, 'misses')
+            return default
+
+        self._record(namespace, 'shared_hits')
+        self.local.set(entry_key, value, min(self.local_timeout, self.timeout))
+        return value
+
+    def set(self, company_id, namespace, key, value, timeout=None):
+        """Store a value in both tiers under the current namespace version."""
+        timeout = self.timeout if timeout is None else timeout
+        version = self.get_version(company_id, namespace)
+        entry_key = self._entry_key(company_id, namespace, version, key)
+
+        self.local.set(entry_key, value, min(self.local_timeout, timeout))
+        try:
+            self.shared.set(entry_key, value, timeout=timeout)
+        except Exception as e:
+            logger.warning(f'Tenant cache unavailable: {str(e)}')
+
+    def get_or_set(self, company_id, namespace, key, default, timeout=None):
+        """Return the cached value, computing and storing it on a miss."""
+        value = self.get(company_id, namespace, key, _MISSING)
+        if value is _MISSING:
+            value = default() if callable(default) else default
+            self.set(company_id, namespace, key, value, timeout)
+        return value
+
+    def invalidate(self, company_id, namespace):
+        """Bump the namespace version so every existing entry is ignored."""
+        version_key = self._version_key(company_id, namespace)
+        try:
+            self.shared.add(version_key, 1, timeout=None)
+            version = self.shared.incr(version_key)
+        except Exception as e:
+            logger.warning(f'Tenant cache invalidation failed: {str(e)}')
+            self.local.clear()
+            return
+
+        self.local.set(version_key, version, self.local_timeout)
+
+    def invalidate_on_commit(self, company_id, *namespaces):
+        """
+        Invalidate once the current transaction commits, so a concurrent
+        reader cannot re-populate the cache with pre-commit rows.
+        """
+        def bump():
+            for namespace in namespaces:
+                self.invalidate(company_id, namespace)
+
+        transaction.on_commit(bump)
+
+    def stats(self):
+        """Return hit/miss counters per namespace."""
+        with self._stats_lock:
+            result = {}
+            for namespace, counters in self._stats.items():
+                lookups = sum(counters.values())
+                hits = counters['local_hits'] + counters['shared_hits']
+                result[namespace] = dict(
+                    counters,
+                    hit_ratio=round(hits / lookups, 4) if lookups else 0.0
+                )
+            return result
+
+
+tenant_cache = TenantCache()
+
+
+def invalidate_tenant_namespaces(*namespaces):
+    """
+    Build a post_save/post_delete receiver that invalidates the given
+    namespaces for the saved instance's company.
+    """
+    def receiver(sender, instance, **kwargs):
+        company_id = getattr(instance, 'company_id', None)
+        if company_id is not None:
+            tenant_cache.invalidate_on_commit(company_id, *namespaces)
+
+    return receiver
@@ -0,0 +1,164 @@
+"""
+Idempotency-Key support for write requests.
+
+A client that may retry a write (payments, invoices, goods receipts...)
+sends a unique ``Idempotency-Key`` header. The first request with a key is
+processed normally and its response is stored in the shared cache (Redis in
+production) for ``IDEMPOTENCY_KEY_TTL`` seconds, together with a hash of
+the request. A retry with the same key and the same request gets the stored
+response back without reaching the view, so it cannot pay or receive stock
+twice. Reusing a key for a different request is rejected.
+
+A lock held while the first request runs makes a concurrent duplicate
+fail fast with 409 instead of running the view a second time; the client
+retries it and gets the stored response. The lock holds a token unique to
+its request and is only released by that request, and it lives
+``IDEMPOTENCY_LOCK_TIMEOUT`` seconds, which must cover the longest request.
+
+Keys are scoped per user, so two users can never see each other's
+responses. Requests without a key or without credentials pass through.
+"""
+
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.utils.translation import gettext_lazy as _
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAY_HEADER = 'Idempotent-Replayed'
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+MAX_KEY_LENGTH = 255
+
+# Responses that depend on the moment rather than on the request are not
+# stored, so retrying them runs the request again
+UNSTORED_STATUSES = {401, 403, 408, 409, 423, 429}
+
+
+def _user_scope(request):
+    """Identify the caller: the JWT user id claim or the session user."""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+    from rest_framework_simplejwt.settings import api_settings
+
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is not None:
+        raw_token = authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        try:
+            token = authentication.get_validated_token(raw_token)
+        except (InvalidToken, TokenError):
+            return None
+        return token.get(api_settings.USER_ID_CLAIM)
+
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+    return None
+
+
+def _fingerprint(request):
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b'\0')
+    digest.update(request.get_full_path().encode())
+    digest.update(b'\0')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _error(message, status, **headers):
+    response = JsonResponse({'error': str(message)}, status=status)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+class IdempotencyMiddleware:
+    """Replay the stored response of write requests retried with the same key."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.ttl = settings.IDEMPOTENCY_KEY_TTL
+        self.lock_timeout = settings.IDEMPOTENCY_LOCK_TIMEOUT
+
+    @property
+    def cache(self):
+        return caches['default']
+
+    def __call__(self, request):
+        key = request.META.get(HEADER)
+        if not key or request.method not in WRITE_METHODS:
+            return self.get_response(request)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(
+                _('Idempotency-Key must be at most {} characters').format(MAX_KEY_LENGTH), 400
+            )
+
+        user_id = _user_scope(request)
+        if user_id is None:
+            # Unauthenticated: the view answers 401 and there is nothing to protect
+            return self.get_response(request)
+
+        scope = hashlib.sha256(f'{user_id}:{key}'.encode()).hexdigest()
+        response_key = f'idempotency:{scope}'
+        lock_key = f'idempotency:{scope}:lock'
+        fingerprint = _fingerprint(request)
+
+        stored = self.cache.get(response_key)
+        if stored is not None:
+            return self._replay(stored, fingerprint)
+
+        token = uuid.uuid4().hex
+        if not self.cache.add(lock_key, token, self.lock_timeout):
+            return _error(
+                _('A request with this Idempotency-Key is still being processed'), 409,
+                **{'Retry-After': '1'}
+            )
+
+        try:
+            # The first request may have finished between the lookup and the lock
+            stored = self.cache.get(response_key)
+            if stored is not None:
+                return self._replay(stored, fingerprint)
+
+            response = self.get_response(request)
+            if self._storable(response):
+                self.cache.set(response_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'headers': [
+                        (name, value) for name, value in response.items()
+                        if name.lower() not in ('set-cookie', 'vary')
+                    ],
+                    'content': response.content,
+                }, self.ttl)
+            return response
+        finally:
+            self._release(lock_key, token)
+
+    def _release(self, lock_key, token):
+        # Only drop our own lock: if it expired, a retry may hold it now
+        if self.cache.get(lock_key) == token:
+            self.cache.delete(lock_key)
+
+    def _storable(self, response):
+        return (
+            not response.streaming
+            and response.status_code < 500
+            and response.status_code not in UNSTORED_STATUSES
+        )
+
+    def _replay(self, stored, fingerprint):
+        if stored['fingerprint'] != fingerprint:
+            return _error(_('Idempotency-Key was already used for a different request'), 422)
+
+        response = HttpResponse(stored['content'], status=stored['status'])
+        for name, value in stored['headers']:
+            response[name] = value
+        response[REPLAY_HEADER] = 'true'
+        return response
@@ -0,0 +1,260 @@
+"""
+Outbound email queue.
+
+Messages are built as ``EmailMessage`` objects in the request, serialized
+to JSON-safe payloads and handed to the ``send_emails`` Celery task once
+the current transaction commits. Workers deliver them in batches over one
+SMTP connection per worker thread that stays open between tasks. Each
+message succeeds or fails on its own: messages the server rejects outright
+(5xx) are logged and dropped, and the task retries only the messages that
+failed temporarily, with exponential backoff.
+
+The backend is the regular ``EMAIL_BACKEND`` setting, so tests (Django's
+runner switches to the locmem backend) and local development
+(``django.core.mail.backends.filebased.EmailBackend``) need no SMTP server.
+With ``EMAIL_QUEUE_EAGER`` messages are delivered inline instead of queued.
+"""
+
+import atexit
+import base64
+import logging
+import smtplib
+import threading
+import time
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class MailDeliveryError(Exception):
+    """
+    Some messages of a batch failed temporarily. ``pending`` holds their
+    indexes in the batch; ``sent`` messages went out.
+    """
+
+    def __init__(self, sent, pending, error):
+        super().__init__(str(error))
+        self.sent = sent
+        self.pending = pending
+        self.error = error
+
+
+# SMTP errors that make every further message of the batch fail as well
+SMTP_CONNECTION_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    smtplib.SMTPHeloError,
+    smtplib.SMTPAuthenticationError,
+)
+
+
+def is_connection_error(error):
+    """True if the connection failed rather than the message."""
+    if isinstance(error, smtplib.SMTPException):
+        return isinstance(error, SMTP_CONNECTION_ERRORS)
+    # Socket errors (SMTPException is an OSError too)
+    return isinstance(error, OSError)
+
+
+def is_permanent(error):
+    """True if the server rejected the message itself (5xx), so retrying cannot help."""
+    if is_connection_error(error):
+        return False
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _reply in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    # Malformed messages (bad addresses, encodings) fail the same way every time
+    return isinstance(error, (ValueError, TypeError, UnicodeError))
+
+
+def dead_letter(message, error):
+    """Log a message that is dropped for good."""
+    logger.error(f'Dropping email "{message.subject}" to {", ".join(message.to)}: {str(error)}')
+
+
+def build_message(subject, body, to, attachments=(), from_email=None):
+    """
+    Build an ``EmailMessage``. ``attachments`` are ``(filename, content,
+    mimetype)`` tuples; ``content`` may be bytes or an open binary file.
+    """
+    message = EmailMessage(
+        subject=str(subject),
+        body=str(body),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+    for filename, content, mimetype in attachments:
+        if hasattr(content, 'read'):
+            content = content.read()
+        message.attach(filename, content, mimetype)
+    return message
+
+
+def serialize_message(message):
+    """Turn an ``EmailMessage`` into a JSON-safe dict for the task queue."""
+    attachments = []
+    for filename, content, mimetype in message.attachments:
+        if isinstance(content, str):
+            content = content.encode()
+        attachments.append({
+            'filename': filename,
+            'mimetype': mimetype,
+            'content': base64.b64encode(content).decode('ascii'),
+        })
+
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': list(message.to),
+        'cc': list(message.cc),
+        'bcc': list(message.bcc),
+        'reply_to': list(message.reply_to),
+        'attachments': attachments,
+    }
+
+
+def deserialize_message(payload):
+    """Rebuild the ``EmailMessage`` of a queued payload."""
+    message = EmailMessage(
+        subject=payload['subject'],
+        body=payload['body'],
+        from_email=payload['from_email'],
+        to=payload['to'],
+        cc=payload.get('cc'),
+        bcc=payload.get('bcc'),
+        reply_to=payload.get('reply_to'),
+    )
+    for attachment in payload.get('attachments', []):
+        message.attach(
+            attachment['filename'],
+            base64.b64decode(attachment['content']),
+            attachment['mimetype']
+        )
+    return message
+
+
+def get_mail_connection():
+    """
+    Return this thread's open mail connection, reopening it when it has
+    been idle longer than ``EMAIL_CONNECTION_MAX_IDLE`` seconds (SMTP
+    servers drop idle clients).
+    """
+    connection = getattr(_local, 'connection', None)
+    last_used = getattr(_local, 'last_used', 0)
+    if connection is not None and time.monotonic() - last_used > settings.EMAIL_CONNECTION_MAX_IDLE:
+        close_mail_connection()
+        connection = None
+
+    if connection is None:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        _local.connection = connection
+
+    _local.last_used = time.monotonic()
+    return connection
+
+
+def close_mail_connection():
+    """Close this thread's mail connection, if any."""
+    connection = getattr(_local, 'connection', None)
+    _local.connection = None
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception as e:
+            logger.warning(f'Error closing mail connection: {str(e)}')
+
+
+def _send(message):
+    """Send one message, reopening a dropped connection once."""
+    for attempt in range(2):
+        try:
+            get_mail_connection().send_messages([message])
+            return
+        except smtplib.SMTPServerDisconnected:
+            close_mail_connection()
+            if attempt:
+                raise
+
+
+def deliver(messages):
+    """
+    Send messages over the persistent connection, one at a time, and
+    return how many went out.
+
+    A rejected message is dropped (``dead_letter``) and the rest still go
+    out. Messages that failed temporarily raise ``MailDeliveryError`` at
+    the end; when the connection itself fails, all messages not sent yet
+    are pending.
+    """
+    sent = 0
+    pending = []
+    last_error = None
+    for index, message in enumerate(messages):
+        try:
+            _send(message)
+            sent += 1
+        except Exception as e:
+            close_mail_connection()
+            last_error = e
+            if is_permanent(e):
+                dead_letter(message, e)
+            elif is_connection_error(e):
+                pending.extend(range(index, len(messages)))
+                break
+            else:
+                pending.append(index)
+
+    if pending:
+        raise MailDeliveryError(sent, pending, last_error)
+    return sent
+
+
+def queue_emails(messages):
+    """
+    Queue messages for delivery after the current transaction commits.
+
+    Messages are split into batches of ``EMAIL_BATCH_SIZE``. If the broker
+    is unreachable the batch is delivered inline rather than dropped.
+    """
+    payloads = [serialize_message(message) for message in messages]
+    if not payloads:
+        return
+
+    if settings.EMAIL_QUEUE_EAGER:
+        deliver([deserialize_message(payload) for payload in payloads])
+        return
+
+    from .tasks import send_emails
+
+    batch_size = settings.EMAIL_BATCH_SIZE
+    batches = [payloads[i:i + batch_size] for i in range(0, len(payloads), batch_size)]
+
+    def enqueue():
+        for batch in batches:
+            try:
+                send_emails.delay(batch)
+            except Exception as e:
+                logger.warning(f'Could not queue email batch, sending inline: {str(e)}')
+                messages = [deserialize_message(payload) for payload in batch]
+                try:
+                    deliver(messages)
+                except MailDeliveryError as error:
+                    for index in error.pending:
+                        dead_letter(messages[index], error.error)
+
+    transaction.on_commit(enqueue)
+
+
+def queue_email(subject, body, to, attachments=(), from_email=None):
+    """Build one message and queue it. See ``build_message``."""
+    queue_emails([build_message(subject, body, to, attachments, from_email)])
+
+
+atexit.register(close_mail_connection)
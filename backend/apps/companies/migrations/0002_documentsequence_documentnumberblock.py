@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('companies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('invoice', 'Sales Invoice'), ('purchase_order', 'Purchase Order'), ('goods_receipt', 'Goods Receipt'), ('supplier_payment', 'Supplier Payment'), ('journal_entry', 'Journal Entry')], max_length=30, verbose_name='document type')),
+                ('prefix', models.CharField(max_length=20, verbose_name='prefix')),
+                ('padding', models.PositiveSmallIntegerField(default=6, verbose_name='padding')),
+                ('next_value', models.PositiveBigIntegerField(default=1, verbose_name='next value')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_sequences', to='companies.company', verbose_name='company')),
+            ],
+            options={
+                'verbose_name': 'Document Sequence',
+                'verbose_name_plural': 'Document Sequences',
+                'unique_together': {('company', 'document_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DocumentNumberBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('invoice', 'Sales Invoice'), ('purchase_order', 'Purchase Order'), ('goods_receipt', 'Goods Receipt'), ('supplier_payment', 'Supplier Payment'), ('journal_entry', 'Journal Entry')], max_length=30, verbose_name='document type')),
+                ('device_id', models.CharField(max_length=100, verbose_name='device ID')),
+                ('first_value', models.PositiveBigIntegerField(verbose_name='first value')),
+                ('last_value', models.PositiveBigIntegerField(verbose_name='last value')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_number_blocks', to='companies.company', verbose_name='company')),
+                ('reserved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='document_number_blocks', to=settings.AUTH_USER_MODEL, verbose_name='reserved by')),
+            ],
+            options={
+                'verbose_name': 'Document Number Block',
+                'verbose_name_plural': 'Document Number Blocks',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['company', 'document_type', 'device_id'], name='docblock_device_idx')],
+            },
+        ),
+    ]
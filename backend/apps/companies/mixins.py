@@ -0,0 +1,116 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from .cache import tenant_cache
+
+
+class ConditionalListMixin:
+    """
+    Answer unchanged list requests with 304 Not Modified.
+
+    The validators are computed from ``max(updated_at)`` and the row count of
+    the filtered, tenant-scoped queryset, so an unchanged list is answered
+    with one aggregate query and no serialization. Views with a
+    ``cache_namespace`` also fold in its tenant cache version, which every
+    write that can change the list bumps (deletes and edits of related rows
+    included).
+
+    Only the ETag decides a 304. ``Last-Modified`` is sent for information,
+    but ``If-Modified-Since`` alone is not honoured: the newest timestamp,
+    in whole seconds, misses deletes, related-row changes and edits made
+    within the same second.
+    """
+
+    # Timestamp columns whose changes alter the serialized list. Related
+    # columns (e.g. ``category__updated_at``) cover denormalized fields such
+    # as ``category_name``.
+    conditional_timestamp_fields = ('updated_at',)
+    # Related rows counted as well, so deleting one (which leaves the
+    # newest timestamp alone) changes the validators
+    conditional_count_fields = ()
+
+    def get_list_validators(self, queryset):
+        """Return the (etag, last_modified) pair for a filtered queryset."""
+        aggregates = {
+            f'max_{index}': Max(field)
+            for index, field in enumerate(self.conditional_timestamp_fields)
+        }
+        aggregates.update({
+            f'count_{index}': Count(field, distinct=True)
+            for index, field in enumerate(self.conditional_count_fields)
+        })
+        state = queryset.order_by().aggregate(
+            count=Count('pk', distinct=True),
+            **aggregates
+        )
+
+        timestamps = [
+            state[f'max_{index}']
+            for index in range(len(self.conditional_timestamp_fields))
+        ]
+        present = [value for value in timestamps if value is not None]
+        last_modified = int(max(present).timestamp()) if present else None
+
+        company_id = getattr(self.request.user, 'company_id', None)
+        namespace = getattr(self, 'cache_namespace', None)
+        version = tenant_cache.get_version(company_id, namespace) if namespace and company_id else ''
+
+        # The full path carries filters, search, ordering and page number
+        raw = '|'.join([
+            str(company_id or ''),
+            self.request.get_full_path(),
+            str(state['count']),
+            *[str(state[f'count_{index}']) for index in range(len(self.conditional_count_fields))],
+            *[value.isoformat() if value else '' for value in timestamps],
+            str(version),
+        ])
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+        return etag, last_modified
+
+    def list(self, request, *args, **kwargs):
+        """List objects, short-circuiting when the client copy is fresh."""
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = self.get_list_validators(queryset)
+
+        not_modified = get_conditional_response(request._request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class TenantCachedListMixin:
+    """
+    Serve list responses from the tenant cache.
+
+    Entries live in ``cache_namespace`` for the requesting user's company and
+    are keyed by the absolute request URI, so every filter/page combination
+    is cached separately. Writers invalidate the whole namespace through
+    model signals.
+    """
+
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        """List objects, reusing the serialized payload when cached."""
+        company_id = getattr(request.user, 'company_id', None)
+        if not self.cache_namespace or company_id is None:
+            return super().list(request, *args, **kwargs)
+
+        key = request.build_absolute_uri()
+        data = tenant_cache.get(company_id, self.cache_namespace, key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            tenant_cache.set(company_id, self.cache_namespace, key, response.data)
+        return response
@@ -1,4 +1,5 @@
 
+from django.conf import settings
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -60,3 +61,71 @@ class Company(models.Model):
         if not self.subscription_expires:
             return True
         return self.subscription_expires >= timezone.now().date()
+
+class DocumentSequence(models.Model):
+    """Next number of a document type for a company."""
+
+    DOCUMENT_TYPES = (
+        ('invoice', _('Sales Invoice')),
+        ('purchase_order', _('Purchase Order')),
+        ('goods_receipt', _('Goods Receipt')),
+        ('supplier_payment', _('Supplier Payment')),
+        ('journal_entry', _('Journal Entry')),
+    )
+
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='document_sequences',
+        verbose_name=_('company')
+    )
+    document_type = models.CharField(_('document type'), max_length=30, choices=DOCUMENT_TYPES)
+    prefix = models.CharField(_('prefix'), max_length=20)
+    padding = models.PositiveSmallIntegerField(_('padding'), default=6)
+    next_value = models.PositiveBigIntegerField(_('next value'), default=1)
+
+    class Meta:
+        verbose_name = _('Document Sequence')
+        verbose_name_plural = _('Document Sequences')
+        unique_together = ['company', 'document_type']
+
+    def __str__(self):
+        return f"{self.company} - {self.document_type} - {self.next_value}"
+
+    def format(self, value):
+        """Render a sequence value as a document number."""
+        return f"{self.prefix}-{value:0{self.padding}d}"
+
+class DocumentNumberBlock(models.Model):
+    """Range of document numbers reserved in advance by a POS terminal or a server process."""
+
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='document_number_blocks',
+        verbose_name=_('company')
+    )
+    document_type = models.CharField(_('document type'), max_length=30, choices=DocumentSequence.DOCUMENT_TYPES)
+    device_id = models.CharField(_('device ID'), max_length=100)
+    first_value = models.PositiveBigIntegerField(_('first value'))
+    last_value = models.PositiveBigIntegerField(_('last value'))
+    reserved_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='document_number_blocks',
+        verbose_name=_('reserved by'),
+        blank=True,
+        null=True
+    )
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Document Number Block')
+        verbose_name_plural = _('Document Number Blocks')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['company', 'document_type', 'device_id'], name='docblock_device_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.company} - {self.document_type} {self.first_value}-{self.last_value}"
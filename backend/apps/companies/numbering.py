@@ -0,0 +1,189 @@
+"""
+Per-company document numbering.
+
+Each company has one ``DocumentSequence`` row per document type. Hitting
+that row for every document would serialize all inserts of a company on
+its row lock, so numbers are handed out from blocks instead: each worker
+process reserves ``DOCUMENT_NUMBER_WORKER_BLOCK`` numbers at a time and
+POS terminals reserve a block up front and number locally. The sequence
+row is only locked while a block is reserved, and every block is recorded
+in ``DocumentNumberBlock``, which accounts for the gaps left by unused or
+rolled back numbers.
+
+Numbers that are already taken (entered by hand or imported) are skipped,
+so an allocated number never collides with an existing document.
+"""
+
+import os
+import socket
+import threading
+from collections import defaultdict, deque
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from .models import DocumentNumberBlock, DocumentSequence
+
+DOCUMENT_PREFIXES = {
+    'invoice': 'INV',
+    'purchase_order': 'PO',
+    'goods_receipt': 'GRN',
+    'supplier_payment': 'SPAY',
+    'journal_entry': 'JE',
+}
+
+# Model and number field of each document type
+DOCUMENT_MODELS = {
+    'invoice': ('sales.Invoice', 'invoice_number'),
+    'purchase_order': ('purchases.PurchaseOrder', 'order_number'),
+    'goods_receipt': ('purchases.GoodsReceipt', 'receipt_number'),
+    'supplier_payment': ('purchases.SupplierPayment', 'payment_number'),
+    'journal_entry': ('accounting.JournalEntry', 'entry_number'),
+}
+
+
+def _taken(company_id, document_type, numbers):
+    """Return which of ``numbers`` are already used by a document."""
+    model_name, field = DOCUMENT_MODELS[document_type]
+    return set(
+        apps.get_model(model_name).objects.filter(
+            company_id=company_id, **{f'{field}__in': numbers}
+        ).values_list(field, flat=True)
+    )
+
+
+class WorkerNumberPool:
+    """
+    Numbers this worker process has reserved but not used yet, per company
+    and document type. Shared by the threads of the process.
+    """
+
+    def __init__(self):
+        self.device_id = f'worker:{socket.gethostname()}:{os.getpid()}'
+        self._numbers = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def take(self, key, count):
+        """Take up to ``count`` reserved numbers."""
+        with self._lock:
+            numbers = self._numbers[key]
+            return [numbers.popleft() for _index in range(min(count, len(numbers)))]
+
+    def add(self, key, numbers):
+        with self._lock:
+            self._numbers[key].extend(numbers)
+
+    def clear(self):
+        with self._lock:
+            self._numbers.clear()
+
+
+worker_numbers = WorkerNumberPool()
+
+
+class DocumentNumberService:
+    """Allocate document numbers from per-company sequences."""
+
+    @staticmethod
+    def _reserve(company_id, document_type, count, device_id, user=None):
+        """Advance the sequence by ``count`` and record the block."""
+        if document_type not in DOCUMENT_PREFIXES:
+            raise ValueError(_('Unknown document type: {}').format(document_type))
+
+        DocumentSequence.objects.get_or_create(
+            company_id=company_id,
+            document_type=document_type,
+            defaults={'prefix': DOCUMENT_PREFIXES[document_type]}
+        )
+        with transaction.atomic():
+            sequence = DocumentSequence.objects.select_for_update().get(
+                company_id=company_id,
+                document_type=document_type
+            )
+            first = sequence.next_value
+            sequence.next_value += count
+            sequence.save(update_fields=['next_value'])
+
+            block = DocumentNumberBlock.objects.create(
+                company_id=company_id,
+                document_type=document_type,
+                device_id=device_id,
+                first_value=first,
+                last_value=first + count - 1,
+                reserved_by=user
+            )
+        return block, [sequence.format(value) for value in range(first, first + count)]
+
+    @staticmethod
+    def allocate(company_id, document_type, count=1):
+        """
+        Allocate ``count`` unused numbers and return them formatted.
+
+        Numbers come from this worker's reserved block; a new block is
+        reserved when it runs out. Call this as late as possible in the
+        transaction that saves the documents: a refill locks the sequence
+        row until that transaction ends.
+        """
+        key = (company_id, document_type)
+        numbers = []
+        while len(numbers) < count:
+            missing = count - len(numbers)
+            candidates = worker_numbers.take(key, missing)
+            if not candidates:
+                size = max(missing, settings.DOCUMENT_NUMBER_WORKER_BLOCK)
+                _block, reserved = DocumentNumberService._reserve(
+                    company_id, document_type, size, worker_numbers.device_id
+                )
+                candidates, spare = reserved[:missing], reserved[missing:]
+                # The reservation only exists once the caller's transaction
+                # commits; on rollback it is undone and nothing is kept
+                transaction.on_commit(lambda spare=spare: worker_numbers.add(key, spare))
+
+            taken = _taken(company_id, document_type, candidates)
+            numbers.extend(number for number in candidates if number not in taken)
+        return numbers
+
+    @staticmethod
+    def next_number(company_id, document_type):
+        """Allocate one number."""
+        return DocumentNumberService.allocate(company_id, document_type)[0]
+
+    @staticmethod
+    def reserve_block(company_id, document_type, count, device_id, user=None):
+        """
+        Reserve ``count`` numbers for a POS terminal and return the block
+        and its numbers, without those already taken.
+
+        Numbers a terminal never uses remain unused; the recorded blocks
+        account for those gaps.
+        """
+        if not 0 < count <= settings.DOCUMENT_NUMBER_BLOCK_MAX:
+            raise ValueError(
+                _('Block size must be between 1 and {}').format(settings.DOCUMENT_NUMBER_BLOCK_MAX)
+            )
+
+        block, numbers = DocumentNumberService._reserve(company_id, document_type, count, device_id, user)
+        taken = _taken(company_id, document_type, numbers)
+        return block, [number for number in numbers if number not in taken]
+
+
+class NumberedDocumentSerializerMixin:
+    """
+    Fill a document's number from the company sequence when the client
+    leaves it empty. Set ``document_type`` and ``number_field`` on the
+    serializer and mark the number field ``required=False``.
+    """
+
+    document_type = None
+    number_field = None
+
+    def save(self, **kwargs):
+        if (self.instance is not None
+                or self.validated_data.get(self.number_field)
+                or kwargs.get(self.number_field)):
+            return super().save(**kwargs)
+
+        company = kwargs.get('company') or self.validated_data.get('company')
+        with transaction.atomic():
+            kwargs[self.number_field] = DocumentNumberService.next_number(company.pk, self.document_type)
+            return super().save(**kwargs)
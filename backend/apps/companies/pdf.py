@@ -0,0 +1,212 @@
+"""
+Cached PDF rendering for business documents (invoices, purchase orders).
+
+HTML is rendered from templates in the calling process, where the ORM is
+available; the CPU-heavy HTML to PDF conversion runs in the shared process
+pool. Output is stored in the default file storage under a name built from
+the document id and ``updated_at``, so an unchanged document is rendered
+once and later requests stream the stored file.
+"""
+
+import io
+import logging
+import os
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from .pool import submit
+
+logger = logging.getLogger(__name__)
+
+
+def html_to_pdf(html_string, base_url=None):
+    """Convert HTML to PDF bytes. Runs in worker processes."""
+    # Imported here: WeasyPrint needs the Pango/GTK system libraries
+    from weasyprint import HTML
+
+    return HTML(string=html_string, base_url=base_url).write_pdf()
+
+
+def _directory(document, kind):
+    return f'{settings.PDF_CACHE_DIR}/{document.company_id}/{kind}'
+
+
+def pdf_cache_name(document, kind):
+    """Storage name of the PDF for the current version of a document."""
+    version = int(document.updated_at.timestamp() * 1000000)
+    return f'{_directory(document, kind)}/{document.pk}-{version}.pdf'
+
+
+def _purge_stale(document, kind, keep):
+    """Delete stored PDFs of older versions of a document."""
+    directory = _directory(document, kind)
+    prefix = f'{document.pk}-'
+    try:
+        _, files = default_storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+
+    for name in files:
+        path = f'{directory}/{name}'
+        if name.startswith(prefix) and path != keep:
+            default_storage.delete(path)
+
+
+def render_document_pdf(document, kind, render_html):
+    """
+    Make sure the PDF of the current document version is stored and return
+    its storage name. ``render_html(document)`` builds the HTML on a miss.
+    """
+    name = pdf_cache_name(document, kind)
+    if default_storage.exists(name):
+        return name
+
+    html_string = render_html(document)
+    pdf = submit(html_to_pdf, html_string, str(settings.BASE_DIR)).result(
+        timeout=settings.PDF_RENDER_TIMEOUT
+    )
+
+    # A concurrent request may have stored the same version meanwhile
+    _store(name, pdf)
+    _purge_stale(document, kind, keep=name)
+    return name
+
+
+def get_document_pdf(document, kind, render_html):
+    """Return the document's PDF as an open binary file, rendering it on a miss."""
+    return default_storage.open(render_document_pdf(document, kind, render_html), 'rb')
+
+
+def _store(name, pdf):
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(pdf))
+
+
+def iter_document_pdfs(documents, kind, render_html, window=None, failures=None):
+    """
+    Yield ``(document, pdf_bytes)`` for many documents as their PDFs complete.
+
+    Stored PDFs are read back directly; misses are converted in parallel in
+    the process pool with at most ``window`` conversions in flight, so
+    memory stays bounded regardless of how many documents are exported.
+    Freshly rendered PDFs are stored for later requests.
+
+    A document that fails to render raises, unless a ``failures`` list is
+    given: the failure is then logged, appended as ``(document, error)``
+    and the remaining documents are still yielded.
+    """
+    window = window or (getattr(settings, 'RENDER_POOL_SIZE', None) or os.cpu_count() or 1) * 2
+    pending = {}
+
+    def fail(document, error):
+        if failures is None:
+            raise error
+        logger.error(f'PDF rendering failed for {kind} {document.pk}: {str(error)}')
+        failures.append((document, error))
+
+    def collect(futures):
+        for future in futures:
+            document, name = pending.pop(future)
+            try:
+                pdf = future.result(timeout=settings.PDF_RENDER_TIMEOUT)
+            except Exception as e:
+                fail(document, e)
+                continue
+            _store(name, pdf)
+            yield document, pdf
+
+    for document in documents:
+        name = pdf_cache_name(document, kind)
+        try:
+            if default_storage.exists(name):
+                with default_storage.open(name, 'rb') as stored:
+                    pdf = stored.read()
+                yield document, pdf
+                continue
+
+            future = submit(html_to_pdf, render_html(document), str(settings.BASE_DIR))
+        except Exception as e:
+            fail(document, e)
+            continue
+        pending[future] = (document, name)
+        if len(pending) >= window:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        yield from collect(done)
+
+
+class _ZipStream:
+    """Write-only, unseekable file object that hands written bytes back out."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP archive chunk by chunk from ``(filename, bytes)`` entries.
+
+    Only the entry being written is held in memory. PDFs are already
+    compressed, so entries are stored rather than deflated. The response
+    status is sent before the first chunk, so if ``entries`` fails midway
+    the error is logged and written to an ``ERRORS.txt`` entry and the
+    archive is still completed, rather than cut off.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_STORED) as archive:
+        try:
+            for filename, data in entries:
+                archive.writestr(filename, data)
+                yield from stream.drain()
+        except Exception as e:
+            logger.error(f'ZIP export failed: {str(e)}')
+            archive.writestr('ERRORS.txt', f'The export stopped early: {str(e)}\n')
+    yield from stream.drain()
+
+
+def merge_pdfs(pdfs):
+    """Merge PDF byte strings into one PDF, returned as a temporary file."""
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for pdf in pdfs:
+        writer.append(PdfReader(io.BytesIO(pdf)))
+
+    merged = tempfile.TemporaryFile()
+    writer.write(merged)
+    merged.seek(0)
+    return merged
+
+
+def prerender_on_commit(task, pk):
+    """Queue a Celery pre-render task once the current transaction commits."""
+    def enqueue():
+        try:
+            task.delay(pk)
+        except Exception as e:
+            logger.warning(f'Could not queue PDF pre-render: {str(e)}')
+
+    transaction.on_commit(enqueue)
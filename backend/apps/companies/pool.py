@@ -0,0 +1,60 @@
+"""
+Shared process pool for CPU-bound rendering (QR codes, PDFs).
+
+Each web or Celery worker process lazily starts one pool of
+``RENDER_POOL_SIZE`` processes. Functions submitted to it must be
+module-level and must not touch the ORM; callers pass plain data in and
+get plain data (bytes, strings) back.
+"""
+
+import atexit
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Return this process's render pool, starting it on first use."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=getattr(settings, 'RENDER_POOL_SIZE', None))
+            atexit.register(_pool.shutdown, wait=False)
+        return _pool
+
+
+def _reset_process_pool(broken):
+    global _pool
+    with _lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False)
+
+
+def submit(fn, *args):
+    """Submit ``fn(*args)`` to the pool, replacing the pool once if it broke."""
+    pool = get_process_pool()
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        logger.warning('Render pool broken, restarting it')
+        _reset_process_pool(pool)
+        return get_process_pool().submit(fn, *args)
+
+
+def map_in_pool(fn, *iterables):
+    """Run ``fn`` over the iterables in the pool and return the results in order."""
+    pool = get_process_pool()
+    try:
+        return list(pool.map(fn, *iterables))
+    except BrokenProcessPool:
+        logger.warning('Render pool broken, restarting it')
+        _reset_process_pool(pool)
+        return list(get_process_pool().map(fn, *iterables))
@@ -0,0 +1,127 @@
+"""
+Shared QR code rendering for 2FA provisioning, ZATCA and ETA invoices.
+
+Rendered images are cached by a hash of their content and format, so an
+unchanged invoice never renders twice. SVG output skips rasterisation and
+PNG encoding and is several times cheaper than PNG. Large batches render
+the cache misses in the shared process pool.
+"""
+
+import base64
+import hashlib
+import io
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.cache import cache
+from .cache import LocalLRUCache
+from .pool import map_in_pool
+
+MIME_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+_local = LocalLRUCache(max_entries=512)
+
+
+def _render(data, image_format):
+    """Render ``data`` as a base64 encoded image. Runs in worker processes too."""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    if image_format == 'svg':
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+        return base64.b64encode(img.to_string()).decode()
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def _cache_key(data, image_format):
+    digest = hashlib.sha256(data.encode()).hexdigest()
+    return f'qr:{image_format}:{digest}'
+
+
+def _get_cached(key):
+    value = _local.get(key)
+    if value is None:
+        value = cache.get(key)
+        if value is not None:
+            _local.set(key, value, settings.QR_CACHE_TIMEOUT)
+    return value
+
+
+def _set_cached(key, value):
+    _local.set(key, value, settings.QR_CACHE_TIMEOUT)
+    cache.set(key, value, settings.QR_CACHE_TIMEOUT)
+
+
+def default_format():
+    return getattr(settings, 'QR_IMAGE_FORMAT', 'png')
+
+
+def render_qr(data, image_format=None, use_cache=True):
+    """
+    Return ``data`` as a base64 encoded QR image (``png`` or ``svg``).
+
+    Pass ``use_cache=False`` for secrets (e.g. TOTP provisioning URIs) that
+    must not be written to a shared cache.
+    """
+    image_format = image_format or default_format()
+    if not use_cache:
+        return _render(data, image_format)
+
+    key = _cache_key(data, image_format)
+    value = _get_cached(key)
+    if value is None:
+        value = _render(data, image_format)
+        _set_cached(key, value)
+    return value
+
+
+def render_qr_batch(payloads, image_format=None):
+    """
+    Render many QR codes, returning base64 images in the order of ``payloads``.
+
+    Cached codes are served directly; the misses are rendered in the
+    process pool when there are enough of them to amortise the IPC.
+    """
+    image_format = image_format or default_format()
+    keys = [_cache_key(data, image_format) for data in payloads]
+
+    local = {key: _local.get(key) for key in keys}
+    shared = cache.get_many([key for key, value in local.items() if value is None])
+    results = {key: local[key] or shared.get(key) for key in keys}
+
+    missing = {}
+    for key, data in zip(keys, payloads):
+        if results[key] is None:
+            missing.setdefault(key, data)
+
+    if missing:
+        if len(missing) >= getattr(settings, 'QR_POOL_MIN_BATCH', 16):
+            rendered = map_in_pool(_render, missing.values(), [image_format] * len(missing))
+        else:
+            rendered = [_render(data, image_format) for data in missing.values()]
+
+        fresh = dict(zip(missing.keys(), rendered))
+        cache.set_many(fresh, settings.QR_CACHE_TIMEOUT)
+        for key, value in fresh.items():
+            _local.set(key, value, settings.QR_CACHE_TIMEOUT)
+        results.update(fresh)
+
+    return [results[key] for key in keys]
+
+
+def qr_data_uri(image, image_format=None):
+    """Wrap a base64 image from :func:`render_qr` in a data URI."""
+    return f"data:{MIME_TYPES[image_format or default_format()]};base64,{image}"
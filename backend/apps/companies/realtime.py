@@ -0,0 +1,118 @@
+"""
+Coalesced real-time dashboard deltas.
+
+Writes to invoices, payments and inventory publish small deltas (revenue,
+order and stock counters, per-product stock levels) instead of letting
+dashboards poll ``DashboardStatsView``. Deltas are merged per company over
+a short window and sent as a single ``DASHBOARD_DELTA`` sync message through
+the channel layer, so a burst of POS sales costs one group_send.
+"""
+
+import logging
+import threading
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+from .cache import tenant_cache
+
+logger = logging.getLogger(__name__)
+
+
+def merge_delta(target, delta):
+    """
+    Merge ``delta`` into ``target`` in place.
+
+    Numbers are added, nested dicts are merged recursively and any other
+    value (e.g. a product's latest stock level) replaces the previous one.
+    """
+    for key, value in delta.items():
+        current = target.get(key)
+        if isinstance(value, dict):
+            target[key] = merge_delta(current if isinstance(current, dict) else {}, value)
+        elif isinstance(value, (int, float)) and isinstance(current, (int, float)):
+            target[key] = current + value
+        else:
+            target[key] = value
+    return target
+
+
+class DashboardPublisher:
+    """Per-process, per-company debouncer for dashboard deltas."""
+
+    def __init__(self, window=None):
+        self.window = window if window is not None else getattr(settings, 'DASHBOARD_PUSH_WINDOW', 0.5)
+        self._pending = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, company_id, delta):
+        """Queue a delta for a company once the current transaction commits."""
+        transaction.on_commit(lambda: self._enqueue(company_id, delta))
+
+    def _enqueue(self, company_id, delta):
+        # Snapshots served after this point must include the change
+        tenant_cache.invalidate(company_id, 'dashboard')
+
+        with self._lock:
+            merge_delta(self._pending.setdefault(company_id, {}), delta)
+            if company_id in self._timers:
+                return
+            if self.window <= 0:
+                self._timers[company_id] = None
+            else:
+                timer = threading.Timer(self.window, self.flush, args=[company_id])
+                timer.daemon = True
+                self._timers[company_id] = timer
+                timer.start()
+
+        if self.window <= 0:
+            self.flush(company_id)
+
+    def flush(self, company_id):
+        """Send the merged delta of a company, if any."""
+        with self._lock:
+            self._timers.pop(company_id, None)
+            delta = self._pending.pop(company_id, None)
+
+        if not delta:
+            return
+
+        from apps.authentication.consumers import broadcast_sync_update
+
+        try:
+            async_to_sync(broadcast_sync_update)(
+                company_id, 'dashboard', None, 'DASHBOARD_DELTA', delta
+            )
+        except Exception as e:
+            logger.error(f'Dashboard push failed for company {company_id}: {str(e)}')
+
+
+dashboard_publisher = DashboardPublisher()
+
+
+def diff_delta(new, old):
+    """
+    Numeric difference ``new - old`` of two (possibly nested) contribution
+    dicts, dropping zero entries.
+    """
+    delta = {}
+    for key in set(new) | set(old):
+        new_value = new.get(key, 0)
+        old_value = old.get(key, 0)
+        if isinstance(new_value, dict) or isinstance(old_value, dict):
+            nested = diff_delta(new_value or {}, old_value or {})
+            if nested:
+                delta[key] = nested
+        elif new_value != old_value:
+            delta[key] = new_value - old_value
+    return delta
+
+
+def stock_contribution(stock, reorder_point):
+    """Contribution of one stock level to the dashboard inventory counters."""
+    low = stock <= reorder_point
+    return {
+        'healthy': 0 if low else 1,
+        'low': 1 if low else 0,
+        'out': 1 if stock == 0 else 0,
+    }
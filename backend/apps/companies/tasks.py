@@ -0,0 +1,34 @@
+import logging
+import random
+from celery import shared_task
+from django.conf import settings
+from .mail import MailDeliveryError, dead_letter, deliver, deserialize_message
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=None)
+def send_emails(self, payloads):
+    """
+    Deliver a batch of queued email payloads over the worker's mail
+    connection, retrying only the messages that failed temporarily with
+    exponential backoff. Rejected messages are dropped without holding up
+    the rest of the batch.
+    """
+    messages = [deserialize_message(payload) for payload in payloads]
+    try:
+        return deliver(messages)
+    except MailDeliveryError as e:
+        if self.request.retries >= settings.EMAIL_MAX_RETRIES:
+            for index in e.pending:
+                dead_letter(messages[index], e.error)
+            return e.sent
+
+        remaining = [payloads[index] for index in e.pending]
+        backoff = min(
+            settings.EMAIL_RETRY_BACKOFF * 2 ** self.request.retries,
+            settings.EMAIL_RETRY_BACKOFF_MAX
+        )
+        countdown = backoff + random.uniform(0, backoff / 2)
+        logger.warning(f'Retrying {len(remaining)} emails in {countdown:.0f}s: {str(e)}')
+        raise self.retry(args=[remaining], exc=e.error, countdown=countdown)
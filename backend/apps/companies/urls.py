@@ -12,4 +12,5 @@ urlpatterns = [
     path('', include(router.urls)),
     path('subscription/plans/', views.SubscriptionPlansView.as_view(), name='subscription-plans'),
     path('subscription/upgrade/', views.UpgradeSubscriptionView.as_view(), name='upgrade-subscription'),
+    path('document-numbers/reserve/', views.DocumentNumberBlockView.as_view(), name='reserve-document-numbers'),
 ]
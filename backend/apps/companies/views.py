@@ -8,6 +8,7 @@ from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import Company
+from .numbering import DocumentNumberService
 from .serializers import CompanySerializer
 
 
@@ -167,3 +168,42 @@ class UpgradeSubscriptionView(APIView):
             'plan': plan_id,
             'expires_at': company.subscription_expires
         })
+
+
+class DocumentNumberBlockView(APIView):
+    """View for reserving a block of document numbers for a POS terminal."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """Reserve ``count`` consecutive numbers of a document type."""
+        document_type = request.data.get('document_type', 'invoice')
+        device_id = request.data.get('device_id')
+
+        if not device_id:
+            return Response(
+                {'error': _('Device ID is required')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            count = int(request.data.get('count', 100))
+            block, numbers = DocumentNumberService.reserve_block(
+                request.user.company.id,
+                document_type,
+                count,
+                device_id,
+                user=request.user
+            )
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'block_id': block.id,
+            'document_type': document_type,
+            'device_id': device_id,
+            'numbers': numbers
+        }, status=status.HTTP_201_CREATED)
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_sequence', models.BigIntegerField(default=0, verbose_name='last sequence')),
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sync_cursor', to='companies.company', verbose_name='company')),
+            ],
+            options={
+                'verbose_name': 'Sync Cursor',
+                'verbose_name_plural': 'Sync Cursors',
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.BigIntegerField(verbose_name='sequence')),
+                ('entity', models.CharField(blank=True, max_length=50, null=True, verbose_name='entity')),
+                ('entity_id', models.CharField(blank=True, max_length=100, null=True, verbose_name='entity ID')),
+                ('action', models.CharField(max_length=30, verbose_name='action')),
+                ('payload', models.JSONField(verbose_name='payload')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_logs', to='companies.company', verbose_name='company')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sync_logs', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'Sync Log',
+                'verbose_name_plural': 'Sync Logs',
+                'ordering': ['company', 'sequence'],
+                'unique_together': {('company', 'sequence')},
+            },
+        ),
+    ]
@@ -170,3 +170,57 @@ class InventoryTransaction(models.Model):
 
     def __str__(self):
         return f"{self.product.name} - {self.transaction_type} ({self.quantity})"
+
+class SyncCursor(models.Model):
+    """Last allocated sync log sequence number of a company."""
+
+    company = models.OneToOneField(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='sync_cursor',
+        verbose_name=_('company')
+    )
+    last_sequence = models.BigIntegerField(_('last sequence'), default=0)
+
+    class Meta:
+        verbose_name = _('Sync Cursor')
+        verbose_name_plural = _('Sync Cursors')
+
+    def __str__(self):
+        return f"{self.company} - {self.last_sequence}"
+
+class SyncLog(models.Model):
+    """
+    Append-only log of real-time sync changes per company.
+    Reconnecting clients replay entries after the last sequence they saw.
+    """
+
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='sync_logs',
+        verbose_name=_('company')
+    )
+    sequence = models.BigIntegerField(_('sequence'))
+    entity = models.CharField(_('entity'), max_length=50, blank=True, null=True)
+    entity_id = models.CharField(_('entity ID'), max_length=100, blank=True, null=True)
+    action = models.CharField(_('action'), max_length=30)
+    payload = models.JSONField(_('payload'))
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        related_name='sync_logs',
+        verbose_name=_('user'),
+        blank=True,
+        null=True
+    )
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Sync Log')
+        verbose_name_plural = _('Sync Logs')
+        ordering = ['company', 'sequence']
+        unique_together = ['company', 'sequence']
+
+    def __str__(self):
+        return f"{self.company} #{self.sequence} - {self.action}"
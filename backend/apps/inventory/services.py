@@ -1,7 +1,18 @@
+from collections import namedtuple
+from datetime import timedelta
 from decimal import Decimal
 from django.db import transaction
+from django.db.models import F, Sum
 from django.utils import timezone
-from .models import Product, InventoryTransaction
+from .models import Product, InventoryTransaction, SyncCursor, SyncLog
+
+# One stock movement for InventoryService.process_transactions; related_document
+# and notes default to the values passed for the whole batch
+StockMovement = namedtuple(
+    'StockMovement',
+    ['product_id', 'quantity', 'unit_cost', 'related_document', 'notes'],
+    defaults=(None, None, None)
+)
 
 class InventoryService:
     """
@@ -85,18 +96,111 @@ class InventoryService:
             
         return product
 
+    @staticmethod
+    @transaction.atomic
+    def process_transactions(movements, transaction_type: str, related_document=None, user=None, notes=None):
+        """
+        Process many inventory movements (of one or more documents) in a batch.
+
+        Same stock and WAC rules as ``process_transaction``, but the products
+        are locked and read with one query, updated with one bulk update and
+        the transaction records are inserted with one bulk insert. Each
+        movement still gets its own record and running balance.
+
+        Args:
+            movements: List of ``StockMovement``; quantity is positive for add
+                and negative for remove, unit_cost may be None.
+            transaction_type: Type of transaction (purchase, sale, etc.).
+            related_document: The related model instance (Invoice, PurchaseOrder, etc.).
+            user: The user performing the action.
+            notes: Optional notes.
+
+        Returns:
+            Dict of product id to the updated product.
+        """
+        from django.db.models.signals import post_save
+        from apps.companies.cache import tenant_cache
+
+        if not movements:
+            return {}
+
+        # Lock in primary key order so concurrent batches cannot deadlock
+        product_ids = sorted({movement.product_id for movement in movements})
+        products = Product.objects.select_for_update().in_bulk(product_ids)
+        now = timezone.now()
+
+        records = []
+        outgoing = set()
+        for movement in movements:
+            product_id, quantity, unit_cost = movement.product_id, movement.quantity, movement.unit_cost
+            product = products[product_id]
+            quantity = Decimal(str(quantity))
+            is_incoming = quantity > 0
+
+            if is_incoming:
+                unit_cost = Decimal(str(unit_cost if unit_cost is not None else product.average_cost))
+                new_total_stock = product.current_stock + quantity
+                if new_total_stock > 0:
+                    product.average_cost = (
+                        product.current_stock * product.average_cost + quantity * unit_cost
+                    ) / new_total_stock
+                else:
+                    product.average_cost = unit_cost
+                product.last_restocked = now
+            else:
+                unit_cost = product.average_cost
+                outgoing.add(product_id)
+
+            product.current_stock += quantity
+            records.append(InventoryTransaction(
+                product=product,
+                transaction_type=transaction_type,
+                quantity=quantity,
+                unit_cost=unit_cost,
+                total_cost=abs(quantity * unit_cost),
+                running_balance=product.current_stock,
+                related_document=movement.related_document or related_document,
+                created_by=user,
+                notes=movement.notes or notes
+            ))
+
+        # bulk_update skips auto_now
+        for product in products.values():
+            product.updated_at = now
+        Product.objects.bulk_update(
+            products.values(),
+            ['current_stock', 'average_cost', 'last_restocked', 'updated_at']
+        )
+        InventoryTransaction.objects.bulk_create(records)
+
+        # Bulk writes skip model signals: replay the movement receivers
+        # (dashboard push) and invalidate the product caches once
+        for record in records:
+            post_save.send(sender=InventoryTransaction, instance=record, created=True)
+        for company_id in {product.company_id for product in products.values()}:
+            tenant_cache.invalidate_on_commit(company_id, 'products', 'categories')
+
+        # Check for Low Stock and Auto-PO
+        for product_id in sorted(outgoing):
+            product = products[product_id]
+            if product.is_low_stock and product.preferred_supplier_id:
+                InventoryService.trigger_auto_procurement(product, user)
+
+        return products
+
     @staticmethod
     def trigger_auto_procurement(product: Product, user=None):
         """
         Check if we need to order more stock and create/update a Draft PO.
         """
         from apps.purchases.models import PurchaseOrder, PurchaseOrderItem
+        from apps.companies.numbering import DocumentNumberService
         
         # 1. Check if there are pending orders
         pending_qty = PurchaseOrderItem.objects.filter(
             product=product,
             purchase_order__status__in=['draft', 'sent', 'confirmed']
-        ).aggregate(total=models.Sum('quantity'))['total'] or 0
+        ).aggregate(total=Sum('quantity'))['total'] or 0
         
         # 2. If Stock + Pending < Reorder Point, we need to order
         if (product.current_stock + pending_qty) <= product.reorder_point:
@@ -123,7 +227,7 @@ class InventoryService:
                 draft_po = PurchaseOrder.objects.create(
                     company=product.company,
                     supplier=supplier,
-                    order_number=f"PO-AUTO-{timezone.now().strftime('%Y%m%d%H%M%S')}",
+                    order_number=DocumentNumberService.next_number(product.company_id, 'purchase_order'),
                     order_date=timezone.now().date(),
                     expected_date=timezone.now().date() + timedelta(days=7),
                     status='draft',
@@ -175,3 +279,85 @@ class InventoryService:
     def check_stock_availability(product: Product, quantity_needed: Decimal):
         """Check if enough stock is available."""
         return product.current_stock >= quantity_needed
+
+
+class SyncLogService:
+    """
+    Service for the per-company append-only sync log used to resume
+    real-time synchronization after a client reconnects.
+    """
+
+    @staticmethod
+    @transaction.atomic
+    def append(company_id, entries):
+        """
+        Append a batch of sync messages and return their sequence numbers.
+
+        The whole batch reserves its sequence range with a single update of
+        the company's cursor row, so concurrent writers never interleave and
+        numbers stay gap-free and monotonically increasing.
+
+        Args:
+            company_id: The company the messages belong to.
+            entries: List of (user_id, message) tuples.
+        """
+        if not entries:
+            return []
+
+        cursor, _ = SyncCursor.objects.get_or_create(company_id=company_id)
+        SyncCursor.objects.filter(pk=cursor.pk).update(
+            last_sequence=F('last_sequence') + len(entries)
+        )
+        last = SyncCursor.objects.values_list('last_sequence', flat=True).get(pk=cursor.pk)
+        first = last - len(entries) + 1
+
+        SyncLog.objects.bulk_create([
+            SyncLog(
+                company_id=company_id,
+                sequence=first + offset,
+                entity=message.get('entity'),
+                entity_id=str(message['entityId']) if message.get('entityId') is not None else None,
+                action=message.get('type') or 'UPDATE',
+                payload=message,
+                user_id=user_id,
+            )
+            for offset, (user_id, message) in enumerate(entries)
+        ])
+
+        return list(range(first, last + 1))
+
+    @staticmethod
+    def read_since(company_id, since, limit):
+        """
+        Return (latest_sequence, messages) for everything after ``since``.
+
+        ``messages`` is None when the client is too far behind (more than
+        ``limit`` entries, or entries already pruned) and must reload a
+        snapshot instead of replaying.
+        """
+        latest = SyncCursor.objects.filter(company_id=company_id).values_list(
+            'last_sequence', flat=True
+        ).first() or 0
+
+        if since == latest:
+            return latest, []
+        if since > latest or latest - since > limit:
+            return latest, None
+
+        rows = list(
+            SyncLog.objects.filter(company_id=company_id, sequence__gt=since)
+            .order_by('sequence')
+            .values_list('sequence', 'payload')
+        )
+        if not rows or rows[0][0] != since + 1:
+            # The gap reaches into pruned history
+            return latest, None
+
+        return latest, [dict(payload, seq=sequence) for sequence, payload in rows]
+
+    @staticmethod
+    def prune(retention_days):
+        """Delete sync log entries older than the retention period."""
+        cutoff = timezone.now() - timedelta(days=retention_days)
+        deleted, _ = SyncLog.objects.filter(created_at__lt=cutoff).delete()
+        return deleted
@@ -0,0 +1,33 @@
+from django.db.models.signals import post_save, post_delete
+from apps.companies.cache import invalidate_tenant_namespaces
+from apps.companies.realtime import dashboard_publisher, diff_delta, stock_contribution
+from .models import Category, Product, InventoryTransaction
+
+# Category lists show product counts and product lists show category names,
+# so a write to either model invalidates both namespaces.
+invalidate_catalog = invalidate_tenant_namespaces('products', 'categories')
+
+for signal in (post_save, post_delete):
+    signal.connect(invalidate_catalog, sender=Product, dispatch_uid=f'product_cache_{signal}')
+    signal.connect(invalidate_catalog, sender=Category, dispatch_uid=f'category_cache_{signal}')
+
+
+def publish_stock_delta(sender, instance, created, **kwargs):
+    """Push the stock level and inventory counter changes of a movement."""
+    if not created:
+        return
+
+    product = instance.product
+    new_stock = instance.running_balance
+    old_stock = new_stock - instance.quantity
+
+    dashboard_publisher.publish(product.company_id, {
+        'stock': {str(product.id): str(new_stock)},
+        'inventory': diff_delta(
+            stock_contribution(new_stock, product.reorder_point),
+            stock_contribution(old_stock, product.reorder_point)
+        ),
+    })
+
+
+post_save.connect(publish_stock_delta, sender=InventoryTransaction, dispatch_uid='inventory_dashboard_push')
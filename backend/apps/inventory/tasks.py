@@ -0,0 +1,9 @@
+from celery import shared_task
+from django.conf import settings
+from .services import SyncLogService
+
+
+@shared_task
+def prune_sync_log():
+    """Drop sync log entries older than SYNC_LOG_RETENTION_DAYS."""
+    return SyncLogService.prune(settings.SYNC_LOG_RETENTION_DAYS)
@@ -10,11 +10,13 @@ from django.db.models import Q, Sum
 from .models import Category, Product, InventoryTransaction
 from .serializers import CategorySerializer, ProductSerializer, InventoryTransactionSerializer
 from .utils import generate_barcode, predict_reorder_points
+from apps.companies.cache import tenant_cache
+from apps.companies.mixins import ConditionalListMixin, TenantCachedListMixin
 import csv
 import io
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(TenantCachedListMixin, viewsets.ModelViewSet):
     """ViewSet for Category model."""
 
     queryset = Category.objects.all()
@@ -24,6 +26,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
+    cache_namespace = 'categories'
 
     def get_queryset(self):
         """Filter categories by company."""
@@ -35,7 +38,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
         serializer.save(company=self.request.user.company)
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalListMixin, TenantCachedListMixin, viewsets.ModelViewSet):
     """ViewSet for Product model."""
 
     queryset = Product.objects.all()
@@ -46,6 +49,8 @@ class ProductViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description', 'sku', 'barcode']
     ordering_fields = ['name', 'current_stock', 'selling_price', 'created_at']
     ordering = ['name']
+    conditional_timestamp_fields = ('updated_at', 'category__updated_at')
+    cache_namespace = 'products'
 
     def get_queryset(self):
         """Filter products by company."""
@@ -176,6 +181,9 @@ class ProductViewSet(viewsets.ModelViewSet):
                 ai_suggested_reorder_point=predicted_point
             )
 
+        # Queryset updates bypass the model signals
+        tenant_cache.invalidate_on_commit(user.company_id, 'products')
+
         return Response({
             'message': _('Reorder points predicted successfully'),
             'predictions': predictions
@@ -1,6 +1,7 @@
 
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
+from apps.companies.numbering import NumberedDocumentSerializerMixin
 from .models import (
     Supplier, PurchaseOrder, PurchaseOrderItem, 
     GoodsReceipt, GoodsReceiptItem, SupplierInvoice, SupplierPayment
@@ -48,9 +49,12 @@ class PurchaseOrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'received_quantity', 'pending_quantity']
 
 
-class PurchaseOrderSerializer(serializers.ModelSerializer):
+class PurchaseOrderSerializer(NumberedDocumentSerializerMixin, serializers.ModelSerializer):
     """Serializer for PurchaseOrder model."""
 
+    document_type = 'purchase_order'
+    number_field = 'order_number'
+
     supplier_name = serializers.CharField(source='supplier.name', read_only=True)
     items = PurchaseOrderItemSerializer(many=True, read_only=True)
 
@@ -64,6 +68,7 @@ class PurchaseOrderSerializer(serializers.ModelSerializer):
             'items', 'created_at', 'updated_at', 'created_by'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'created_by']
+        extra_kwargs = {'order_number': {'required': False}}
 
     def create(self, validated_data):
         """Create purchase order with items."""
@@ -94,9 +99,12 @@ class GoodsReceiptItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class GoodsReceiptSerializer(serializers.ModelSerializer):
+class GoodsReceiptSerializer(NumberedDocumentSerializerMixin, serializers.ModelSerializer):
     """Serializer for GoodsReceipt model."""
 
+    document_type = 'goods_receipt'
+    number_field = 'receipt_number'
+
     purchase_order_number = serializers.CharField(source='purchase_order.order_number', read_only=True)
     supplier_name = serializers.CharField(source='purchase_order.supplier.name', read_only=True)
     items = GoodsReceiptItemSerializer(many=True, read_only=True)
@@ -110,6 +118,7 @@ class GoodsReceiptSerializer(serializers.ModelSerializer):
             'created_at', 'created_by', 'created_by_name'
         ]
         read_only_fields = ['id', 'created_at', 'created_by']
+        extra_kwargs = {'receipt_number': {'required': False}}
 
 
 class SupplierInvoiceSerializer(serializers.ModelSerializer):
@@ -134,9 +143,12 @@ class SupplierInvoiceSerializer(serializers.ModelSerializer):
         ]
 
 
-class SupplierPaymentSerializer(serializers.ModelSerializer):
+class SupplierPaymentSerializer(NumberedDocumentSerializerMixin, serializers.ModelSerializer):
     """Serializer for SupplierPayment model."""
 
+    document_type = 'supplier_payment'
+    number_field = 'payment_number'
+
     supplier_name = serializers.CharField(source='supplier.name', read_only=True)
     invoice_number = serializers.CharField(source='invoice.invoice_number', read_only=True)
     created_by_name = serializers.CharField(source='created_by.full_name', read_only=True)
@@ -150,3 +162,4 @@ class SupplierPaymentSerializer(serializers.ModelSerializer):
             'created_at', 'created_by', 'created_by_name'
         ]
         read_only_fields = ['id', 'created_at', 'created_by']
+        extra_kwargs = {'payment_number': {'required': False}}
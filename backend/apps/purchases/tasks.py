@@ -0,0 +1,12 @@
+from celery import shared_task
+from apps.companies.pdf import render_document_pdf
+from .models import PurchaseOrder
+from .utils import render_purchase_order_html
+
+
+@shared_task
+def prerender_purchase_order_pdf(purchase_order_id):
+    """Render and store the PDF of the purchase order's current version."""
+    purchase_order = PurchaseOrder.objects.select_related('company', 'supplier').filter(pk=purchase_order_id).first()
+    if purchase_order:
+        return render_document_pdf(purchase_order, 'purchase_order', render_purchase_order_html)
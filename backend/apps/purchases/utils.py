@@ -1,55 +1,46 @@
 
-import io
-from django.conf import settings
-from django.core.mail import send_mail
 from django.utils.translation import gettext_lazy as _
 from django.template.loader import render_to_string
-# from weasyprint import HTML, CSS  # Temporarily disabled - requires GTK on Windows
+from apps.companies.mail import queue_email
+from apps.companies.pdf import get_document_pdf
 from .models import PurchaseOrder
 # from apps.inventory.models import InventoryTransaction  # Not needed - use InventoryService instead
 
 
-def generate_purchase_order_pdf(purchase_order):
-    """Generate PDF for purchase order."""
-    # Render HTML
-    html_string = render_to_string('purchases/purchase_order_pdf.html', {
+def render_purchase_order_html(purchase_order):
+    """Render the HTML used for the purchase order PDF."""
+    return render_to_string('purchases/purchase_order_pdf.html', {
         'purchase_order': purchase_order,
         'company': purchase_order.company,
         'supplier': purchase_order.supplier,
         'items': purchase_order.items.all(),
     })
 
-    # Create PDF
-    html = HTML(string=html_string)
-    pdf_buffer = io.BytesIO()
-    html.write_pdf(pdf_buffer)
 
-    return pdf_buffer
+def generate_purchase_order_pdf(purchase_order):
+    """
+    Return the purchase order PDF as an open binary file.
+
+    The PDF is cached per purchase order version and rendered in the
+    process pool on a miss.
+    """
+    return get_document_pdf(purchase_order, 'purchase_order', render_purchase_order_html)
 
 
 def send_purchase_order_email(purchase_order, email):
-    """Send purchase order via email."""
+    """Queue the purchase order PDF for delivery by email."""
     subject = _('Purchase Order {} from {}').format(
         purchase_order.order_number,
         purchase_order.company.name
     )
 
-    # Generate PDF
-    pdf_buffer = generate_purchase_order_pdf(purchase_order)
-
-    # Send email
-    send_mail(
-        subject=subject,
-        message=_('Please find attached our purchase order {}').format(purchase_order.order_number),
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[email],
-        fail_silently=False,
-        attachments=[(
-            f'purchase_order_{purchase_order.order_number}.pdf',
-            pdf_buffer.read(),
-            'application/pdf'
-        )]
-    )
+    with generate_purchase_order_pdf(purchase_order) as pdf:
+        queue_email(
+            subject=subject,
+            body=_('Please find attached our purchase order {}').format(purchase_order.order_number),
+            to=[email],
+            attachments=[(f'purchase_order_{purchase_order.order_number}.pdf', pdf, 'application/pdf')]
+        )
 
 
 def update_stock_on_purchase(product, quantity):
@@ -8,7 +8,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.db.models import Q, Sum
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import FileResponse
 from .models import (
     Supplier, PurchaseOrder, PurchaseOrderItem, 
     GoodsReceipt, GoodsReceiptItem, SupplierInvoice, SupplierPayment
@@ -22,6 +22,9 @@ from .utils import (
     generate_purchase_order_pdf, send_purchase_order_email,
     update_stock_on_purchase
 )
+from .tasks import prerender_purchase_order_pdf
+from apps.companies.numbering import DocumentNumberService
+from apps.companies.pdf import prerender_on_commit
 
 import csv
 import io
@@ -116,6 +119,9 @@ class PurchaseOrderViewSet(viewsets.ModelViewSet):
         purchase_order.status = 'confirmed'
         purchase_order.save()
 
+        # Confirmed orders are usually printed or sent next
+        prerender_on_commit(prerender_purchase_order_pdf, purchase_order.pk)
+
         return Response({
             'message': _('Purchase order confirmed successfully')
         })
@@ -147,16 +153,13 @@ class PurchaseOrderViewSet(viewsets.ModelViewSet):
         """Generate PDF for purchase order."""
         purchase_order = self.get_object()
 
-        # Generate PDF
-        pdf_buffer = generate_purchase_order_pdf(purchase_order)
-
-        # Return PDF
-        response = HttpResponse(
-            pdf_buffer.read(),
+        # Stream the cached PDF, rendering it first on a miss
+        return FileResponse(
+            generate_purchase_order_pdf(purchase_order),
+            as_attachment=True,
+            filename=f'purchase_order_{purchase_order.order_number}.pdf',
             content_type='application/pdf'
         )
-        response['Content-Disposition'] = f'attachment; filename="purchase_order_{purchase_order.order_number}.pdf"'
-        return response
 
 
 class GoodsReceiptViewSet(viewsets.ModelViewSet):
@@ -294,6 +297,9 @@ class SupplierInvoiceViewSet(viewsets.ModelViewSet):
             # Create payment
             payment = SupplierPayment.objects.create(
                 company=supplier_invoice.company,
+                payment_number=DocumentNumberService.next_number(
+                    supplier_invoice.company_id, 'supplier_payment'
+                ),
                 supplier=supplier_invoice.supplier,
                 invoice=supplier_invoice,
                 amount=amount,
@@ -349,6 +355,13 @@ class SupplierPaymentViewSet(viewsets.ModelViewSet):
         user = self.request.user
         return SupplierPayment.objects.filter(company=user.company)
 
+    def perform_create(self, serializer):
+        """Set company and created_by when creating a supplier payment."""
+        serializer.save(
+            company=self.request.user.company,
+            created_by=self.request.user
+        )
+
 
 class GeneratePurchaseOrderPDFView(APIView):
     """View for generating purchase order PDF."""
@@ -363,16 +376,13 @@ class GeneratePurchaseOrderPDFView(APIView):
                 company=request.user.company
             )
 
-            # Generate PDF
-            pdf_buffer = generate_purchase_order_pdf(purchase_order)
-
-            # Return PDF
-            response = HttpResponse(
-                pdf_buffer.read(),
+            # Stream the cached PDF, rendering it first on a miss
+            return FileResponse(
+                generate_purchase_order_pdf(purchase_order),
+                as_attachment=True,
+                filename=f'purchase_order_{purchase_order.order_number}.pdf',
                 content_type='application/pdf'
             )
-            response['Content-Disposition'] = f'attachment; filename="purchase_order_{purchase_order.order_number}.pdf"'
-            return response
         except PurchaseOrder.DoesNotExist:
             return Response(
                 {'error': _('Purchase order not found')},
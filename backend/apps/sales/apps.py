@@ -6,3 +6,6 @@ class SalesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.sales'
     verbose_name = 'Sales'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('sales', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='zatca_counter',
+            field=models.PositiveBigIntegerField(blank=True, null=True, verbose_name='ZATCA invoice counter'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='zatca_previous_hash',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='ZATCA previous invoice hash'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='zatca_signature',
+            field=models.TextField(blank=True, null=True, verbose_name='ZATCA signature'),
+        ),
+        migrations.CreateModel(
+            name='ZATCAHashChain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_hash', models.CharField(blank=True, max_length=100, null=True, verbose_name='last invoice hash')),
+                ('counter', models.PositiveBigIntegerField(default=0, verbose_name='invoice counter')),
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='zatca_chain', to='companies.company', verbose_name='company')),
+            ],
+            options={
+                'verbose_name': 'ZATCA Hash Chain',
+                'verbose_name_plural': 'ZATCA Hash Chains',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_documentsequence_documentnumberblock'),
+        ('sales', '0003_zatca_hash_chain'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='client_uuid',
+            field=models.UUIDField(blank=True, null=True, verbose_name='client UUID'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='device_id',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='device ID'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='invoice',
+            unique_together={('client_uuid', 'company'), ('invoice_number', 'company')},
+        ),
+    ]
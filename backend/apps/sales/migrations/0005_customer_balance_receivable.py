@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:20
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def recompute_balances(apps, schema_editor):
+    """
+    Set every customer balance to the balance due of their open sales invoices.
+
+    Balances were only set by hand until now, and may or may not already
+    include invoices, so they are recomputed rather than added to.
+    """
+    Customer = apps.get_model('sales', 'Customer')
+    Invoice = apps.get_model('sales', 'Invoice')
+
+    receivable = (
+        Invoice.objects.filter(invoice_type='sales', customer=OuterRef('pk'))
+        .exclude(payment_status='refunded')
+        .values('customer')
+        .annotate(due=Sum(F('total_amount') - F('paid_amount')))
+        .values('due')
+    )
+    Customer.objects.update(balance=Coalesce(
+        Subquery(receivable, output_field=DecimalField(max_digits=10, decimal_places=2)),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_invoice_client_uuid'),
+    ]
+
+    operations = [
+        # The hand-set balances cannot be restored
+        migrations.RunPython(recompute_balances, migrations.RunPython.noop),
+    ]
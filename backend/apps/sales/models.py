@@ -79,11 +79,17 @@ class Invoice(models.Model):
     payment_status = models.CharField(_('payment status'), max_length=20, choices=PAYMENT_STATUS, default='unpaid')
     is_sent = models.BooleanField(_('sent'), default=False)
     notes = models.TextField(_('notes'), blank=True, null=True)
+    # Set by POS terminals to make offline replays idempotent
+    client_uuid = models.UUIDField(_('client UUID'), blank=True, null=True)
+    device_id = models.CharField(_('device ID'), max_length=100, blank=True, null=True)
 
     # Compliance
     qr_code_data = models.TextField(_('QR code data'), blank=True, null=True)
     zatca_uuid = models.CharField(_('ZATCA UUID'), max_length=100, blank=True, null=True)
     zatca_hash = models.CharField(_('ZATCA hash'), max_length=500, blank=True, null=True)
+    zatca_previous_hash = models.CharField(_('ZATCA previous invoice hash'), max_length=100, blank=True, null=True)
+    zatca_counter = models.PositiveBigIntegerField(_('ZATCA invoice counter'), blank=True, null=True)
+    zatca_signature = models.TextField(_('ZATCA signature'), blank=True, null=True)
     eta_uuid = models.CharField(_('ETA UUID'), max_length=100, blank=True, null=True)
 
     # Timestamps
@@ -102,7 +108,7 @@ class Invoice(models.Model):
         verbose_name = _('Invoice')
         verbose_name_plural = _('Invoices')
         ordering = ['-date', '-invoice_number']
-        unique_together = ['invoice_number', 'company']
+        unique_together = [['invoice_number', 'company'], ['client_uuid', 'company']]
 
     def __str__(self):
         return f"{self.invoice_number} - {self.customer.name}"
@@ -150,6 +156,28 @@ class InvoiceItem(models.Model):
     def __str__(self):
         return f"{self.invoice.invoice_number} - {self.product.name}"
 
+class ZATCAHashChain(models.Model):
+    """
+    Head of a company's ZATCA invoice hash chain. Each chained invoice
+    embeds the hash of the one before it.
+    """
+
+    company = models.OneToOneField(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='zatca_chain',
+        verbose_name=_('company')
+    )
+    last_hash = models.CharField(_('last invoice hash'), max_length=100, blank=True, null=True)
+    counter = models.PositiveBigIntegerField(_('invoice counter'), default=0)
+
+    class Meta:
+        verbose_name = _('ZATCA Hash Chain')
+        verbose_name_plural = _('ZATCA Hash Chains')
+
+    def __str__(self):
+        return f"{self.company} - {self.counter}"
+
 class Payment(models.Model):
     """Payment model for tracking payments against invoices."""
 
@@ -1,6 +1,7 @@
 
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
+from apps.companies.numbering import NumberedDocumentSerializerMixin
 from .models import Customer, Invoice, InvoiceItem, Payment
 
 
@@ -29,6 +30,8 @@ class CustomerSerializer(serializers.ModelSerializer):
 class InvoiceItemSerializer(serializers.ModelSerializer):
     """Serializer for InvoiceItem model."""
 
+    # Validated in bulk by InvoiceSerializer instead of one query per line
+    product = serializers.IntegerField(source='product_id')
     product_name = serializers.CharField(source='product.name', read_only=True)
     product_sku = serializers.CharField(source='product.sku', read_only=True)
 
@@ -57,11 +60,14 @@ class PaymentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'created_by']
 
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(NumberedDocumentSerializerMixin, serializers.ModelSerializer):
     """Serializer for Invoice model."""
 
+    document_type = 'invoice'
+    number_field = 'invoice_number'
+
     customer_name = serializers.CharField(source='customer.name', read_only=True)
-    items = InvoiceItemSerializer(many=True, read_only=True)
+    items = InvoiceItemSerializer(many=True, required=False)
     payments = PaymentSerializer(many=True, read_only=True)
     balance_due = serializers.DecimalField(read_only=True, max_digits=10, decimal_places=2)
     is_overdue = serializers.BooleanField(read_only=True)
@@ -73,28 +79,50 @@ class InvoiceSerializer(serializers.ModelSerializer):
             'date', 'due_date', 'subtotal', 'tax_amount', 'discount_amount',
             'total_amount', 'paid_amount', 'balance_due', 'payment_status',
             'is_sent', 'notes', 'qr_code_data', 'zatca_uuid', 'zatca_hash',
-            'eta_uuid', 'is_overdue', 'items', 'payments',
+            'zatca_previous_hash', 'zatca_counter',
+            'eta_uuid', 'client_uuid', 'device_id', 'is_overdue', 'items', 'payments',
             'created_at', 'updated_at', 'created_by'
         ]
         read_only_fields = [
-            'id', 'balance_due', 'is_overdue', 'created_at', 'updated_at'
+            'id', 'balance_due', 'is_overdue', 'created_at', 'updated_at',
+            # Only PaymentService moves these, together with the customer balance
+            'paid_amount', 'payment_status',
+            'zatca_hash', 'zatca_previous_hash', 'zatca_counter',
+            'client_uuid', 'device_id'
         ]
+        extra_kwargs = {
+            'invoice_number': {'required': False},
+            # Computed from the items when they are given
+            'subtotal': {'required': False},
+            'total_amount': {'required': False},
+        }
+
+    def validate(self, attrs):
+        """Require either items or explicit totals on create."""
+        if self.instance is None and not attrs.get('items'):
+            if 'subtotal' not in attrs or 'total_amount' not in attrs:
+                raise serializers.ValidationError(_('Invoice items or totals are required'))
+        return attrs
 
     def create(self, validated_data):
-        """Create invoice with items."""
-        from apps.inventory.utils import update_stock_on_sale
-        
-        items_data = validated_data.pop('items', [])
-
-        # Create invoice
-        invoice = Invoice.objects.create(**validated_data)
-
-        # Create invoice items
-        for item_data in items_data:
-            item = InvoiceItem.objects.create(invoice=invoice, **item_data)
-            
-            # Update stock if it's a sales invoice
-            if invoice.invoice_type == 'sales':
-                update_stock_on_sale(item.product, item.quantity, invoice)
-
-        return invoice
+        """
+        Create invoice with items.
+
+        Totals are computed from the items, the items are inserted with one
+        bulk insert and the stock of sales invoices is moved in one batch,
+        all in a single transaction.
+        """
+        from .services import InvoiceService
+
+        company = validated_data['company']
+        if InvoiceService.invalid_products(company, [validated_data]):
+            raise serializers.ValidationError({'items': _('Invalid product')})
+
+        return InvoiceService.create_invoices(
+            company, [validated_data], user=validated_data.get('created_by')
+        )[0]
+
+    def update(self, instance, validated_data):
+        """Update invoice fields; items are only set on create."""
+        validated_data.pop('items', None)
+        return super().update(instance, validated_data)
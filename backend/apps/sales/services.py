@@ -0,0 +1,276 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, CharField, DecimalField, F, Value, When
+from django.db.models.signals import post_save
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from apps.companies.numbering import DocumentNumberService
+from apps.inventory.models import Product
+from apps.inventory.services import InventoryService, StockMovement
+from .models import Customer, Invoice, InvoiceItem, Payment
+from .signals import invoice_contribution
+from .utils import calculate_invoice_totals
+
+
+class CustomerBalanceService:
+    """
+    Service for keeping ``Customer.balance`` (the amount the customer owes)
+    in step with their invoices: sales invoices add their balance due,
+    payments and deletions take it off again.
+    """
+
+    @staticmethod
+    def receivable(invoice):
+        """Amount the invoice adds to its customer's balance."""
+        if invoice.invoice_type != 'sales' or invoice.payment_status == 'refunded':
+            return Decimal('0')
+        return invoice.total_amount - invoice.paid_amount
+
+    @staticmethod
+    def adjust(deltas):
+        """Apply ``{customer id: amount}`` to the balances with ``F()`` updates."""
+        now = timezone.now()
+        for customer_id, delta in deltas.items():
+            if customer_id and delta:
+                Customer.objects.filter(pk=customer_id).update(balance=F('balance') + delta, updated_at=now)
+
+    @staticmethod
+    def replace(old_invoice, new_invoice):
+        """Move the balances after an invoice was edited (or deleted: ``new_invoice=None``)."""
+        deltas = defaultdict(Decimal)
+        deltas[old_invoice.customer_id] -= CustomerBalanceService.receivable(old_invoice)
+        if new_invoice is not None:
+            deltas[new_invoice.customer_id] += CustomerBalanceService.receivable(new_invoice)
+        CustomerBalanceService.adjust(deltas)
+
+
+class InvoiceService:
+    """
+    Service for creating invoices together with their lines and stock
+    movements in bulk.
+    """
+
+    @staticmethod
+    def invalid_products(company, invoices_data):
+        """
+        Return the product ids referenced by ``invoices_data`` that do not
+        belong to ``company``, checked with one query.
+        """
+        product_ids = {
+            item_data['product_id']
+            for data in invoices_data
+            for item_data in data.get('items', [])
+        }
+        if not product_ids:
+            return set()
+
+        found = set(
+            Product.objects.filter(company=company, pk__in=product_ids).values_list('pk', flat=True)
+        )
+        return product_ids - found
+
+    @staticmethod
+    @transaction.atomic
+    def create_invoices(company, invoices_data, user=None):
+        """
+        Create invoices from validated ``InvoiceSerializer`` data.
+
+        Totals are computed from the items, missing invoice numbers are
+        allocated with ``DocumentNumberService.allocate``, invoices and
+        items are inserted with one bulk insert each and the stock of all
+        sales invoices is moved in one batch. Check the products with
+        ``invalid_products`` first.
+
+        Args:
+            company: The company the invoices belong to.
+            invoices_data: List of validated data dicts (with ``items``).
+            user: The user creating the invoices.
+
+        Returns:
+            The created invoices, in order.
+        """
+        invoices = []
+        items_data_per_invoice = []
+        for data in invoices_data:
+            data = dict(data)
+            data.pop('company', None)
+            items_data = [dict(item_data) for item_data in data.pop('items', [])]
+            if items_data:
+                data.update(calculate_invoice_totals(items_data, data.get('discount_amount', 0)))
+            data.setdefault('created_by', user)
+
+            invoices.append(Invoice(company=company, **data))
+            items_data_per_invoice.append(items_data)
+
+        # Numbers come from this worker's reserved block, allocated right
+        # before the insert; the sequence row is only locked on a refill
+        unnumbered = [invoice for invoice in invoices if not invoice.invoice_number]
+        if unnumbered:
+            numbers = DocumentNumberService.allocate(company.id, 'invoice', len(unnumbered))
+            for invoice, number in zip(unnumbered, numbers):
+                invoice.invoice_number = number
+
+        Invoice.objects.bulk_create(invoices)
+        items = InvoiceItem.objects.bulk_create([
+            InvoiceItem(invoice=invoice, **item_data)
+            for invoice, items_data in zip(invoices, items_data_per_invoice)
+            for item_data in items_data
+        ])
+
+        # Update stock of sales invoices
+        InventoryService.process_transactions(
+            [
+                StockMovement(
+                    item.product_id,
+                    -item.quantity,
+                    related_document=item.invoice,
+                    notes=f"Sale Invoice: {item.invoice.invoice_number}"
+                )
+                for item in items
+                if item.invoice.invoice_type == 'sales'
+            ],
+            transaction_type='sale',
+            user=user
+        )
+
+        balances = defaultdict(Decimal)
+        for invoice in invoices:
+            balances[invoice.customer_id] += CustomerBalanceService.receivable(invoice)
+        CustomerBalanceService.adjust(balances)
+
+        # bulk_create skips model signals: replay them (dashboard push, caches)
+        for invoice in invoices:
+            post_save.send(sender=Invoice, instance=invoice, created=True)
+
+        return invoices
+
+
+class PaymentService:
+    """
+    Service for applying customer payments to invoices.
+
+    Only open sales invoices receive payments. They are locked before their
+    balance due is checked and updated with ``F()`` expressions, and the
+    customer balance moves in the same transaction, so concurrent payments
+    can neither overpay an invoice nor lose an update.
+    """
+
+    OPEN_STATUSES = ('unpaid', 'partial', 'overdue')
+
+    @staticmethod
+    def _apply(allocations, payment_method, user=None, reference='', notes=''):
+        """
+        Record ``(locked invoice, amount)`` allocations: one payment per
+        invoice, one update of all the invoices and one balance update per
+        customer.
+        """
+        now = timezone.now()
+        paid_amounts = []
+        statuses = []
+        balances = defaultdict(Decimal)
+        for invoice, amount in allocations:
+            # Old dashboard contribution for the post_save replay below
+            invoice._dashboard_contribution = invoice_contribution(invoice)
+            invoice.paid_amount += amount
+            invoice.payment_status = 'paid' if invoice.paid_amount >= invoice.total_amount else 'partial'
+            invoice.updated_at = now
+            paid_amounts.append(When(pk=invoice.pk, then=F('paid_amount') + Value(amount)))
+            statuses.append(When(pk=invoice.pk, then=Value(invoice.payment_status)))
+            balances[invoice.customer_id] -= amount
+
+        Invoice.objects.filter(pk__in=[invoice.pk for invoice, _amount in allocations]).update(
+            paid_amount=Case(*paid_amounts, output_field=DecimalField(max_digits=10, decimal_places=2)),
+            payment_status=Case(*statuses, output_field=CharField()),
+            updated_at=now
+        )
+        payments = Payment.objects.bulk_create([
+            Payment(
+                invoice=invoice,
+                amount=amount,
+                payment_method=payment_method,
+                reference=reference,
+                notes=notes,
+                date=now.date(),
+                created_by=user
+            )
+            for invoice, amount in allocations
+        ])
+        CustomerBalanceService.adjust(balances)
+
+        # Set-based writes skip model signals: replay them (dashboard push, caches)
+        for invoice, _amount in allocations:
+            post_save.send(sender=Invoice, instance=invoice, created=False)
+        for payment in payments:
+            post_save.send(sender=Payment, instance=payment, created=True)
+
+        return payments
+
+    @staticmethod
+    @transaction.atomic
+    def apply_payment(invoice_id, amount, payment_method, user=None, reference='', notes=''):
+        """
+        Apply a payment to one invoice.
+
+        Args:
+            invoice_id: The invoice to pay.
+            amount: Decimal amount, greater than 0.
+            payment_method: One of ``Payment.PAYMENT_METHODS``.
+            user: The user recording the payment.
+
+        Returns:
+            (payment, invoice) with the invoice's new paid amount and status.
+
+        Raises:
+            ValueError: If the invoice is not an open sales invoice or the
+                amount exceeds its balance due.
+        """
+        invoice = Invoice.objects.select_for_update().get(pk=invoice_id)
+        if invoice.invoice_type != 'sales' or invoice.payment_status not in PaymentService.OPEN_STATUSES:
+            raise ValueError(_('Only unpaid sales invoices can receive payments'))
+        if amount > invoice.balance_due:
+            raise ValueError(_('Payment amount exceeds balance due'))
+
+        payment, = PaymentService._apply([(invoice, amount)], payment_method, user, reference, notes)
+        return payment, invoice
+
+    @staticmethod
+    @transaction.atomic
+    def allocate_payment(customer_id, amount, payment_method, user=None, reference='', notes='', invoice_ids=None):
+        """
+        Apply one receipt across the customer's open sales invoices, oldest
+        first (by date, then id). ``invoice_ids`` limits the invoices the
+        receipt may settle.
+
+        Returns:
+            List of (invoice, payment) pairs, oldest first.
+
+        Raises:
+            ValueError: If the amount exceeds the open invoices' balance due.
+        """
+        # Lock the customer first so receipts of one customer allocate one at a time
+        customer = Customer.objects.select_for_update().get(pk=customer_id)
+        invoices = Invoice.objects.select_for_update().filter(
+            company_id=customer.company_id,
+            customer=customer,
+            invoice_type='sales',
+            payment_status__in=PaymentService.OPEN_STATUSES,
+            paid_amount__lt=F('total_amount')
+        ).order_by('date', 'id')
+        if invoice_ids is not None:
+            invoices = invoices.filter(pk__in=invoice_ids)
+
+        allocations = []
+        remaining = amount
+        for invoice in invoices:
+            if not remaining:
+                break
+            applied = min(remaining, invoice.balance_due)
+            allocations.append((invoice, applied))
+            remaining -= applied
+
+        if remaining:
+            raise ValueError(_('Payment amount exceeds the balance due of the open invoices'))
+
+        payments = PaymentService._apply(allocations, payment_method, user, reference, notes)
+        return [(invoice, payment) for (invoice, _amount), payment in zip(allocations, payments)]
@@ -0,0 +1,91 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.utils import timezone
+from apps.companies.cache import invalidate_tenant_namespaces
+from apps.companies.realtime import dashboard_publisher, diff_delta
+from .models import Customer, Invoice, Payment
+from .utils import revenue_month_starts
+
+# Customer lists include total_sales, which is derived from invoices.
+invalidate_customers = invalidate_tenant_namespaces('customers')
+
+for signal in (post_save, post_delete):
+    signal.connect(invalidate_customers, sender=Customer, dispatch_uid=f'customer_cache_{signal}')
+    signal.connect(invalidate_customers, sender=Invoice, dispatch_uid=f'invoice_customer_cache_{signal}')
+
+
+# Invoice fields the dashboard counters depend on
+CONTRIBUTION_FIELDS = {'payment_status', 'invoice_type', 'total_amount', 'date'}
+
+
+def invoice_contribution(invoice):
+    """Contribution of an invoice to the dashboard counters."""
+    if invoice.get_deferred_fields() & CONTRIBUTION_FIELDS:
+        return None
+
+    revenue = float(invoice.total_amount or 0) if invoice.payment_status == 'paid' else 0.0
+    contribution = {
+        'revenue': revenue,
+        'orders': 0 if invoice.payment_status in ['paid', 'refunded'] else 1,
+        'workOrders': 1 if invoice.invoice_type == 'quote' else 0,
+    }
+    # Keyed like the ``month`` of the six-month series; invoices dated
+    # outside it do not appear in the chart
+    if revenue and invoice.date and invoice.date >= revenue_month_starts(timezone.now().date())[0]:
+        contribution['revenueData'] = {invoice.date.strftime('%Y-%m'): revenue}
+    return contribution
+
+
+def remember_invoice_state(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Read the stored contribution of an edited invoice just before it is
+    saved, so the save can publish only the change. Only writes pay for
+    this; loading invoices does not.
+    """
+    if raw or instance._state.adding or instance.pk is None:
+        instance._dashboard_contribution = {}
+        return
+    if update_fields is not None and not CONTRIBUTION_FIELDS & set(update_fields):
+        # Nothing the counters depend on changes
+        instance._dashboard_contribution = None
+        return
+
+    stored = Invoice.objects.filter(pk=instance.pk).only(*CONTRIBUTION_FIELDS).first()
+    instance._dashboard_contribution = invoice_contribution(stored) if stored else {}
+
+
+def remember_deleted_invoice(sender, instance, **kwargs):
+    """Keep the contribution of an invoice about to be deleted."""
+    instance._dashboard_contribution = invoice_contribution(instance)
+
+
+def publish_invoice_delta(sender, instance, created=False, **kwargs):
+    """
+    Push the dashboard counter changes caused by an invoice write.
+
+    Set-based writes that replay ``post_save`` store the old contribution
+    in ``_dashboard_contribution`` before changing the instance.
+    """
+    old = {} if created else getattr(instance, '_dashboard_contribution', None)
+    new = {} if kwargs.get('signal') is post_delete else invoice_contribution(instance)
+    if old is None or new is None:
+        return
+
+    delta = diff_delta(new, {} if created else old)
+    instance._dashboard_contribution = new
+    if delta:
+        dashboard_publisher.publish(instance.company_id, delta)
+
+
+def publish_payment_delta(sender, instance, created, **kwargs):
+    """Push received payment totals."""
+    if created:
+        dashboard_publisher.publish(instance.invoice.company_id, {
+            'payments': {'count': 1, 'amount': float(instance.amount)}
+        })
+
+
+pre_save.connect(remember_invoice_state, sender=Invoice, dispatch_uid='invoice_dashboard_state')
+pre_delete.connect(remember_deleted_invoice, sender=Invoice, dispatch_uid='invoice_dashboard_delete_state')
+post_save.connect(publish_invoice_delta, sender=Invoice, dispatch_uid='invoice_dashboard_push_save')
+post_delete.connect(publish_invoice_delta, sender=Invoice, dispatch_uid='invoice_dashboard_push_delete')
+post_save.connect(publish_payment_delta, sender=Payment, dispatch_uid='payment_dashboard_push')
@@ -0,0 +1,109 @@
+"""
+Invoice signing for ZATCA and ETA compliance.
+
+Parsing a PEM private key costs far more than the signature itself, so
+parsed keys are kept per company and kind in memory. Each entry remembers
+the PEM it was built from and is rebuilt as soon as
+``Company.zatca_private_key`` / ``eta_private_key`` holds something else.
+Large batches are signed in the shared process pool in chunks; pool
+workers keep their own parsed keys, so a key is parsed once per worker.
+"""
+
+import base64
+import hashlib
+from functools import lru_cache
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from apps.companies.cache import LocalLRUCache
+from apps.companies.pool import map_in_pool
+
+
+def invoice_digest(invoice):
+    """SHA-256 digest of the invoice fields covered by the signature."""
+    invoice_data = f"{invoice.invoice_number}|{invoice.date}|{invoice.total_amount}|{invoice.tax_amount}"
+    return hashlib.sha256(invoice_data.encode()).digest()
+
+
+def _parse_key(pem):
+    return serialization.load_pem_private_key(
+        pem.encode(),
+        password=None,
+        backend=default_backend()
+    )
+
+
+def _sign(key, digest):
+    return base64.b64encode(key.sign(digest, padding.PKCS1v15(), hashes.SHA256())).decode()
+
+
+@lru_cache(maxsize=32)
+def _worker_key(pem):
+    return _parse_key(pem)
+
+
+def _sign_digests(pem, digests):
+    """Sign a chunk of digests. Runs in pool workers."""
+    key = _worker_key(pem)
+    return [_sign(key, digest) for digest in digests]
+
+
+class SigningKeyCache:
+    """Parsed private keys per (company, kind), rebuilt when the PEM changes."""
+
+    def __init__(self):
+        self._keys = LocalLRUCache(max_entries=getattr(settings, 'SIGNING_KEY_CACHE_SIZE', 256))
+
+    def get(self, company_id, kind, pem):
+        if not pem:
+            raise ValueError(_('No private key is configured for {}').format(kind.upper()))
+
+        entry = self._keys.get((company_id, kind))
+        if entry is not None and entry[0] == pem:
+            return entry[1]
+
+        key = _parse_key(pem)
+        self._keys.set((company_id, kind), (pem, key), settings.SIGNING_KEY_CACHE_TIMEOUT)
+        return key
+
+
+signing_keys = SigningKeyCache()
+
+
+def sign_invoice(invoice, kind, private_key):
+    """Sign one invoice with the company's cached key, returning base64."""
+    key = signing_keys.get(invoice.company_id, kind, private_key)
+    return _sign(key, invoice_digest(invoice))
+
+
+def sign_digests(company_id, kind, private_key, digests):
+    """
+    Sign many digests with one company's key, returning signatures in order.
+
+    Batches of at least ``SIGNING_POOL_MIN_BATCH`` are split into chunks
+    of ``SIGNING_CHUNK_SIZE`` and signed in the process pool.
+    """
+    if not digests:
+        return []
+
+    if len(digests) < settings.SIGNING_POOL_MIN_BATCH:
+        key = signing_keys.get(company_id, kind, private_key)
+        return [_sign(key, digest) for digest in digests]
+
+    if not private_key:
+        raise ValueError(_('No private key is configured for {}').format(kind.upper()))
+
+    size = settings.SIGNING_CHUNK_SIZE
+    chunks = [digests[i:i + size] for i in range(0, len(digests), size)]
+    signed = map_in_pool(_sign_digests, [private_key] * len(chunks), chunks)
+    return [signature for chunk in signed for signature in chunk]
+
+
+def sign_invoices(invoices, kind, private_key):
+    """Sign many invoices of one company, returning signatures in order."""
+    if not invoices:
+        return []
+    digests = [invoice_digest(invoice) for invoice in invoices]
+    return sign_digests(invoices[0].company_id, kind, private_key, digests)
@@ -0,0 +1,12 @@
+from celery import shared_task
+from apps.companies.pdf import render_document_pdf
+from .models import Invoice
+from .utils import render_invoice_html
+
+
+@shared_task
+def prerender_invoice_pdf(invoice_id):
+    """Render and store the PDF of the invoice's current version."""
+    invoice = Invoice.objects.select_related('company', 'customer').filter(pk=invoice_id).first()
+    if invoice:
+        return render_document_pdf(invoice, 'invoice', render_invoice_html)
@@ -1,29 +1,24 @@
 
-import io
-import base64
-import qrcode
-from datetime import datetime
-from django.conf import settings
-from django.core.mail import send_mail
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.template.loader import render_to_string
-# from weasyprint import HTML, CSS  # Temporarily disabled - requires GTK on Windows
 import json
-import hashlib
 import uuid
-import cryptography
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import utils
-from cryptography.hazmat.backends import default_backend
-from .models import Invoice
+from apps.companies.mail import queue_email
+from apps.companies.pdf import get_document_pdf
+from apps.companies.qr import render_qr, render_qr_batch
+from .models import Customer, Invoice
+from .signing import sign_digests, sign_invoice, sign_invoices
+from . import zatca
 
 
-def generate_invoice_pdf(invoice):
-    """Generate PDF for invoice."""
-    # Render HTML
-    html_string = render_to_string('sales/invoice_pdf.html', {
+def render_invoice_html(invoice):
+    """Render the HTML used for the invoice PDF."""
+    return render_to_string('sales/invoice_pdf.html', {
         'invoice': invoice,
         'company': invoice.company,
         'customer': invoice.customer,
@@ -31,43 +26,78 @@ def generate_invoice_pdf(invoice):
         'payments': invoice.payments.all(),
     })
 
-    # Create PDF
-    html = HTML(string=html_string)
-    pdf_buffer = io.BytesIO()
-    html.write_pdf(pdf_buffer)
 
-    return pdf_buffer
+def generate_invoice_pdf(invoice):
+    """
+    Return the invoice PDF as an open binary file.
+
+    The PDF is cached per invoice version and rendered in the process pool
+    on a miss.
+    """
+    return get_document_pdf(invoice, 'invoice', render_invoice_html)
 
 
 def send_invoice_email(invoice, email):
-    """Send invoice via email."""
+    """Queue the invoice PDF for delivery by email."""
     subject = _('Invoice {} from {}').format(
         invoice.invoice_number,
         invoice.company.name
     )
 
-    # Generate PDF
-    pdf_buffer = generate_invoice_pdf(invoice)
-
-    # Send email
-    send_mail(
-        subject=subject,
-        message=_('Please find attached your invoice {}').format(invoice.invoice_number),
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[email],
-        fail_silently=False,
-        attachments=[(
-            f'invoice_{invoice.invoice_number}.pdf',
-            pdf_buffer.read(),
-            'application/pdf'
-        )]
-    )
+    with generate_invoice_pdf(invoice) as pdf:
+        queue_email(
+            subject=subject,
+            body=_('Please find attached your invoice {}').format(invoice.invoice_number),
+            to=[email],
+            attachments=[(f'invoice_{invoice.invoice_number}.pdf', pdf, 'application/pdf')]
+        )
+
+
+CENT = Decimal('0.01')
+
+
+def _money(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def parse_amount(value):
+    """Parse a request amount as Decimal cents; raise ValueError if invalid."""
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(value)
+    if not amount.is_finite():
+        raise ValueError(value)
+    return _money(amount)
+
+
+def calculate_invoice_totals(items, discount_amount=0):
+    """
+    Compute line and invoice totals in Decimal, rounded per line.
+
+    Sets each item's ``total`` (after its discount, before tax) and returns
+    the invoice ``subtotal``, ``tax_amount`` and ``total_amount``;
+    ``discount_amount`` is the invoice-level discount on top of the lines.
+    """
+    subtotal = Decimal('0')
+    tax_amount = Decimal('0')
+    for item in items:
+        gross = item['quantity'] * item['unit_price']
+        net = _money(gross - gross * item.get('discount_percentage', 0) / 100)
+        item['total'] = net
+        subtotal += net
+        tax_amount += _money(net * item.get('tax_rate', 0) / 100)
+
+    return {
+        'subtotal': subtotal,
+        'tax_amount': tax_amount,
+        'total_amount': subtotal + tax_amount - Decimal(str(discount_amount)),
+    }
 
 
-def generate_zatca_qr_code(invoice):
-    """Generate ZATCA QR code for invoice."""
-    # Create QR code data
-    qr_data = {
+def _qr_fields(invoice):
+    """Invoice fields encoded in ETA QR codes."""
+    return {
         'seller_name': invoice.company.name,
         'tax_register': invoice.company.tax_register,
         'invoice_number': invoice.invoice_number,
@@ -76,114 +106,236 @@ def generate_zatca_qr_code(invoice):
         'tax_amount': str(invoice.tax_amount)
     }
 
-    # Convert to TLV format
-    tlv_data = ''
-    for key, value in qr_data.items():
-        tlv_data += f'{len(key):02d}{key}{len(value):04d}{value}'
-
-    # Generate QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(tlv_data)
-    qr.make(fit=True)
 
-    # Convert to Base64
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    img_str = base64.b64encode(buffer.getvalue()).decode()
+def zatca_qr_payload(invoice):
+    """Build the ZATCA QR code content (base64 TLV) for invoice."""
+    return zatca.qr_payload(invoice)
 
-    return img_str
 
+def eta_qr_payload(invoice):
+    """Build the ETA QR code content for invoice."""
+    return json.dumps(_qr_fields(invoice))
 
-def generate_eta_qr_code(invoice):
-    """Generate ETA QR code for invoice."""
-    # Create QR code data
-    qr_data = {
-        'seller_name': invoice.company.name,
-        'tax_register': invoice.company.tax_register,
-        'invoice_number': invoice.invoice_number,
-        'date': invoice.date.isoformat(),
-        'total_amount': str(invoice.total_amount),
-        'tax_amount': str(invoice.tax_amount)
-    }
 
-    # Convert to JSON
-    json_data = json.dumps(qr_data)
+QR_PAYLOADS = {
+    'zatca': zatca_qr_payload,
+    'eta': eta_qr_payload,
+}
 
-    # Generate QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(json_data)
-    qr.make(fit=True)
 
-    # Convert to Base64
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    img_str = base64.b64encode(buffer.getvalue()).decode()
+def generate_zatca_qr_code(invoice, image_format=None):
+    """Generate ZATCA QR code for invoice."""
+    return render_qr(zatca_qr_payload(invoice), image_format)
+
 
-    return img_str
+def generate_eta_qr_code(invoice, image_format=None):
+    """Generate ETA QR code for invoice."""
+    return render_qr(eta_qr_payload(invoice), image_format)
 
 
-def sign_zatca_invoice(invoice, certificate, private_key):
-    """Sign ZATCA invoice."""
-    # Create hash
-    invoice_data = f"{invoice.invoice_number}|{invoice.date}|{invoice.total_amount}|{invoice.tax_amount}"
-    hash_value = hashlib.sha256(invoice_data.encode()).digest()
+def generate_invoice_qr_codes(invoices, kind='zatca', image_format=None):
+    """Generate QR codes for many invoices, returning {invoice id: base64 image}."""
+    build_payload = QR_PAYLOADS[kind]
+    invoices = list(invoices)
+    images = render_qr_batch([build_payload(invoice) for invoice in invoices], image_format)
+    return {invoice.id: image for invoice, image in zip(invoices, images)}
 
-    # Load private key
-    private_key = serialization.load_pem_private_key(
-        private_key.encode(),
-        password=None,
-        backend=default_backend()
-    )
 
-    # Sign hash
-    signature = private_key.sign(
-        hash_value,
-        padding.PKCS1v15(),
-        hashes.SHA256()
-    )
+def sign_eta_invoice(invoice, certificate, private_key):
+    """Sign ETA invoice."""
+    sign_invoice(invoice, 'eta', private_key)
 
     # Create UUID
-    zatca_uuid = str(uuid.uuid4())
+    eta_uuid = str(uuid.uuid4())
 
-    # Encode signature
-    signature_b64 = base64.b64encode(signature).decode()
+    return eta_uuid
 
-    return signature_b64, zatca_uuid
 
+COMPLIANCE_FIELDS = {
+    'zatca': [
+        'qr_code_data', 'zatca_hash', 'zatca_previous_hash', 'zatca_counter',
+        'zatca_signature', 'zatca_uuid', 'updated_at'
+    ],
+    'eta': ['qr_code_data', 'eta_uuid', 'updated_at'],
+}
+
+
+def apply_invoice_compliance(invoices, kind):
+    """
+    Sign and QR-encode many invoices of one company and save the results.
+
+    ZATCA invoices are appended to the company's hash chain in the given
+    order first; already chained invoices keep their hash and signature
+    and only get a fresh QR code. QR codes and signatures are produced in
+    batches (in the process pool for large ones) and written back with a
+    single bulk update. Must run inside a transaction.
+    """
+    invoices = list(invoices)
+    if not invoices:
+        return invoices
+
+    company = invoices[0].company
+    now = timezone.now()
+
+    if kind == 'zatca':
+        # The QR code embeds the invoice hash, so chain and sign first
+        digests = zatca.chain_invoices(company.id, invoices)
+        chained = [invoice for invoice in invoices if invoice.pk in digests]
+        signatures = sign_digests(
+            company.id, 'zatca', company.zatca_private_key,
+            [digests[invoice.pk] for invoice in chained]
+        )
+        for invoice, signature in zip(chained, signatures):
+            invoice.zatca_signature = signature
+            invoice.zatca_uuid = str(uuid.uuid4())
+        for invoice in invoices:
+            if invoice.pk not in digests and invoice.zatca_counter is None:
+                # Chained by a concurrent request since it was loaded
+                invoice.refresh_from_db(fields=COMPLIANCE_FIELDS['zatca'])
+    else:
+        sign_invoices(invoices, kind, company.eta_private_key)
+        for invoice in invoices:
+            invoice.eta_uuid = str(uuid.uuid4())
+
+    images = render_qr_batch([QR_PAYLOADS[kind](invoice) for invoice in invoices])
+    # bulk_update skips auto_now, and the cached PDF is keyed by updated_at
+    for invoice, image in zip(invoices, images):
+        invoice.qr_code_data = image
+        invoice.updated_at = now
+
+    Invoice.objects.bulk_update(invoices, COMPLIANCE_FIELDS[kind], batch_size=500)
+    return invoices
+
+
+def _percentage_change(current, previous):
+    """Period-over-period change in percent, rounded to one decimal."""
+    if not previous:
+        return 100.0 if current else 0.0
+    return round(float((current - previous) / previous * 100), 1)
+
+
+def _stat(current, previous, value=None):
+    """Build a dashboard stat card from the current and previous period."""
+    change = _percentage_change(current, previous)
+    return {
+        'value': current if value is None else value,
+        'change': change,
+        'trend': 'up' if change >= 0 else 'down'
+    }
 
-def sign_eta_invoice(invoice, certificate, private_key):
-    """Sign ETA invoice."""
-    # Create hash
-    invoice_data = f"{invoice.invoice_number}|{invoice.date}|{invoice.total_amount}|{invoice.tax_amount}"
-    hash_value = hashlib.sha256(invoice_data.encode()).digest()
-
-    # Load private key
-    private_key = serialization.load_pem_private_key(
-        private_key.encode(),
-        password=None,
-        backend=default_backend()
+
+def revenue_month_starts(today, months=6):
+    """First days of the last ``months`` months up to ``today``, oldest first."""
+    month_starts = []
+    year, month = today.year, today.month
+    for _i in range(months):
+        month_starts.insert(0, today.replace(year=year, month=month, day=1))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return month_starts
+
+
+def compute_dashboard_stats(company):
+    """
+    Compute dashboard statistics for a company.
+
+    Uses four queries regardless of data volume: invoice KPIs, the
+    six-month revenue series, new customers and stock status. Change
+    percentages compare the last 30 days with the 30 days before.
+    """
+    from apps.inventory.models import Product
+
+    today = timezone.now().date()
+    current_start = today - timedelta(days=30)
+    previous_start = today - timedelta(days=60)
+
+    paid = Q(payment_status='paid')
+    active = ~Q(payment_status__in=['paid', 'refunded'])
+    quote = Q(invoice_type='quote')
+    current_period = Q(date__gte=current_start)
+    previous_period = Q(date__gte=previous_start, date__lt=current_start)
+
+    # 1. Invoice KPIs (revenue, active orders, quotes) in one pass
+    invoices = Invoice.objects.filter(company=company).aggregate(
+        revenue=Sum('total_amount', filter=paid),
+        revenue_current=Sum('total_amount', filter=paid & current_period),
+        revenue_previous=Sum('total_amount', filter=paid & previous_period),
+        active_orders=Count('id', filter=active),
+        orders_current=Count('id', filter=active & current_period),
+        orders_previous=Count('id', filter=active & previous_period),
+        quotes=Count('id', filter=quote),
+        quotes_current=Count('id', filter=quote & current_period),
+        quotes_previous=Count('id', filter=quote & previous_period),
     )
 
-    # Sign hash
-    signature = private_key.sign(
-        hash_value,
-        padding.PKCS1v15(),
-        hashes.SHA256()
+    # 2. New customers, current vs previous period
+    customers = Customer.objects.filter(
+        company=company,
+        created_at__date__gte=previous_start
+    ).aggregate(
+        current=Count('id', filter=Q(created_at__date__gte=current_start)),
+        previous=Count('id', filter=Q(created_at__date__lt=current_start)),
     )
 
-    # Create UUID
-    eta_uuid = str(uuid.uuid4())
+    # 3. Revenue chart data (last 6 months) grouped by month
+    month_starts = revenue_month_starts(today)
+
+    monthly_revenue = {
+        row['month']: row['total']
+        for row in Invoice.objects.filter(
+            company=company,
+            payment_status='paid',
+            date__gte=month_starts[0]
+        ).annotate(
+            month=TruncMonth('date')
+        ).values('month').annotate(
+            total=Sum('total_amount')
+        ).order_by()
+    }
 
-    return eta_uuid
+    revenue_data = [
+        {
+            'name': month_start.strftime('%b'),
+            # Key of the month in live revenueData deltas
+            'month': month_start.strftime('%Y-%m'),
+            'value': float(monthly_revenue.get(month_start) or 0)
+        }
+        for month_start in month_starts
+    ]
+
+    # 4. Inventory status with one conditional aggregate
+    stock = Product.objects.filter(company=company).aggregate(
+        healthy=Count('id', filter=Q(current_stock__gt=F('reorder_point'))),
+        low=Count('id', filter=Q(current_stock__lte=F('reorder_point'))),
+        out=Count('id', filter=Q(current_stock=0)),
+    )
+
+    inventory_data = [
+        {'name': 'Healthy', 'value': stock['healthy']},
+        {'name': 'Low Stock', 'value': stock['low']},
+        {'name': 'Out of Stock', 'value': stock['out']},
+    ]
+
+    revenue = invoices['revenue'] or 0
+
+    return {
+        'stats': {
+            'revenue': _stat(
+                invoices['revenue_current'] or 0,
+                invoices['revenue_previous'] or 0,
+                value=float(revenue)
+            ),
+            'orders': _stat(
+                invoices['orders_current'],
+                invoices['orders_previous'],
+                value=invoices['active_orders']
+            ),
+            'customers': _stat(customers['current'], customers['previous']),
+            'workOrders': _stat(
+                invoices['quotes_current'],
+                invoices['quotes_previous'],
+                value=invoices['quotes']
+            )
+        },
+        'revenueData': revenue_data,
+        'inventoryData': inventory_data
+    }
@@ -6,22 +6,34 @@ from rest_framework.views import APIView
 from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Q, Sum
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import FileResponse, StreamingHttpResponse
+from django.conf import settings
 from .models import Customer, Invoice, InvoiceItem, Payment
 from .serializers import (
     CustomerSerializer, InvoiceSerializer, InvoiceItemSerializer, PaymentSerializer
 )
 from .utils import (
-    generate_invoice_pdf, send_invoice_email, generate_zatca_qr_code,
-    generate_eta_qr_code, sign_zatca_invoice, sign_eta_invoice
+    generate_invoice_pdf, send_invoice_email,
+    generate_eta_qr_code, sign_eta_invoice,
+    compute_dashboard_stats, generate_invoice_qr_codes, QR_PAYLOADS,
+    render_invoice_html, apply_invoice_compliance, parse_amount
 )
+from apps.companies.pdf import prerender_on_commit, iter_document_pdfs, stream_zip, merge_pdfs
+from apps.companies.qr import MIME_TYPES
+from .services import CustomerBalanceService, InvoiceService, PaymentService
+from .tasks import prerender_invoice_pdf
 from apps.inventory.utils import update_stock_on_sale
+from apps.companies.cache import tenant_cache
+from apps.companies.mixins import ConditionalListMixin, TenantCachedListMixin
+import copy
 import io
+import uuid
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ConditionalListMixin, TenantCachedListMixin, viewsets.ModelViewSet):
     """ViewSet for Customer model."""
 
     queryset = Customer.objects.all()
@@ -32,6 +44,10 @@ class CustomerViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'email', 'phone']
     ordering_fields = ['name', 'balance', 'created_at']
     ordering = ['name']
+    # total_sales is derived from the customer's invoices
+    conditional_timestamp_fields = ('updated_at', 'invoices__updated_at')
+    conditional_count_fields = ('invoices',)
+    cache_namespace = 'customers'
 
     def get_queryset(self):
         """Filter customers by company."""
@@ -44,7 +60,14 @@ class CustomerViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def update_balance(self, request, pk=None):
-        """Update customer balance."""
+        """
+        Adjust the customer balance by hand.
+
+        The balance is the amount the customer owes: it already includes
+        the balance due of their open sales invoices, kept in step by
+        CustomerBalanceService. Only post amounts owed outside invoices
+        here (opening balances, corrections), never invoice totals.
+        """
         customer = self.get_object()
         amount = request.data.get('amount')
         notes = request.data.get('notes', '')
@@ -56,19 +79,88 @@ class CustomerViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            amount = float(amount)
-            customer.balance += amount
-            customer.save()
+            amount = parse_amount(amount)
+        except ValueError:
+            return Response(
+                {'error': _('Invalid amount')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            return Response({
-                'message': _('Balance updated successfully'),
-                'new_balance': customer.balance
-            })
+        Customer.objects.filter(pk=customer.pk).update(
+            balance=F('balance') + amount,
+            updated_at=timezone.now()
+        )
+        customer.refresh_from_db(fields=['balance', 'updated_at'])
+        tenant_cache.invalidate_on_commit(customer.company_id, 'customers')
+
+        return Response({
+            'message': _('Balance updated successfully'),
+            'new_balance': customer.balance
+        })
+
+    @action(detail=True, methods=['post'])
+    def allocate_payment(self, request, pk=None):
+        """
+        Apply one receipt across the customer's open invoices, oldest first.
+
+        Optional ``invoice_ids`` limits the invoices the receipt may settle.
+        """
+        customer = self.get_object()
+        amount = request.data.get('amount')
+        payment_method = request.data.get('payment_method')
+        invoice_ids = request.data.get('invoice_ids')
+
+        if not amount or not payment_method:
+            return Response(
+                {'error': _('Amount and payment method are required')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if invoice_ids is not None and not isinstance(invoice_ids, list):
+            return Response(
+                {'error': _('invoice_ids must be a list')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            amount = parse_amount(amount)
         except ValueError:
             return Response(
                 {'error': _('Invalid amount')},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if amount <= 0:
+            return Response(
+                {'error': _('Amount must be greater than 0')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            allocations = PaymentService.allocate_payment(
+                customer.pk, amount, payment_method,
+                user=request.user,
+                reference=request.data.get('reference', ''),
+                notes=request.data.get('notes', ''),
+                invoice_ids=invoice_ids
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        customer.refresh_from_db(fields=['balance'])
+        return Response({
+            'message': _('Payment allocated successfully'),
+            'new_balance': customer.balance,
+            'allocations': [
+                {
+                    'invoice_id': invoice.id,
+                    'invoice_number': invoice.invoice_number,
+                    'payment_id': payment.id,
+                    'amount': payment.amount,
+                    'new_balance_due': invoice.balance_due,
+                    'new_payment_status': invoice.payment_status
+                }
+                for invoice, payment in allocations
+            ]
+        })
 
 
 class InvoiceViewSet(viewsets.ModelViewSet):
@@ -90,10 +182,34 @@ class InvoiceViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         """Set company and created_by when creating an invoice."""
-        serializer.save(
+        invoice = serializer.save(
             company=self.request.user.company,
             created_by=self.request.user
         )
+        prerender_on_commit(prerender_invoice_pdf, invoice.pk)
+
+        # Serialize the response from one prefetched read
+        serializer.instance = Invoice.objects.select_related('customer').prefetch_related(
+            'items__product', 'payments__created_by'
+        ).get(pk=invoice.pk)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        """Save the invoice and move the customer balances by the change."""
+        # Save onto the locked row, so a payment committed since get_object()
+        # is neither overwritten nor counted twice in the balance
+        locked = Invoice.objects.select_for_update().get(pk=serializer.instance.pk)
+        old = copy.copy(locked)
+        serializer.instance = locked
+        invoice = serializer.save()
+        CustomerBalanceService.replace(old, invoice)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        """Delete the invoice and take its balance due off the customer."""
+        old = Invoice.objects.select_for_update().get(pk=instance.pk)
+        old.delete()
+        CustomerBalanceService.replace(old, None)
 
     @action(detail=True, methods=['post'])
     def add_payment(self, request, pk=None):
@@ -111,66 +227,112 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            amount = float(amount)
-
-            if amount <= 0:
-                return Response(
-                    {'error': _('Amount must be greater than 0')},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            if amount > invoice.balance_due:
-                return Response(
-                    {'error': _('Payment amount exceeds balance due')},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Create payment
-            payment = Payment.objects.create(
-                invoice=invoice,
-                amount=amount,
-                payment_method=payment_method,
-                reference=reference,
-                notes=notes,
-                date=timezone.now().date(),
-                created_by=request.user
-            )
-
-            # Update invoice paid amount
-            invoice.paid_amount += amount
-            if invoice.paid_amount >= invoice.total_amount:
-                invoice.payment_status = 'paid'
-            else:
-                invoice.payment_status = 'partial'
-            invoice.save()
-
-            return Response({
-                'message': _('Payment added successfully'),
-                'payment_id': payment.id,
-                'new_paid_amount': invoice.paid_amount,
-                'new_balance_due': invoice.balance_due,
-                'new_payment_status': invoice.payment_status
-            })
+            amount = parse_amount(amount)
         except ValueError:
             return Response(
                 {'error': _('Invalid amount')},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if amount <= 0:
+            return Response(
+                {'error': _('Amount must be greater than 0')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            payment, invoice = PaymentService.apply_payment(
+                invoice.pk, amount, payment_method,
+                user=request.user,
+                reference=reference,
+                notes=notes
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'message': _('Payment added successfully'),
+            'payment_id': payment.id,
+            'new_paid_amount': invoice.paid_amount,
+            'new_balance_due': invoice.balance_due,
+            'new_payment_status': invoice.payment_status
+        })
 
     @action(detail=True, methods=['get'])
     def generate_pdf(self, request, pk=None):
         """Generate PDF for invoice."""
         invoice = self.get_object()
 
-        # Generate PDF
-        pdf_buffer = generate_invoice_pdf(invoice)
-
-        # Return PDF
-        response = HttpResponse(
-            pdf_buffer.read(),
+        # Stream the cached PDF, rendering it first on a miss
+        return FileResponse(
+            generate_invoice_pdf(invoice),
+            as_attachment=True,
+            filename=f'invoice_{invoice.invoice_number}.pdf',
             content_type='application/pdf'
         )
-        response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_number}.pdf"'
+
+    @action(detail=False, methods=['get'])
+    def export_pdf(self, request):
+        """
+        Export many invoices as a streamed ZIP of PDFs or as one merged PDF.
+
+        Invoices are selected with the list filters plus ``ids`` (comma
+        separated), ``date_from`` and ``date_to``; ``format`` is ``zip``
+        (default) or ``pdf``.
+        """
+        export_format = request.query_params.get('format', 'zip')
+        if export_format not in ('zip', 'pdf'):
+            return Response(
+                {'error': _('Invalid export format')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        invoices = self.filter_queryset(self.get_queryset())
+        ids = request.query_params.get('ids')
+        if ids:
+            invoices = invoices.filter(id__in=[value for value in ids.split(',') if value.isdigit()])
+        if request.query_params.get('date_from'):
+            invoices = invoices.filter(date__gte=request.query_params['date_from'])
+        if request.query_params.get('date_to'):
+            invoices = invoices.filter(date__lte=request.query_params['date_to'])
+
+        limit = settings.PDF_EXPORT_MAX_DOCUMENTS if export_format == 'zip' else settings.PDF_EXPORT_MAX_MERGED
+        if invoices.count() > limit:
+            return Response(
+                {'error': _('Too many invoices selected, the limit is {}').format(limit)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        invoices = invoices.select_related('company', 'customer').prefetch_related(
+            'items', 'payments'
+        ).iterator(chunk_size=50)
+        if export_format == 'pdf':
+            # Rendered before the response starts, so a failure is a proper error
+            pdfs = iter_document_pdfs(invoices, 'invoice', render_invoice_html)
+            # PDFs complete out of order; merge them by date and number
+            rendered = sorted(pdfs, key=lambda pair: (pair[0].date, pair[0].invoice_number))
+            return FileResponse(
+                merge_pdfs(pdf for _invoice, pdf in rendered),
+                as_attachment=True,
+                filename='invoices.pdf',
+                content_type='application/pdf'
+            )
+
+        # The ZIP streams while invoices render: a failed invoice is left out
+        # and listed in ERRORS.txt instead of cutting the archive off
+        failures = []
+        pdfs = iter_document_pdfs(invoices, 'invoice', render_invoice_html, failures=failures)
+
+        def entries():
+            for invoice, pdf in pdfs:
+                yield f'invoice_{invoice.invoice_number}.pdf', pdf
+            if failures:
+                yield 'ERRORS.txt', ''.join(
+                    f'invoice_{invoice.invoice_number}.pdf: {str(error)}\n'
+                    for invoice, error in failures
+                ).encode()
+
+        response = StreamingHttpResponse(stream_zip(entries()), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="invoices.zip"'
         return response
 
     @action(detail=True, methods=['post'])
@@ -215,27 +377,16 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Generate QR code
-            qr_code_data = generate_zatca_qr_code(invoice)
-
-            # Sign invoice
-            zatca_hash, zatca_uuid = sign_zatca_invoice(
-                invoice, 
-                invoice.company.zatca_certificate,
-                invoice.company.zatca_private_key
-            )
-
-            # Update invoice
-            invoice.qr_code_data = qr_code_data
-            invoice.zatca_hash = zatca_hash
-            invoice.zatca_uuid = zatca_uuid
-            invoice.save()
+            # Chain, sign and QR-encode the invoice
+            with transaction.atomic():
+                apply_invoice_compliance([invoice], 'zatca')
+            prerender_on_commit(prerender_invoice_pdf, invoice.pk)
 
             return Response({
                 'message': _('ZATCA compliance data generated successfully'),
-                'qr_code_data': qr_code_data,
-                'zatca_hash': zatca_hash,
-                'zatca_uuid': zatca_uuid
+                'qr_code_data': invoice.qr_code_data,
+                'zatca_hash': invoice.zatca_hash,
+                'zatca_uuid': invoice.zatca_uuid
             })
         except Exception as e:
             return Response(
@@ -270,6 +421,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             invoice.qr_code_data = qr_code_data
             invoice.eta_uuid = eta_uuid
             invoice.save()
+            prerender_on_commit(prerender_invoice_pdf, invoice.pk)
 
             return Response({
                 'message': _('ETA compliance data generated successfully'),
@@ -282,6 +434,197 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False, methods=['post'])
+    def qr_codes(self, request):
+        """Generate ZATCA or ETA QR codes for many invoices at once."""
+        ids = request.data.get('ids') or []
+        kind = request.data.get('type', 'zatca')
+        image_format = request.data.get('format', settings.QR_IMAGE_FORMAT)
+
+        if kind not in QR_PAYLOADS:
+            return Response(
+                {'error': _('Invalid QR code type')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if image_format not in MIME_TYPES:
+            return Response(
+                {'error': _('Invalid image format')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        invoices = self.get_queryset().filter(id__in=ids).select_related('company')
+        qr_codes = generate_invoice_qr_codes(invoices, kind, image_format)
+
+        return Response({
+            'format': image_format,
+            'qr_codes': {str(invoice_id): image for invoice_id, image in qr_codes.items()}
+        })
+
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Ingest a batch of invoices recorded offline by a POS terminal.
+
+        Every invoice carries a ``client_uuid``; invoices already stored
+        under that UUID are reported as duplicates instead of being created
+        again, so a terminal can safely resend a whole batch. The new
+        invoices are created in one transaction with batched stock updates.
+        """
+        device_id = request.data.get('device_id')
+        payload = request.data.get('invoices')
+        company = request.user.company
+
+        if not isinstance(payload, list) or not payload:
+            return Response(
+                {'error': _('Invoices are required')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(payload) > settings.POS_SYNC_MAX_INVOICES:
+            return Response(
+                {'error': _('Too many invoices in one batch, the limit is {}').format(settings.POS_SYNC_MAX_INVOICES)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = [None] * len(payload)
+        first_index = {}
+        for index, data in enumerate(payload):
+            try:
+                client_uuid = str(uuid.UUID(str(data.get('client_uuid'))))
+            except (AttributeError, ValueError):
+                results[index] = {
+                    'client_uuid': data.get('client_uuid') if isinstance(data, dict) else None,
+                    'status': 'error',
+                    'errors': {'client_uuid': [_('A valid client UUID is required')]}
+                }
+                continue
+            first_index.setdefault(client_uuid, index)
+
+        existing = {
+            str(client_uuid): (invoice_id, invoice_number)
+            for invoice_id, invoice_number, client_uuid in Invoice.objects.filter(
+                company=company, client_uuid__in=first_index.keys()
+            ).values_list('id', 'invoice_number', 'client_uuid')
+        }
+
+        pending = []
+        for client_uuid, index in first_index.items():
+            if client_uuid in existing:
+                invoice_id, invoice_number = existing[client_uuid]
+                results[index] = {
+                    'client_uuid': client_uuid, 'status': 'duplicate',
+                    'id': invoice_id, 'invoice_number': invoice_number
+                }
+                continue
+
+            serializer = self.get_serializer(data=payload[index])
+            if not serializer.is_valid():
+                results[index] = {'client_uuid': client_uuid, 'status': 'error', 'errors': serializer.errors}
+                continue
+
+            data = dict(serializer.validated_data)
+            data.update(client_uuid=client_uuid, device_id=device_id, created_by=request.user)
+            pending.append((index, client_uuid, data))
+
+        # Reject what the database would refuse, so one bad invoice cannot fail the batch
+        invalid_products = InvoiceService.invalid_products(company, [data for _index, _uuid, data in pending])
+        numbers = [data['invoice_number'] for _index, _uuid, data in pending if data.get('invoice_number')]
+        taken_numbers = set(
+            Invoice.objects.filter(company=company, invoice_number__in=numbers).values_list('invoice_number', flat=True)
+        )
+        seen_numbers = set()
+        to_create = []
+        for index, client_uuid, data in pending:
+            errors = {}
+            if data['customer'].company_id != company.id:
+                errors['customer'] = [_('Invalid customer')]
+            if any(item_data['product_id'] in invalid_products for item_data in data.get('items', [])):
+                errors['items'] = [_('Invalid product')]
+            number = data.get('invoice_number')
+            if number and (number in taken_numbers or number in seen_numbers):
+                errors['invoice_number'] = [_('Invoice number already exists')]
+            if errors:
+                results[index] = {'client_uuid': client_uuid, 'status': 'error', 'errors': errors}
+                continue
+            if number:
+                seen_numbers.add(number)
+            to_create.append((index, client_uuid, data))
+
+        try:
+            invoices = InvoiceService.create_invoices(
+                company, [data for _index, _uuid, data in to_create], user=request.user
+            )
+        except IntegrityError:
+            # A concurrent request stored some of these invoices first
+            return Response(
+                {'error': _('The batch conflicts with invoices saved meanwhile, please resend it')},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        for (index, client_uuid, _data), invoice in zip(to_create, invoices):
+            results[index] = {
+                'client_uuid': client_uuid, 'status': 'created',
+                'id': invoice.id, 'invoice_number': invoice.invoice_number
+            }
+
+        # Repeats of a UUID within the batch get the outcome of its first occurrence
+        for index, data in enumerate(payload):
+            if results[index] is None:
+                first = results[first_index[str(uuid.UUID(str(data.get('client_uuid'))))]]
+                results[index] = dict(first, status='duplicate') if first['status'] != 'error' else first
+
+        return Response({
+            'created': sum(result['status'] == 'created' for result in results),
+            'duplicates': sum(result['status'] == 'duplicate' for result in results),
+            'errors': sum(result['status'] == 'error' for result in results),
+            'results': results
+        })
+
+    @action(detail=False, methods=['post'])
+    def compliance(self, request):
+        """Generate ZATCA or ETA compliance data (signature and QR code) for many invoices."""
+        ids = request.data.get('ids') or []
+        kind = request.data.get('type', 'zatca')
+        company = request.user.company
+
+        if kind not in QR_PAYLOADS:
+            return Response(
+                {'error': _('Invalid compliance type')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not getattr(company, f'{kind}_enabled'):
+            return Response(
+                {'error': _('{} is not enabled for this company').format(kind.upper())},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > settings.COMPLIANCE_BATCH_MAX:
+            return Response(
+                {'error': _('Too many invoices selected, the limit is {}').format(settings.COMPLIANCE_BATCH_MAX)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            # Chain order follows issue order
+            invoices = self.get_queryset().filter(id__in=ids).select_related('company').order_by('date', 'id')
+            with transaction.atomic():
+                invoices = apply_invoice_compliance(invoices, kind)
+
+            uuid_field = f'{kind}_uuid'
+            return Response({
+                'message': _('Compliance data generated for {} invoices').format(len(invoices)),
+                'results': {
+                    str(invoice.id): {
+                        uuid_field: getattr(invoice, uuid_field),
+                        **({'zatca_hash': invoice.zatca_hash} if kind == 'zatca' else {})
+                    }
+                    for invoice in invoices
+                }
+            })
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
 
 class PaymentViewSet(viewsets.ModelViewSet):
     """ViewSet for Payment model."""
@@ -314,16 +657,13 @@ class GenerateInvoicePDFView(APIView):
                 company=request.user.company
             )
 
-            # Generate PDF
-            pdf_buffer = generate_invoice_pdf(invoice)
-
-            # Return PDF
-            response = HttpResponse(
-                pdf_buffer.read(),
+            # Stream the cached PDF, rendering it first on a miss
+            return FileResponse(
+                generate_invoice_pdf(invoice),
+                as_attachment=True,
+                filename=f'invoice_{invoice.invoice_number}.pdf',
                 content_type='application/pdf'
             )
-            response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_number}.pdf"'
-            return response
         except Invoice.DoesNotExist:
             return Response(
                 {'error': _('Invoice not found')},
@@ -394,27 +734,16 @@ class ZATCAComplianceView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Generate QR code
-            qr_code_data = generate_zatca_qr_code(invoice)
-
-            # Sign invoice
-            zatca_hash, zatca_uuid = sign_zatca_invoice(
-                invoice, 
-                invoice.company.zatca_certificate,
-                invoice.company.zatca_private_key
-            )
-
-            # Update invoice
-            invoice.qr_code_data = qr_code_data
-            invoice.zatca_hash = zatca_hash
-            invoice.zatca_uuid = zatca_uuid
-            invoice.save()
+            # Chain, sign and QR-encode the invoice
+            with transaction.atomic():
+                apply_invoice_compliance([invoice], 'zatca')
+            prerender_on_commit(prerender_invoice_pdf, invoice.pk)
 
             return Response({
                 'message': _('ZATCA compliance data generated successfully'),
-                'qr_code_data': qr_code_data,
-                'zatca_hash': zatca_hash,
-                'zatca_uuid': zatca_uuid
+                'qr_code_data': invoice.qr_code_data,
+                'zatca_hash': invoice.zatca_hash,
+                'zatca_uuid': invoice.zatca_uuid
             })
         except Invoice.DoesNotExist:
             return Response(
@@ -462,6 +791,7 @@ class ETAComplianceView(APIView):
             invoice.qr_code_data = qr_code_data
             invoice.eta_uuid = eta_uuid
             invoice.save()
+            prerender_on_commit(prerender_invoice_pdf, invoice.pk)
 
             return Response({
                 'message': _('ETA compliance data generated successfully'),
@@ -486,84 +816,14 @@ class DashboardStatsView(APIView):
 
     def get(self, request):
         """Get dashboard statistics."""
-        user = request.user
-        company = user.company
-        today = timezone.now().date()
-        last_30_days = today - timezone.timedelta(days=30)
-
-        # 1. Revenue (Total Paid Invoices)
-        revenue = Invoice.objects.filter(
-            company=company, 
-            payment_status='paid'
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-
-        # 2. Active Orders (Unpaid/Partial Invoices)
-        active_orders = Invoice.objects.filter(
-            company=company
-        ).exclude(payment_status__in=['paid', 'refunded']).count()
-
-        # 3. New Customers (Last 30 Days)
-        new_customers = Customer.objects.filter(
-            company=company,
-            created_at__date__gte=last_30_days
-        ).count()
-
-        # 4. Pending Work (Mock for now, or use Quotes)
-        pending_work = Invoice.objects.filter(
-            company=company,
-            invoice_type='quote'
-        ).count()
-
-        # 5. Revenue Chart Data (Last 6 Months)
-        revenue_data = []
-        for i in range(5, -1, -1):
-            month_start = (today.replace(day=1) - timezone.timedelta(days=i*30)).replace(day=1)
-            month_end = (month_start + timezone.timedelta(days=32)).replace(day=1) - timezone.timedelta(days=1)
-            
-            month_revenue = Invoice.objects.filter(
-                company=company,
-                payment_status='paid',
-                date__gte=month_start,
-                date__lte=month_end
-            ).aggregate(total=Sum('total_amount'))['total'] or 0
-            
-            revenue_data.append({
-                'name': month_start.strftime('%b'),
-                'value': float(month_revenue)
-            })
-
-        # 6. Inventory Status (Low Stock vs Healthy)
-        # We need to import Product dynamically to avoid circular imports if any
-        from apps.inventory.models import Product
-        
-        low_stock_count = Product.objects.filter(
-            company=company,
-            current_stock__lte=models.F('reorder_point')
-        ).count()
-        
-        out_of_stock_count = Product.objects.filter(
-            company=company,
-            current_stock=0
-        ).count()
-        
-        healthy_stock_count = Product.objects.filter(
-            company=company,
-            current_stock__gt=models.F('reorder_point')
-        ).count()
-
-        inventory_data = [
-            {'name': 'Healthy', 'value': healthy_stock_count},
-            {'name': 'Low Stock', 'value': low_stock_count},
-            {'name': 'Out of Stock', 'value': out_of_stock_count},
-        ]
+        company = request.user.company
+
+        data = tenant_cache.get_or_set(
+            company.id,
+            'dashboard',
+            'stats',
+            lambda: compute_dashboard_stats(company),
+            timeout=settings.DASHBOARD_STATS_CACHE_TIMEOUT
+        )
 
-        return Response({
-            'stats': {
-                'revenue': {'value': float(revenue), 'change': 12.5, 'trend': 'up'}, # Change % is mocked for now
-                'orders': {'value': active_orders, 'change': -3.2, 'trend': 'down'},
-                'customers': {'value': new_customers, 'change': 8.7, 'trend': 'up'},
-                'workOrders': {'value': pending_work, 'change': 15, 'trend': 'up'}
-            },
-            'revenueData': revenue_data,
-            'inventoryData': inventory_data
-        })
+        return Response(data)
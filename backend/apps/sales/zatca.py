@@ -0,0 +1,130 @@
+"""
+ZATCA (Saudi e-invoicing) QR payloads and invoice hash chain.
+
+QR codes carry a base64 TLV payload. Each field is one tag byte, one
+length byte (the UTF-8 length of the value, at most 255) and the UTF-8
+value. Tags 1-5 are the seller, VAT number, timestamp, invoice total and
+VAT total; tag 6 is the invoice hash once the invoice is chained.
+
+Each chained invoice hashes its own fields together with the hash of the
+company's previous invoice and its position in the chain. The head of the
+chain lives in ``ZATCAHashChain`` and is advanced once per batch under a
+row lock, so chaining N invoices costs one locked read and one write.
+"""
+
+import base64
+import hashlib
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from .models import Invoice, ZATCAHashChain
+
+SELLER_NAME = 1
+VAT_NUMBER = 2
+TIMESTAMP = 3
+INVOICE_TOTAL = 4
+VAT_TOTAL = 5
+INVOICE_HASH = 6
+
+# Previous invoice hash of a company's first invoice, as defined by ZATCA
+INITIAL_PREVIOUS_HASH = base64.b64encode(hashlib.sha256(b'0').hexdigest().encode()).decode()
+
+
+def encode_tlv(fields):
+    """Encode ``(tag, value)`` pairs as a base64 TLV string."""
+    buffer = bytearray()
+    for tag, value in fields:
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        if len(value) > 255:
+            raise ValueError(_('ZATCA QR field {} is longer than 255 bytes').format(tag))
+        buffer.append(tag)
+        buffer.append(len(value))
+        buffer += value
+    return base64.b64encode(buffer).decode('ascii')
+
+
+def decode_tlv(payload):
+    """Decode a base64 TLV string into ``{tag: value}``."""
+    data = base64.b64decode(payload)
+    fields = {}
+    position = 0
+    while position < len(data):
+        tag, length = data[position], data[position + 1]
+        fields[tag] = data[position + 2:position + 2 + length].decode('utf-8')
+        position += 2 + length
+    return fields
+
+
+def _timestamp(invoice):
+    created_at = invoice.created_at or timezone.now()
+    return f"{invoice.date.isoformat()}T{timezone.localtime(created_at):%H:%M:%S}"
+
+
+def qr_fields(invoice):
+    """TLV fields of the invoice's QR code."""
+    company = invoice.company
+    fields = [
+        (SELLER_NAME, company.name),
+        (VAT_NUMBER, company.tax_register or ''),
+        (TIMESTAMP, _timestamp(invoice)),
+        (INVOICE_TOTAL, f'{invoice.total_amount:.2f}'),
+        (VAT_TOTAL, f'{invoice.tax_amount:.2f}'),
+    ]
+    if invoice.zatca_hash:
+        fields.append((INVOICE_HASH, invoice.zatca_hash))
+    return fields
+
+
+def qr_payload(invoice):
+    """Build the base64 TLV content of the invoice's ZATCA QR code."""
+    return encode_tlv(qr_fields(invoice))
+
+
+def invoice_hash(invoice, previous_hash, counter):
+    """SHA-256 digest of the invoice fields chained to the previous hash."""
+    invoice_data = '|'.join([
+        invoice.invoice_number,
+        str(invoice.date),
+        f'{invoice.total_amount:.2f}',
+        f'{invoice.tax_amount:.2f}',
+        str(counter),
+        previous_hash,
+    ])
+    return hashlib.sha256(invoice_data.encode()).digest()
+
+
+def chain_invoices(company_id, invoices):
+    """
+    Append the not yet chained ``invoices`` to the company's hash chain, in
+    the given order, and return ``{invoice id: digest}`` for them.
+
+    Sets ``zatca_previous_hash``, ``zatca_counter`` and ``zatca_hash`` on
+    the instances without saving them. Must run inside a transaction.
+    """
+    ZATCAHashChain.objects.get_or_create(company_id=company_id)
+    chain = ZATCAHashChain.objects.select_for_update().get(company_id=company_id)
+
+    # Re-check under the lock: another request may have chained some of them
+    chained = set(
+        Invoice.objects.filter(
+            pk__in=[invoice.pk for invoice in invoices],
+            zatca_counter__isnull=False
+        ).values_list('pk', flat=True)
+    )
+
+    previous_hash = chain.last_hash or INITIAL_PREVIOUS_HASH
+    digests = {}
+    for invoice in invoices:
+        if invoice.pk in chained:
+            continue
+        chain.counter += 1
+        digest = invoice_hash(invoice, previous_hash, chain.counter)
+        invoice.zatca_previous_hash = previous_hash
+        invoice.zatca_counter = chain.counter
+        invoice.zatca_hash = previous_hash = base64.b64encode(digest).decode()
+        digests[invoice.pk] = digest
+
+    if digests:
+        chain.last_hash = previous_hash
+        chain.save(update_fields=['last_hash', 'counter'])
+    return digests
@@ -0,0 +1,80 @@
+"""
+Login throughput benchmark.
+
+Posts to the login endpoint from several threads and reports logins per
+second, latency and the number of queries each login runs on the request
+path (audit rows are written in batches afterwards).
+
+Usage:
+    python scripts/login_benchmark.py --email admin@zimam.com --password admin123 --requests 500 --threads 8
+"""
+
+import os
+import sys
+import time
+import argparse
+import django
+from concurrent.futures import ThreadPoolExecutor
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zimam.settings')
+django.setup()
+
+from django.db import close_old_connections, connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.authentication.audit import auth_audit
+
+LOGIN_URL = '/api/auth/login/'
+
+
+def login_once(email, password):
+    client = APIClient()
+    started = time.perf_counter()
+    response = client.post(LOGIN_URL, {'email': email, 'password': password}, format='json')
+    elapsed = time.perf_counter() - started
+    close_old_connections()
+    return response.status_code, elapsed
+
+
+def count_queries(email, password):
+    client = APIClient()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(LOGIN_URL, {'email': email, 'password': password}, format='json')
+    return response.status_code, len(queries)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    status_code, queries = count_queries(args.email, args.password)
+    if status_code != 200:
+        print(f"❌ Login failed with status {status_code}, check the credentials")
+        sys.exit(1)
+    print(f"🔎 Queries per login: {queries}")
+
+    print(f"🔐 Running {args.requests} logins on {args.threads} threads...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(
+            lambda _: login_once(args.email, args.password),
+            range(args.requests)
+        ))
+    elapsed = time.perf_counter() - started
+    auth_audit.flush()
+
+    latencies = sorted(seconds for code, seconds in results if code == 200)
+    failures = len(results) - len(latencies)
+
+    print(f"✅ Succeeded: {len(latencies)}  ❌ Failed: {failures}")
+    print(f"⏱  Total: {elapsed:.2f}s  Throughput: {len(latencies) / elapsed:.1f} logins/s")
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"📈 Latency p50: {p50 * 1000:.1f}ms  p99: {p99 * 1000:.1f}ms")
@@ -0,0 +1,67 @@
+"""
+QR code rendering benchmark.
+
+Reports QR codes per second for PNG and SVG rendering, for cached lookups
+and for batch rendering through the process pool, using ZATCA-sized
+payloads.
+
+Usage:
+    python scripts/qr_benchmark.py --codes 500
+"""
+
+import os
+import sys
+import base64
+import hashlib
+import time
+import uuid
+import argparse
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zimam.settings')
+django.setup()
+
+from apps.companies.qr import _render, render_qr, render_qr_batch
+from apps.sales.zatca import (
+    SELLER_NAME, VAT_NUMBER, TIMESTAMP, INVOICE_TOTAL, VAT_TOTAL, INVOICE_HASH, encode_tlv
+)
+
+
+def build_payloads(count):
+    """Build unique TLV payloads shaped like chained ZATCA invoice QR codes."""
+    payloads = []
+    for index in range(count):
+        invoice_hash = base64.b64encode(hashlib.sha256(uuid.uuid4().bytes).digest()).decode()
+        payloads.append(encode_tlv([
+            (SELLER_NAME, 'Zimam Trading Co.'),
+            (VAT_NUMBER, '300000000000003'),
+            (TIMESTAMP, '2026-10-19T10:15:00'),
+            (INVOICE_TOTAL, f'{index * 1.15:.2f}'),
+            (VAT_TOTAL, f'{index * 0.15:.2f}'),
+            (INVOICE_HASH, invoice_hash),
+        ]))
+    return payloads
+
+
+def measure(label, count, fn):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28}{count / elapsed:>12.0f} codes/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--codes', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"🔳 Rendering {args.codes} QR codes per scenario")
+    for image_format in ('png', 'svg'):
+        payloads = build_payloads(args.codes)
+        measure(f'{image_format} uncached', args.codes, lambda: [_render(data, image_format) for data in payloads])
+
+        payloads = build_payloads(args.codes)
+        measure(f'{image_format} batch (pool)', args.codes, lambda: render_qr_batch(payloads, image_format))
+        measure(f'{image_format} cached', args.codes, lambda: [render_qr(data, image_format) for data in payloads])
@@ -0,0 +1,77 @@
+"""
+ZATCA/ETA invoice signing benchmark.
+
+Reports invoices signed per second when the private key is parsed for every
+invoice (the old behaviour), with the per-company key cache, and for bulk
+batches signed in the process pool.
+
+Usage:
+    python scripts/signing_benchmark.py --invoices 2000 --key-size 2048
+"""
+
+import os
+import sys
+import time
+import argparse
+import django
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zimam.settings')
+django.setup()
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from apps.sales.signing import _parse_key, _sign, invoice_digest, sign_invoice, sign_invoices
+
+
+def build_key(key_size):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+
+
+def build_invoices(count):
+    """Build objects carrying the invoice fields covered by the signature."""
+    return [
+        SimpleNamespace(
+            company_id=1,
+            invoice_number=f'INV-{index:06d}',
+            date=date(2026, 10, 19),
+            total_amount=Decimal(index) * Decimal('1.15'),
+            tax_amount=Decimal(index) * Decimal('0.15'),
+        )
+        for index in range(count)
+    ]
+
+
+def measure(label, count, fn):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28}{count / elapsed:>12.0f} invoices/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--invoices', type=int, default=2000)
+    parser.add_argument('--key-size', type=int, default=2048)
+    args = parser.parse_args()
+
+    pem = build_key(args.key_size)
+    invoices = build_invoices(args.invoices)
+
+    print(f"🔏 Signing {args.invoices} invoices with an RSA-{args.key_size} key")
+    measure('parse key per invoice', args.invoices,
+            lambda: [_sign(_parse_key(pem), invoice_digest(invoice)) for invoice in invoices])
+    measure('cached key', args.invoices,
+            lambda: [sign_invoice(invoice, 'zatca', pem) for invoice in invoices])
+    # The first pool batch includes worker start-up and one key parse per worker
+    measure('bulk (pool, cold)', args.invoices, lambda: sign_invoices(invoices, 'zatca', pem))
+    measure('bulk (pool, warm)', args.invoices, lambda: sign_invoices(invoices, 'zatca', pem))
@@ -0,0 +1,82 @@
+"""
+Sync frame encoding benchmark.
+
+Encodes synthetic product/stock deltas with every encoding the server can
+negotiate and reports bytes per update and encode CPU time per message,
+compared with the plain JSON text frames.
+
+Usage:
+    python scripts/ws_codec_benchmark.py --updates 10000 --batch 50
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import django
+from datetime import datetime
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zimam.settings')
+django.setup()
+
+from apps.authentication.codecs import available_codecs
+
+
+def build_updates(count):
+    """Build pre-serialized UPDATE messages shaped like product/stock deltas."""
+    updates = []
+    for index in range(count):
+        product_id = random.randint(1, 5000)
+        updates.append(json.dumps({
+            'type': 'UPDATE',
+            'entity': 'product',
+            'entityId': product_id,
+            'seq': index + 1,
+            'data': {
+                'id': product_id,
+                'sku': f'SKU-{product_id:06d}',
+                'name': f'Product {product_id}',
+                'current_stock': f'{random.uniform(0, 500):.2f}',
+                'selling_price': f'{random.uniform(1, 1000):.2f}',
+                'reorder_point': f'{random.uniform(0, 50):.2f}',
+            },
+            'timestamp': datetime.now().isoformat()
+        }))
+    return updates
+
+
+def run(updates, batch):
+    batches = [updates[i:i + batch] for i in range(0, len(updates), batch)]
+    baseline = None
+
+    print(f"📦 {len(updates)} updates in frames of {batch}")
+    print(f"{'encoding':<24}{'bytes/update':>14}{'vs json':>10}{'µs/message':>12}")
+
+    for name, codec in available_codecs().items():
+        started = time.process_time()
+        size = 0
+        for texts in batches:
+            frame = codec.encode(texts)
+            size += len(frame.encode()) if isinstance(frame, str) else len(frame)
+        cpu = time.process_time() - started
+
+        per_update = size / len(updates)
+        baseline = baseline or per_update
+        print(
+            f"{name:<24}{per_update:>14.1f}{per_update / baseline * 100:>9.0f}%"
+            f"{cpu / len(updates) * 1e6:>12.2f}"
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=10000)
+    parser.add_argument('--batch', type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(42)
+    run(build_updates(args.updates), args.batch)
@@ -0,0 +1,74 @@
+"""
+WebSocket connect throughput test for the sync consumer.
+
+Opens N concurrent connections against the ASGI application in a single
+process (one worker, one event loop) and reports how many connects per
+second the JWT auth middleware and SyncConsumer sustain.
+
+Usage:
+    python scripts/ws_connect_load_test.py --clients 5000 --email admin@zimam.com
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zimam.settings')
+django.setup()
+
+from channels.testing import WebsocketCommunicator
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.users.models import User
+from zimam.asgi import application
+
+
+async def connect_client(token, timeout):
+    """Connect one client; return (connected, seconds, communicator)."""
+    communicator = WebsocketCommunicator(application, f'/ws/sync/?token={token}')
+    started = time.perf_counter()
+    connected, _ = await communicator.connect(timeout=timeout)
+    if connected:
+        # Wait for the SYNC_CONNECTED greeting so the full handshake is timed
+        await communicator.receive_from(timeout=timeout)
+    return connected, time.perf_counter() - started, communicator
+
+
+async def run(clients, token, timeout):
+    print(f"🔌 Opening {clients} concurrent connections...")
+    started = time.perf_counter()
+    results = await asyncio.gather(*[connect_client(token, timeout) for _ in range(clients)])
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds for connected, seconds, _ in results if connected)
+    failures = clients - len(latencies)
+
+    print(f"✅ Connected: {len(latencies)}  ❌ Failed: {failures}")
+    print(f"⏱  Total: {elapsed:.2f}s  Throughput: {len(latencies) / elapsed:.0f} connects/s")
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"📈 Latency p50: {p50 * 1000:.1f}ms  p99: {p99 * 1000:.1f}ms")
+
+    await asyncio.gather(*[communicator.disconnect() for _, _, communicator in results])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=5000)
+    parser.add_argument('--email', default=None)
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    # ORM access must happen before entering the event loop
+    user = User.objects.get(email=args.email) if args.email else User.objects.filter(is_active=True).first()
+    if not user:
+        print("❌ No active user found, run scripts/seed_demo_data.py first")
+        sys.exit(1)
+
+    print(f"👤 Authenticating as {user.email}")
+    asyncio.run(run(args.clients, str(AccessToken.for_user(user)), args.timeout))
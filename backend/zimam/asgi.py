@@ -0,0 +1,27 @@
+"""
+ASGI config for zimam project.
+
+Serves regular HTTP through Django and WebSocket connections through
+Channels (see ``apps.authentication.routing``).
+
+For more information on this file, see
+https://channels.readthedocs.io/en/stable/deploying.html
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zimam.settings')
+
+# Initialize Django before importing consumers that touch the ORM
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from apps.authentication.middleware import JWTAuthMiddleware  # noqa: E402
+from apps.authentication.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+})
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     'corsheaders',
     'django_filters',
     'rest_framework_simplejwt',
+    'channels',
 
     # Local apps
     'apps.authentication',
@@ -66,6 +67,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.companies.idempotency.IdempotencyMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -151,7 +153,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.authentication.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -193,23 +195,181 @@ if not DEBUG:
 
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_HEADERS = ['*']
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
+
+# Cache settings
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'zimam',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Tenant read cache (see apps/companies/cache.py)
+TENANT_CACHE = {
+    'TIMEOUT': int(os.getenv('TENANT_CACHE_TIMEOUT', 300)),
+    'LOCAL_TIMEOUT': int(os.getenv('TENANT_CACHE_LOCAL_TIMEOUT', 5)),
+    'LOCAL_MAX_ENTRIES': int(os.getenv('TENANT_CACHE_LOCAL_MAX_ENTRIES', 1024)),
+}
+
+# Seconds a company's dashboard statistics are served from cache
+DASHBOARD_STATS_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_STATS_CACHE_TIMEOUT', 60))
+
+# Seconds dashboard deltas are coalesced per company before being pushed
+DASHBOARD_PUSH_WINDOW = float(os.getenv('DASHBOARD_PUSH_WINDOW', 0.5))
+
+# Seconds login audit rows (attempts, sessions) are buffered before a bulk write
+AUTH_AUDIT_FLUSH_WINDOW = float(os.getenv('AUTH_AUDIT_FLUSH_WINDOW', 1.0))
+# Buffered audit rows that trigger an immediate write
+AUTH_AUDIT_MAX_BATCH = int(os.getenv('AUTH_AUDIT_MAX_BATCH', 500))
+
+# Sliding-window limits (hits, seconds) for unauthenticated auth endpoints.
+# Login counts every request per IP but only failures per email.
+AUTH_RATE_LIMITS = {
+    'login_ip': (int(os.getenv('LOGIN_RATE_LIMIT_IP', 30)), 60),
+    'login_email': (int(os.getenv('LOGIN_RATE_LIMIT_EMAIL', 5)), 900),
+    'password_reset_ip': (int(os.getenv('PASSWORD_RESET_RATE_LIMIT_IP', 10)), 3600),
+    'password_reset_email': (int(os.getenv('PASSWORD_RESET_RATE_LIMIT_EMAIL', 3)), 3600),
+}
+# Reverse proxies in front of the app that append to X-Forwarded-For; the
+# client IP is read that many entries from the right (0: use REMOTE_ADDR)
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+
+# QR codes: default image format ('png' or 'svg') and cache lifetime in seconds
+QR_IMAGE_FORMAT = os.getenv('QR_IMAGE_FORMAT', 'png')
+QR_CACHE_TIMEOUT = int(os.getenv('QR_CACHE_TIMEOUT', 60 * 60 * 24))
+# Uncached QR codes in a batch needed before rendering moves to the process pool
+QR_POOL_MIN_BATCH = int(os.getenv('QR_POOL_MIN_BATCH', 16))
+# Worker processes per server process for QR/PDF rendering (default: CPU count)
+RENDER_POOL_SIZE = int(os.getenv('RENDER_POOL_SIZE', 0)) or None
+
+# Rendered document PDFs: storage directory and max seconds to wait for a render
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', 'pdf_cache')
+PDF_RENDER_TIMEOUT = int(os.getenv('PDF_RENDER_TIMEOUT', 60))
+# Documents per batch export: streamed ZIP and merged PDF (held in memory)
+PDF_EXPORT_MAX_DOCUMENTS = int(os.getenv('PDF_EXPORT_MAX_DOCUMENTS', 5000))
+PDF_EXPORT_MAX_MERGED = int(os.getenv('PDF_EXPORT_MAX_MERGED', 500))
+
+# ZATCA/ETA signing: seconds a parsed private key stays cached per company
+SIGNING_KEY_CACHE_TIMEOUT = int(os.getenv('SIGNING_KEY_CACHE_TIMEOUT', 60 * 60))
+# Invoices in a batch needed before signing moves to the process pool, and invoices per pool task
+SIGNING_POOL_MIN_BATCH = int(os.getenv('SIGNING_POOL_MIN_BATCH', 64))
+SIGNING_CHUNK_SIZE = int(os.getenv('SIGNING_CHUNK_SIZE', 250))
+# Invoices per bulk compliance request
+COMPLIANCE_BATCH_MAX = int(os.getenv('COMPLIANCE_BATCH_MAX', 5000))
+
+# Largest block of document numbers a POS terminal may reserve at once
+DOCUMENT_NUMBER_BLOCK_MAX = int(os.getenv('DOCUMENT_NUMBER_BLOCK_MAX', 1000))
+# Document numbers each server process reserves at a time (apps/companies/numbering.py)
+DOCUMENT_NUMBER_WORKER_BLOCK = int(os.getenv('DOCUMENT_NUMBER_WORKER_BLOCK', 50))
+
+# Largest batch of offline invoices a POS terminal may sync at once
+POS_SYNC_MAX_INVOICES = int(os.getenv('POS_SYNC_MAX_INVOICES', 500))
+
+# Idempotency-Key: how long responses are kept for replay, and how long a
+# request holds its key (see apps/companies/idempotency.py). The lock must
+# outlive the longest request, i.e. the gunicorn --timeout (120s)
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 86400))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 300))
+
+# Channels (WebSocket) settings
+ASGI_APPLICATION = 'zimam.asgi.application'
+# Seconds a WebSocket worker reuses an authenticated user between connects
+WEBSOCKET_AUTH_CACHE_TIMEOUT = int(os.getenv('WEBSOCKET_AUTH_CACHE_TIMEOUT', 30))
+# Seconds sync messages are coalesced per company before fan-out
+SYNC_BATCH_WINDOW = float(os.getenv('SYNC_BATCH_WINDOW', 0.05))
+# Frames buffered per connection before a slow client is asked to resync
+SYNC_SEND_QUEUE_SIZE = int(os.getenv('SYNC_SEND_QUEUE_SIZE', 256))
+# Sync log entries a reconnecting client may replay before it must reload a snapshot
+SYNC_REPLAY_LIMIT = int(os.getenv('SYNC_REPLAY_LIMIT', 1000))
+# Days sync log entries are kept (pruned by apps.inventory.tasks.prune_sync_log)
+SYNC_LOG_RETENTION_DAYS = int(os.getenv('SYNC_LOG_RETENTION_DAYS', 7))
+# Seconds between server heartbeats on sync connections
+SYNC_HEARTBEAT_INTERVAL = int(os.getenv('SYNC_HEARTBEAT_INTERVAL', 30))
+# Seconds of client silence after which a sync connection is closed
+SYNC_IDLE_TIMEOUT = int(os.getenv('SYNC_IDLE_TIMEOUT', 75))
+# Seconds a channel layer group membership survives without being refreshed by
+# the connection sweeper (sync and notification sockets both refresh theirs)
+SYNC_GROUP_EXPIRY = int(os.getenv('SYNC_GROUP_EXPIRY', 120))
+# Sync frames smaller than this are sent uncompressed on compressed encodings
+SYNC_COMPRESSION_MIN_BYTES = int(os.getenv('SYNC_COMPRESSION_MIN_BYTES', 512))
+# Largest decoded (decompressed) frame accepted from a sync client
+SYNC_MAX_FRAME_BYTES = int(os.getenv('SYNC_MAX_FRAME_BYTES', 1024 * 1024))
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+                'group_expiry': SYNC_GROUP_EXPIRY,
+            },
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
 
 # Celery settings
+from celery.schedules import crontab
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'rollup-auth-history': {
+        'task': 'apps.authentication.tasks.rollup_auth_history',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'prune-sync-log': {
+        'task': 'apps.inventory.tasks.prune_sync_log',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
+
+# Days raw login attempts are kept before being rolled up into daily counters
+LOGIN_ATTEMPT_RETENTION_DAYS = int(os.getenv('LOGIN_ATTEMPT_RETENTION_DAYS', 30))
+# Days inactive user sessions are kept
+USER_SESSION_RETENTION_DAYS = int(os.getenv('USER_SESSION_RETENTION_DAYS', 90))
 
 # Email settings
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Use django.core.mail.backends.filebased.EmailBackend locally (writes to EMAIL_FILE_PATH);
+# the test runner always switches to the locmem backend
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', str(BASE_DIR / 'logs' / 'emails'))
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = os.getenv('EMAIL_PORT', 587)
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'Zimam ERP <noreply@zimam.com>')
+# Seconds before a blocking SMTP operation times out
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 30))
+
+# Outbound email queue
+# Deliver inline instead of through Celery (development without a worker)
+EMAIL_QUEUE_EAGER = os.getenv('EMAIL_QUEUE_EAGER', 'False').lower() in ('true', '1', 't')
+# Messages per send_emails task
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 50))
+# Seconds a worker's SMTP connection may sit idle before it is reopened
+EMAIL_CONNECTION_MAX_IDLE = int(os.getenv('EMAIL_CONNECTION_MAX_IDLE', 60))
+# Retries of a failed batch, first backoff and backoff cap in seconds
+EMAIL_MAX_RETRIES = int(os.getenv('EMAIL_MAX_RETRIES', 6))
+EMAIL_RETRY_BACKOFF = int(os.getenv('EMAIL_RETRY_BACKOFF', 30))
+EMAIL_RETRY_BACKOFF_MAX = int(os.getenv('EMAIL_RETRY_BACKOFF_MAX', 1800))
 
 # Security settings
 SECURE_BROWSER_XSS_FILTER = True